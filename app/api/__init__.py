@@ -3,8 +3,16 @@ from fastapi import APIRouter
 from .dates import router as dates_router
 from .countries import router as countries_router
 from .events import router as events_router
+from .stream import router as stream_router
+from .map import router as map_router
+from .activity import router as activity_router
+from .incidents import router as incidents_router
 
 router = APIRouter()
 router.include_router(dates_router)
 router.include_router(countries_router)
 router.include_router(events_router)
+router.include_router(stream_router)
+router.include_router(map_router)
+router.include_router(activity_router)
+router.include_router(incidents_router)
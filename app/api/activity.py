@@ -0,0 +1,69 @@
+# app/api/activity.py
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlmodel import Session
+
+from app.database import get_db
+from .aggregates import daily_counts
+from .schemas import ActivityMatrixResponse
+from .utils import PAST_DAYS_CACHE_CONTROL, cached_json_response, normalize_country_names, get_country_aliases, get_country_coords
+
+router = APIRouter()
+
+MAX_MATRIX_DAYS = 366
+
+
+@router.get("/activity/matrix", response_model=ActivityMatrixResponse)
+def get_activity_matrix(
+    request: Request,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    session: Session = Depends(get_db),
+):
+    """
+    Matrice dense pays × jour du nombre de messages (sur created_at), en colonnes :
+    counts[i][j] = messages du pays countries[i] le jour dates[j].
+    Une seule requête groupée (pays brut, jour), normalisée ensuite en Python.
+    """
+    today = datetime.utcnow().date()
+    end = end or today
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start doit précéder end")
+    n_days = (end - start).days + 1
+    if n_days > MAX_MATRIX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Intervalle limité à {MAX_MATRIX_DAYS} jours")
+
+    rows = daily_counts(session, start, end)
+
+    aliases = get_country_aliases()
+    coords = get_country_coords()
+    per_country: Dict[str, List[int]] = {}
+    for raw_country, day, count in rows:
+        if not raw_country:
+            continue
+        offset = (day - start).days
+        if not 0 <= offset < n_days:
+            continue
+        for norm_country in normalize_country_names((raw_country or "").strip(), aliases):
+            if norm_country not in coords:
+                continue
+            per_country.setdefault(norm_country, [0] * n_days)[offset] += count
+
+    ordered = sorted(per_country.items(), key=lambda kv: sum(kv[1]), reverse=True)
+    payload = ActivityMatrixResponse(
+        start=start,
+        end=end,
+        dates=[start + timedelta(days=i) for i in range(n_days)],
+        countries=[c for c, _ in ordered],
+        counts=[row for _, row in ordered],
+        totals=[sum(row) for _, row in ordered],
+    )
+
+    if end < today:
+        cache_control = PAST_DAYS_CACHE_CONTROL
+    else:
+        cache_control = "public, max-age=60, stale-while-revalidate=600"
+    return cached_json_response(request, payload.model_dump(mode="json"), cache_control)
@@ -0,0 +1,73 @@
+# app/api/aggregates.py
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlmodel import Session, select, func
+
+from app.database import is_snapshot_engine
+from app.models.daily_count import DailyCount
+from app.models.message import Message
+
+
+def _as_date(value) -> date:
+    # SQLite renvoie date() sous forme de texte, PostgreSQL sous forme de date
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def daily_counts(
+    session: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> List[Tuple[Optional[str], date, int]]:
+    """
+    Nombre de messages par (pays brut, jour de created_at), bornes incluses.
+    Lu dans la table pré-agrégée quand l'API lit le snapshot, sinon GROUP BY sur message.
+    """
+    if is_snapshot_engine(session.get_bind()):
+        stmt = select(DailyCount.country, DailyCount.day, DailyCount.count)
+        if start is not None:
+            stmt = stmt.where(DailyCount.day >= start)
+        if end is not None:
+            stmt = stmt.where(DailyCount.day <= end)
+    else:
+        # Bornes et regroupement sur date(created_at), dans l'ordre de ix_message_day_country :
+        # lecture d'un intervalle d'index, groupes déjà triés
+        day = func.date(Message.created_at)
+        stmt = select(Message.country, day, func.count()).group_by(day, Message.country)
+        if start is not None:
+            stmt = stmt.where(day >= start)
+        if end is not None:
+            stmt = stmt.where(day <= end)
+    return [(country, _as_date(day), count) for country, day, count in session.exec(stmt).all()]
+
+
+def counts_since(session: Session, cutoff: datetime) -> List[Tuple[Optional[str], date, int]]:
+    """
+    Comme daily_counts, mais à partir d'un instant exact : jours entiers suivant celui de
+    cutoff lus par daily_counts, fin du premier jour (created_at >= cutoff) comptée sur
+    message. Sur une seule journée, les lignes sont comptées ici sans GROUP BY (lecture de
+    l'intervalle de ix_message_created_at, sans tri temporaire).
+    """
+    first_day = cutoff.date()
+    next_day = datetime.combine(first_day + timedelta(days=1), datetime.min.time())
+    partial = Counter(session.exec(
+        select(Message.country).where(Message.created_at >= cutoff, Message.created_at < next_day)
+    ).all())
+    rows = [(country, first_day, count) for country, count in partial.items()]
+    return rows + daily_counts(session, next_day.date())
+
+
+def available_days(session: Session, limit: int) -> List[date]:
+    """
+    Derniers jours (de created_at) ayant des messages, du plus récent au plus ancien :
+    parcours à rebours de l'index (jour, pays), arrêté après `limit` jours.
+    """
+    if is_snapshot_engine(session.get_bind()):
+        day = DailyCount.day
+    else:
+        day = func.date(Message.created_at)
+    stmt = select(day).distinct().order_by(day.desc()).limit(limit)
+    return [_as_date(d) for d in session.exec(stmt).all()]
@@ -0,0 +1,30 @@
+# app/api/compression.py
+from fastapi import FastAPI
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class ApiGZipMiddleware:
+    """
+    Compression gzip des seules réponses /api (les fichiers statiques ont leurs variantes
+    précalculées, app/assets.py). Le flux SSE (text/event-stream) n'est jamais compressé :
+    GZipMiddleware l'exclut, chaque événement part dès qu'il est émis.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, compresslevel: int) -> None:
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith("/api"):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+def install_compression(app: FastAPI, minimum_size: int, compresslevel: int = 6) -> None:
+    """
+    Compresse les réponses JSON de /api à partir de minimum_size octets. Niveau 6 : les
+    réponses sont calculées à chaque requête, le niveau 9 coûte du CPU pour peu de gain.
+    """
+    app.add_middleware(ApiGZipMiddleware, minimum_size=minimum_size, compresslevel=compresslevel)
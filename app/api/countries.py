@@ -6,55 +6,44 @@ from typing import List, Optional, Dict, Tuple
 from app.database import get_db
 from app.models.message import Message
 from .schemas import CountryActivity, CountryStatus, ActiveCountriesResponse, CountryEventsResponse, ZoneEvents, EventMessage
-from .utils import normalize_country_names, COUNTRY_ALIASES, COUNTRY_COORDS
+from .aggregates import counts_since, daily_counts
+from .utils import normalize_country_names, get_country_aliases, get_country_coords
 
 router = APIRouter()
 
-@router.get("/countries/active", response_model=ActiveCountriesResponse)
-def get_active_countries(
-    days: int = Query(30, ge=1),
-    date_filter: Optional[date] = Query(None, alias="date"),
-    session: Session = Depends(get_db),
-):
+def compute_active_countries(
+    session: Session,
+    days: int = 30,
+    date_filter: Optional[date] = None,
+) -> Tuple[List[CountryStatus], List[str]]:
     """
-    Renvoie les pays qui ont des messages à une date précise (si 'date' fourni),
-    sinon dans les X derniers jours, avec le nombre d'événements et la dernière date d'activité.
-    Fournit aussi la liste des pays ignorés (non normalisés).
+    Pays actifs (normalisés et géoréférencés) à une date précise ou sur les X derniers jours,
+    triés par nombre d'événements, et pays ignorés (non normalisés).
     """
     if date_filter:
-        start_dt = datetime.combine(date_filter, datetime.min.time())
-        end_dt = datetime.combine(date_filter, datetime.max.time())
-        stmt = select(Message.country, Message.created_at).where(
-            Message.created_at >= start_dt,
-            Message.created_at <= end_dt,
-            Message.country.is_not(None),
-        )
+        rows = daily_counts(session, date_filter, date_filter)
     else:
-        now = datetime.utcnow()
-        start_dt = now - timedelta(days=days)
-        stmt = select(Message.country, Message.created_at).where(
-            Message.created_at >= start_dt,
-            Message.country.is_not(None),
-        )
-    rows = session.exec(stmt).all()
+        # Fenêtre glissante exacte : le premier jour n'est compté qu'à partir de l'heure limite
+        rows = counts_since(session, datetime.utcnow() - timedelta(days=days))
 
+    aliases = get_country_aliases()
+    coords = get_country_coords()
     stats: Dict[str, Dict[str, object]] = {}
     ignored_countries = set()
-    for country, created_at in rows:
+    for country, d, count in rows:
         if not country:
             continue
         country = country.strip()
         if not country:
             continue
-        norm_countries = normalize_country_names(country, COUNTRY_ALIASES)
+        norm_countries = normalize_country_names(country, aliases)
         if not norm_countries:
             ignored_countries.add(country)
             continue
-        d = created_at.date()
         for norm_country in norm_countries:
             if norm_country not in stats:
                 stats[norm_country] = {"count": 0, "last_date": d}
-            stats[norm_country]["count"] += 1
+            stats[norm_country]["count"] += count
             if d > stats[norm_country]["last_date"]:
                 stats[norm_country]["last_date"] = d
 
@@ -64,10 +53,25 @@ def get_active_countries(
             events_count=v["count"],
             last_date=v["last_date"],
         )
-        for c, v in stats.items() if c in COUNTRY_COORDS
+        for c, v in stats.items() if c in coords
     ]
     result.sort(key=lambda c: c.events_count, reverse=True)
-    return ActiveCountriesResponse(countries=result, ignored_countries=sorted(ignored_countries))
+    return result, sorted(ignored_countries)
+
+
+@router.get("/countries/active", response_model=ActiveCountriesResponse)
+def get_active_countries(
+    days: int = Query(30, ge=1),
+    date_filter: Optional[date] = Query(None, alias="date"),
+    session: Session = Depends(get_db),
+):
+    """
+    Renvoie les pays qui ont des messages à une date précise (si 'date' fourni),
+    sinon dans les X derniers jours, avec le nombre d'événements et la dernière date d'activité.
+    Fournit aussi la liste des pays ignorés (non normalisés).
+    """
+    result, ignored_countries = compute_active_countries(session, days, date_filter)
+    return ActiveCountriesResponse(countries=result, ignored_countries=ignored_countries)
 
 @router.get("/countries", response_model=List[CountryActivity])
 def get_countries_activity(
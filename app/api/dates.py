@@ -1,10 +1,8 @@
 # app/api/dates.py
 from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
-from datetime import date
-from typing import List
+from sqlmodel import Session
 from app.database import get_db
-from app.models.message import Message
+from .aggregates import available_days
 from .schemas import DatesResponse
 
 router = APIRouter()
@@ -14,17 +12,4 @@ def get_available_dates(session: Session = Depends(get_db)):
     """
     Renvoie les 10 dernières dates (sur created_at) où il y a des messages.
     """
-    stmt = select(Message.created_at).order_by(Message.created_at.desc())
-    rows = session.exec(stmt).all()
-
-    seen = set()
-    dates_list: List[date] = []
-    for dt in rows:
-        d = dt.date()
-        if d not in seen:
-            seen.add(d)
-            dates_list.append(d)
-        if len(dates_list) >= 10:
-            break
-
-    return DatesResponse(dates=dates_list)
+    return DatesResponse(dates=available_days(session, 10))
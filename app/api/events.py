@@ -1,47 +1,127 @@
 # app/api/events.py
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from sqlalchemy import case, func
 from sqlmodel import Session, select
 from datetime import date, datetime
-from typing import List, Optional, Dict, Tuple
+from typing import List, Tuple
 from app.database import get_db
 from app.models.message import Message
 from .schemas import CountryEventsResponse, ZoneEvents, EventMessage
-from .utils import normalize_country_names, COUNTRY_ALIASES, COUNTRY_COORDS
+from .utils import cached_json_response, normalize_country_names, get_country_aliases, get_country_coords
+
+# Le dashboard garde les réponses en cache et les revalide par ETag
+EVENTS_CACHE_CONTROL = "private, no-cache"
+
+# Zone d'un message : (région, lieu) normalisés, calculés au stockage
+ZONE_COLUMNS = (Message.region_key, Message.location_key)
+# Variante "toute la période" : la région si elle est renseignée, sinon le lieu
+DISPLAY_ZONE_COLUMNS = (
+    case((Message.region_key != "", Message.region_key), else_=Message.location_key),
+)
 
 router = APIRouter()
 
+
+def country_values(session: Session, country: str, *conditions) -> List[str]:
+    """
+    Valeurs brutes de Message.country qui désignent ce pays (alias, listes "A, B") :
+    la normalisation se fait sur les valeurs distinctes, le filtrage des messages en SQL.
+    Sans condition, les valeurs distinctes sont lues par sauts dans l'index sur country
+    (une recherche par valeur) au lieu de parcourir tout l'index.
+    """
+    aliases = get_country_aliases()
+    if conditions:
+        stmt = select(Message.country).where(Message.country.is_not(None), *conditions).distinct()
+    else:
+        first = select(func.min(Message.country).label("value")).where(Message.country.is_not(None))
+        values = first.cte("country_values", recursive=True)
+        following = select(func.min(Message.country)).where(Message.country > values.c.value).scalar_subquery()
+        values = values.union_all(select(following).where(values.c.value.is_not(None)))
+        stmt = select(values.c.value).where(values.c.value.is_not(None))
+    return [raw for raw in session.exec(stmt).all() if country in normalize_country_names(raw, aliases)]
+
+
+def _grouped_messages(session: Session, conditions: list, zone_columns: tuple) -> List[Tuple[int, List[Message]]]:
+    """
+    Messages regroupés par zone (ordre chronologique), zones triées par nombre de messages
+    (GROUP BY), puis par premier message à égalité. Renvoie [(nombre, messages de la zone)].
+    """
+    count = func.count(Message.id)
+    summary = session.exec(
+        select(*zone_columns, count)
+        .where(*conditions)
+        .group_by(*zone_columns)
+        .order_by(count.desc(), func.min(Message.created_at), func.min(Message.id))
+    ).all()
+    buckets = {tuple(row[:-1]): (row[-1], []) for row in summary}
+    for row in session.exec(select(Message, *zone_columns).where(*conditions).order_by(Message.created_at, Message.id)).all():
+        buckets[tuple(row[1:])][1].append(row[0])
+    return list(buckets.values())
+
+
+def _event_message(m: Message) -> EventMessage:
+    url = None
+    if m.channel and m.telegram_message_id:
+        url = f"https://t.me/{m.channel}/{m.telegram_message_id}"
+
+    full_text = (m.translated_text or m.raw_text or "").strip()
+    preview = full_text[:277] + "..." if len(full_text) > 280 else full_text
+
+    return EventMessage(
+        id=m.id,
+        telegram_message_id=m.telegram_message_id,
+        channel=m.channel,
+        title=m.title,
+        source=m.source,
+        orientation=m.orientation,
+        event_timestamp=m.event_timestamp,
+        created_at=m.created_at,
+        url=url,
+        translated_text=full_text,
+        preview=preview,
+        incident_id=m.incident_id,
+    )
+
+
+def _zone_events(session: Session, conditions: list) -> List[ZoneEvents]:
+    zones_payload: List[ZoneEvents] = []
+    for count, items in _grouped_messages(session, conditions, ZONE_COLUMNS):
+        zones_payload.append(
+            ZoneEvents(
+                region=next((m.region for m in items if m.region), None),
+                location=next((m.location for m in items if m.location), None),
+                messages_count=count,
+                messages=[_event_message(m) for m in items],
+            )
+        )
+    return zones_payload
+
+
+def day_conditions(target_date: date) -> list:
+    return [
+        Message.created_at >= datetime.combine(target_date, datetime.min.time()),
+        Message.created_at <= datetime.combine(target_date, datetime.max.time()),
+    ]
+
+
 @router.get(
     "/countries/{country}/all-events",
     response_model=CountryEventsResponse,
 )
 def get_country_all_events(
+    request: Request,
     country: str,
     session: Session = Depends(get_db),
 ):
-    norm_country = country
-    if not norm_country or norm_country not in COUNTRY_COORDS:
+    if not country or country not in get_country_coords():
         raise HTTPException(status_code=404, detail="Pays non normalisé ou non géoréférencé")
 
-    stmt = select(Message).where(
-        Message.country.is_not(None),
-    )
-    msgs = session.exec(stmt).all()
-    msgs = [m for m in msgs if norm_country in normalize_country_names(m.country, COUNTRY_ALIASES)]
-
-    if not msgs:
+    values = country_values(session, country)
+    if not values:
         raise HTTPException(status_code=404, detail="Aucun événement pour ce pays")
+    conditions = [Message.country.in_(values)]
 
-    last_date = max(m.created_at for m in msgs).date()
-
-    import unicodedata
-    import re
-    def norm(val):
-        if val is None:
-            return ""
-        s = str(val).strip().lower()
-        s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-        s = re.sub(r'\s+', ' ', s)
-        return s
+    last_date = session.exec(select(func.max(Message.created_at)).where(*conditions)).one().date()
 
     def display_name(m):
         if m.region and m.region.strip():
@@ -50,241 +130,74 @@ def get_country_all_events(
             return m.location.strip()
         return "Zone inconnue"
 
-    def norm_display_name(m):
-        return norm(display_name(m))
-
-    buckets: Dict[str, List[Message]] = {}
-    for m in msgs:
-        key = norm_display_name(m)
-        buckets.setdefault(key, []).append(m)
-
-    zones_payload: List[ZoneEvents] = []
-
-    for key, items in buckets.items():
-        name = display_name(items[0])
-        event_messages: List[EventMessage] = []
-        for m in items:
-            url = None
-            if m.channel and m.telegram_message_id:
-                url = f"https://t.me/{m.channel}/{m.telegram_message_id}"
-
-            full_text = (m.translated_text or m.raw_text or "").strip()
-            preview = full_text[:277] + "..." if len(full_text) > 280 else full_text
-
-            event_messages.append(
-                EventMessage(
-                    id=m.id,
-                    telegram_message_id=m.telegram_message_id,
-                    channel=m.channel,
-                    title=m.title,
-                    source=m.source,
-                    orientation=m.orientation,
-                    event_timestamp=m.event_timestamp,
-                    created_at=m.created_at,
-                    url=url,
-                    translated_text=full_text,
-                    preview=preview,
-                )
-            )
-
-        zones_payload.append(
-            ZoneEvents(
-                region=name,
-                location=None,
-                messages_count=len(items),
-                messages=event_messages,
-            )
+    zones_payload = [
+        ZoneEvents(
+            region=display_name(items[0]),
+            location=None,
+            messages_count=count,
+            messages=[_event_message(m) for m in items],
         )
+        for count, items in _grouped_messages(session, conditions, DISPLAY_ZONE_COLUMNS)
+    ]
 
-    zones_payload.sort(key=lambda z: z.messages_count, reverse=True)
-
-    return CountryEventsResponse(
+    payload = CountryEventsResponse(
         date=last_date,
         country=country,
         zones=zones_payload,
     )
+    return cached_json_response(request, payload.model_dump(mode="json"), EVENTS_CACHE_CONTROL)
 
 @router.get(
     "/countries/{country}/latest-events",
     response_model=CountryEventsResponse,
 )
 def get_country_latest_events(
+    request: Request,
     country: str,
     session: Session = Depends(get_db),
 ):
-    norm_country = country
-    if not norm_country or norm_country not in COUNTRY_COORDS:
+    if not country or country not in get_country_coords():
         raise HTTPException(status_code=404, detail="Pays non normalisé ou non géoréférencé")
 
-    stmt_last = (
-        select(Message.created_at, Message.country)
-        .order_by(Message.created_at.desc())
-    )
-    rows = session.exec(stmt_last).all()
+    values = country_values(session, country)
     last_date = None
-    for created_at, raw_country in rows:
-        norm_countries = normalize_country_names(raw_country, COUNTRY_ALIASES)
-        if norm_country in norm_countries:
-            last_date = created_at
-            break
+    if values:
+        last_date = session.exec(
+            select(func.max(Message.created_at)).where(Message.country.in_(values))
+        ).one()
     if not last_date:
         raise HTTPException(status_code=404, detail="Aucun événement pour ce pays")
 
     target_date = last_date.date()
+    day = day_conditions(target_date)
+    conditions = day + [Message.country.in_(country_values(session, country, *day))]
 
-    start_dt = datetime.combine(target_date, datetime.min.time())
-    end_dt = datetime.combine(target_date, datetime.max.time())
-
-    stmt = select(Message).where(
-        Message.created_at >= start_dt,
-        Message.created_at <= end_dt,
-    )
-    msgs = session.exec(stmt).all()
-    msgs = [m for m in msgs if norm_country in normalize_country_names(m.country, COUNTRY_ALIASES)]
-
-    import unicodedata
-    import re
-    def norm(val):
-        if val is None:
-            return ""
-        s = str(val).strip().lower()
-        s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-        s = re.sub(r'\s+', ' ', s)
-        return s
-
-    buckets: Dict[Tuple[str, str], List[Message]] = {}
-    for m in msgs:
-        key = (norm(m.region), norm(m.location))
-        buckets.setdefault(key, []).append(m)
-
-    zones_payload: List[ZoneEvents] = []
-
-    for (region_key, location_key), items in buckets.items():
-        region = next((m.region for m in items if m.region), None)
-        location = next((m.location for m in items if m.location), None)
-        event_messages: List[EventMessage] = []
-        for m in items:
-            url = None
-            if m.channel and m.telegram_message_id:
-                url = f"https://t.me/{m.channel}/{m.telegram_message_id}"
-
-            full_text = (m.translated_text or m.raw_text or "").strip()
-            preview = full_text[:277] + "..." if len(full_text) > 280 else full_text
-
-            event_messages.append(
-                EventMessage(
-                    id=m.id,
-                    telegram_message_id=m.telegram_message_id,
-                    channel=m.channel,
-                    title=m.title,
-                    source=m.source,
-                    orientation=m.orientation,
-                    event_timestamp=m.event_timestamp,
-                    created_at=m.created_at,
-                    url=url,
-                    translated_text=full_text,
-                    preview=preview,
-                )
-            )
-
-        zones_payload.append(
-            ZoneEvents(
-                region=region,
-                location=location,
-                messages_count=len(items),
-                messages=event_messages,
-            )
-        )
-
-    zones_payload.sort(key=lambda z: z.messages_count, reverse=True)
-
-    return CountryEventsResponse(
+    payload = CountryEventsResponse(
         date=target_date,
         country=country,
-        zones=zones_payload,
+        zones=_zone_events(session, conditions),
     )
+    return cached_json_response(request, payload.model_dump(mode="json"), EVENTS_CACHE_CONTROL)
 
 @router.get(
     "/countries/{country}/events",
     response_model=CountryEventsResponse,
 )
 def get_country_events(
+    request: Request,
     country: str,
     target_date: date = Query(..., alias="date"),
     session: Session = Depends(get_db),
 ):
-    norm_country = country
-    if not norm_country or norm_country not in COUNTRY_COORDS:
+    if not country or country not in get_country_coords():
         raise HTTPException(status_code=404, detail="Pays non normalisé ou non géoréférencé")
 
-    start_dt = datetime.combine(target_date, datetime.min.time())
-    end_dt = datetime.combine(target_date, datetime.max.time())
+    day = day_conditions(target_date)
+    conditions = day + [Message.country.in_(country_values(session, country, *day))]
 
-    stmt = select(Message).where(
-        Message.created_at >= start_dt,
-        Message.created_at <= end_dt,
-    )
-    msgs = session.exec(stmt).all()
-    msgs = [m for m in msgs if norm_country in normalize_country_names(m.country, COUNTRY_ALIASES)]
-
-    import unicodedata
-    import re
-    def norm(val):
-        if val is None:
-            return ""
-        s = str(val).strip().lower()
-        s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-        s = re.sub(r'\s+', ' ', s)
-        return s
-
-    buckets: Dict[Tuple[str, str], List[Message]] = {}
-    for m in msgs:
-        key = (norm(m.region), norm(m.location))
-        buckets.setdefault(key, []).append(m)
-
-    zones_payload: List[ZoneEvents] = []
-
-    for (region_key, location_key), items in buckets.items():
-        region = next((m.region for m in items if m.region), None)
-        location = next((m.location for m in items if m.location), None)
-        event_messages: List[EventMessage] = []
-        for m in items:
-            url = None
-            if m.channel and m.telegram_message_id:
-                url = f"https://t.me/{m.channel}/{m.telegram_message_id}"
-
-            full_text = (m.translated_text or m.raw_text or "").strip()
-            preview = full_text[:277] + "..." if len(full_text) > 280 else full_text
-
-            event_messages.append(
-                EventMessage(
-                    id=m.id,
-                    telegram_message_id=m.telegram_message_id,
-                    channel=m.channel,
-                    title=m.title,
-                    source=m.source,
-                    orientation=m.orientation,
-                    event_timestamp=m.event_timestamp,
-                    created_at=m.created_at,
-                    url=url,
-                    translated_text=full_text,
-                    preview=preview,
-                )
-            )
-
-        zones_payload.append(
-            ZoneEvents(
-                region=region,
-                location=location,
-                messages_count=len(items),
-                messages=event_messages,
-            )
-        )
-
-    zones_payload.sort(key=lambda z: z.messages_count, reverse=True)
-
-    return CountryEventsResponse(
+    payload = CountryEventsResponse(
         date=target_date,
         country=country,
-        zones=zones_payload,
+        zones=_zone_events(session, conditions),
     )
+    return cached_json_response(request, payload.model_dump(mode="json"), EVENTS_CACHE_CONTROL)
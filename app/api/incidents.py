@@ -0,0 +1,169 @@
+# app/api/incidents.py
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.database import get_db
+from app.models.incident import Incident
+from app.models.message import Message
+from .events import EVENTS_CACHE_CONTROL, day_conditions, country_values
+from .schemas import CountryIncidentsResponse, IncidentSummary, ZoneIncidents
+from .utils import cached_json_response, get_country_coords
+
+router = APIRouter()
+
+
+def _check_country(country: str) -> None:
+    if not country or country not in get_country_coords():
+        raise HTTPException(status_code=404, detail="Pays non normalisé ou non géoréférencé")
+
+
+def _last_date(session: Session, country: str) -> Optional[datetime]:
+    values = country_values(session, country)
+    if not values:
+        return None
+    return session.exec(select(func.max(Message.created_at)).where(Message.country.in_(values))).one()
+
+
+def _incidents_payload(
+    session: Session,
+    country: str,
+    day: list,
+    response_date: Optional[date],
+) -> CountryIncidentsResponse:
+    """
+    Incidents des messages du pays (filtrés par `day` si non vide), regroupés par zone.
+    """
+    values = country_values(session, country, *day)
+    rows = session.exec(
+        select(Message.id, Message.incident_id, Message.source, Message.created_at)
+        .where(Message.country.in_(values), *day)
+    ).all() if values else []
+    if not rows:
+        raise HTTPException(status_code=404, detail="Aucun événement pour ce pays")
+
+    members: Dict[int, list] = {}
+    unclustered = 0
+    # Ordre des ids : départage les incidents à égalité comme avant (indépendant du plan)
+    for msg_id, incident_id, source, created_at in sorted(rows):
+        if incident_id is None:
+            unclustered += 1
+            continue
+        members.setdefault(incident_id, []).append((created_at, msg_id, source))
+
+    incidents = {
+        inc.id: inc
+        for inc in session.exec(select(Incident).where(Incident.id.in_(list(members)))).all()
+    } if members else {}
+    # Texte du premier message de chaque incident (aperçu)
+    first_ids = {min(items)[1] for items in members.values()}
+    texts = {
+        msg_id: (title, (translated or raw or "").strip())
+        for msg_id, title, translated, raw in session.exec(
+            select(Message.id, Message.title, Message.translated_text, Message.raw_text)
+            .where(Message.id.in_(list(first_ids)))
+        ).all()
+    } if first_ids else {}
+
+    zones: Dict[str, ZoneIncidents] = {}
+    for incident_id, items in members.items():
+        incident = incidents.get(incident_id)
+        if incident is None:
+            unclustered += len(items)
+            continue
+        items.sort()
+        title, full_text = texts.get(items[0][1], (None, ""))
+        preview = full_text[:277] + "..." if len(full_text) > 280 else full_text
+        zone = zones.setdefault(
+            incident.zone_key,
+            ZoneIncidents(region=incident.region, location=incident.location, messages_count=0, incidents=[]),
+        )
+        zone.messages_count += len(items)
+        zone.incidents.append(
+            IncidentSummary(
+                id=incident_id,
+                title=incident.title or title,
+                preview=preview,
+                messages_count=len(items),
+                message_ids=[msg_id for _, msg_id, _ in items],
+                sources=sorted({source for _, _, source in items if source}),
+                first_seen=incident.first_seen,
+                last_seen=incident.last_seen,
+            )
+        )
+
+    zones_payload: List[ZoneIncidents] = sorted(zones.values(), key=lambda z: z.messages_count, reverse=True)
+    for zone in zones_payload:
+        zone.incidents.sort(key=lambda i: (i.messages_count, i.last_seen), reverse=True)
+
+    return CountryIncidentsResponse(
+        date=response_date,
+        country=country,
+        zones=zones_payload,
+        unclustered_count=unclustered,
+    )
+
+
+@router.get(
+    "/countries/{country}/incidents",
+    response_model=CountryIncidentsResponse,
+)
+def get_country_incidents(
+    request: Request,
+    country: str,
+    target_date: Optional[date] = Query(None, alias="date"),
+    session: Session = Depends(get_db),
+):
+    """
+    Variante regroupée des endpoints d'événements : un élément par incident avec le nombre
+    de messages qui le rapportent, sans les textes complets. Avec date : comme /events,
+    sans date : toute la période.
+    """
+    _check_country(country)
+    day = day_conditions(target_date) if target_date is not None else []
+    payload = _incidents_payload(session, country, day, target_date)
+    return cached_json_response(request, payload.model_dump(mode="json"), EVENTS_CACHE_CONTROL)
+
+
+@router.get(
+    "/countries/{country}/all-incidents",
+    response_model=CountryIncidentsResponse,
+)
+def get_country_all_incidents(
+    request: Request,
+    country: str,
+    session: Session = Depends(get_db),
+):
+    """
+    Variante incidents de /all-events : toute la période, date = jour du dernier message.
+    """
+    _check_country(country)
+    last_date = _last_date(session, country)
+    if not last_date:
+        raise HTTPException(status_code=404, detail="Aucun événement pour ce pays")
+    payload = _incidents_payload(session, country, [], last_date.date())
+    return cached_json_response(request, payload.model_dump(mode="json"), EVENTS_CACHE_CONTROL)
+
+
+@router.get(
+    "/countries/{country}/latest-incidents",
+    response_model=CountryIncidentsResponse,
+)
+def get_country_latest_incidents(
+    request: Request,
+    country: str,
+    session: Session = Depends(get_db),
+):
+    """
+    Variante incidents de /latest-events : le dernier jour où le pays a des messages.
+    """
+    _check_country(country)
+    last_date = _last_date(session, country)
+    if not last_date:
+        raise HTTPException(status_code=404, detail="Aucun événement pour ce pays")
+    target_date = last_date.date()
+    payload = _incidents_payload(session, country, day_conditions(target_date), target_date)
+    return cached_json_response(request, payload.model_dump(mode="json"), EVENTS_CACHE_CONTROL)
@@ -0,0 +1,166 @@
+# app/api/map.py
+import math
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import union_all
+from sqlmodel import Session, select
+
+from app.database import get_db
+from app.models.message import Message
+from app.services.zones import grid_ranges, in_longitudes
+from .countries import compute_active_countries
+from .schemas import MapMarkersResponse, ZoneMarkersResponse
+from .utils import (
+    PAST_DAYS_CACHE_CONTROL,
+    cached_json_response,
+    get_country_aliases,
+    get_country_coords,
+    normalize_country_names,
+)
+
+router = APIRouter()
+
+# Bornes de zoom de la carte Leaflet (static/js/map.js)
+MIN_ZOOM = 2
+MAX_ZOOM = 8
+# Taille (px écran) d'une case de regroupement
+CLUSTER_CELL_PX = 48
+TILE_SIZE = 256
+# Emprise maximale (degrés) de /events/bbox : en deçà du zoom où la carte passe aux zones,
+# les pastilles pays de /map/markers suffisent
+MAX_BBOX_DEGREES = 120
+
+
+def _project(lat: float, lon: float, zoom: int) -> Tuple[float, float]:
+    """
+    Coordonnées pixel Web Mercator (celles de Leaflet) au niveau de zoom donné.
+    """
+    scale = TILE_SIZE * (2 ** zoom)
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lon + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def _cluster(markers: List[Tuple[float, float, int, str]], zoom: int) -> List[Tuple[float, float, int, List[int]]]:
+    """
+    Regroupement sur grille : les pastilles d'une même case écran fusionnent,
+    placées au barycentre pondéré par le nombre d'événements.
+    """
+    cells: Dict[Tuple[int, int], List[int]] = {}
+    for idx, (lat, lon, _, _) in enumerate(markers):
+        x, y = _project(lat, lon, zoom)
+        cells.setdefault((int(x // CLUSTER_CELL_PX), int(y // CLUSTER_CELL_PX)), []).append(idx)
+
+    clusters = []
+    for members in cells.values():
+        total = sum(markers[i][2] for i in members)
+        lat = sum(markers[i][0] * markers[i][2] for i in members) / total
+        lon = sum(markers[i][1] * markers[i][2] for i in members) / total
+        clusters.append((round(lat, 4), round(lon, 4), total, members))
+    clusters.sort(key=lambda c: c[2], reverse=True)
+    return clusters
+
+
+@router.get("/map/markers", response_model=MapMarkersResponse)
+def get_map_markers(
+    request: Request,
+    days: int = Query(30, ge=1),
+    date_filter: Optional[date] = Query(None, alias="date"),
+    session: Session = Depends(get_db),
+):
+    """
+    Pastilles de la carte en une seule réponse compacte : [lat, lon, count, pays] par pays actif,
+    plus les regroupements par niveau de zoom (jusqu'au premier niveau sans fusion).
+    """
+    countries, ignored = compute_active_countries(session, days, date_filter)
+    coords = get_country_coords()
+    markers = [
+        (coords[c.country][0], coords[c.country][1], c.events_count, c.country)
+        for c in countries
+    ]
+
+    clusters: Dict[int, List[Tuple[float, float, int, List[int]]]] = {}
+    for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+        level = _cluster(markers, zoom)
+        if all(len(members) == 1 for _, _, _, members in level):
+            # Plus aucune fusion à ce zoom ni aux suivants : le client affiche les pastilles brutes
+            break
+        clusters[zoom] = level
+
+    payload = MapMarkersResponse(markers=markers, clusters=clusters, ignored=ignored)
+    return cached_json_response(request, payload.model_dump(mode="json"), _markers_cache_control(date_filter))
+
+
+def _markers_cache_control(date_filter: Optional[date]) -> str:
+    if date_filter and date_filter < datetime.utcnow().date():
+        return PAST_DAYS_CACHE_CONTROL
+    return "public, max-age=60, stale-while-revalidate=600"
+
+
+@router.get("/events/bbox", response_model=ZoneMarkersResponse)
+def get_zone_markers(
+    request: Request,
+    west: float = Query(..., ge=-540, le=540),
+    south: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-540, le=540),
+    north: float = Query(..., ge=-90, le=90),
+    zoom: int = Query(MAX_ZOOM, ge=MIN_ZOOM, le=MAX_ZOOM),
+    days: int = Query(30, ge=1),
+    date_filter: Optional[date] = Query(None, alias="date"),
+    session: Session = Depends(get_db),
+):
+    """
+    Pastilles par zone géocodée (Message.lat / lon) dans l'emprise visible, à une date ou
+    sur les X derniers jours, regroupées pour le zoom demandé. Les messages sont lus par
+    intervalles de cases de la grille spatiale (index grid_cell, created_at).
+    """
+    if east < west or north < south:
+        raise HTTPException(status_code=400, detail="Emprise invalide")
+    if east - west > MAX_BBOX_DEGREES or north - south > MAX_BBOX_DEGREES:
+        raise HTTPException(status_code=400, detail="Emprise trop grande : utiliser /api/map/markers")
+
+    start = date_filter or (datetime.utcnow() - timedelta(days=days)).date()
+    period = [Message.created_at >= datetime.combine(start, datetime.min.time())]
+    if date_filter:
+        period.append(Message.created_at < datetime.combine(date_filter + timedelta(days=1), datetime.min.time()))
+    # Une branche par intervalle de cases plutôt qu'un OR : l'index (grid_cell, created_at)
+    # sert chaque intervalle, au lieu d'un parcours de toute la période par created_at
+    parts = [
+        select(Message.lat, Message.lon, Message.country, Message.region, Message.location)
+        .where(Message.grid_cell.between(first, last), *period)
+        for first, last in grid_ranges(west, south, east, north)
+    ]
+    rows = session.execute(parts[0] if len(parts) == 1 else union_all(*parts)).all()
+
+    # Une pastille par (coordonnées, pays) ; libellé = nom de zone le plus cité
+    aliases = get_country_aliases()
+    coords = get_country_coords()
+    zones: Dict[Tuple[float, float, str], Counter] = {}
+    for lat, lon, raw_country, region, location in rows:
+        if not (south <= lat <= north and in_longitudes(lon, west, east)):
+            continue
+        countries = [c for c in normalize_country_names(raw_country, aliases) if c in coords]
+        if not countries:
+            continue
+        label = (location or "").strip() or (region or "").strip() or None
+        zones.setdefault((lat, lon, countries[0]), Counter())[label] += 1
+    markers = sorted(
+        (
+            (lat, lon, sum(labels.values()), country, labels.most_common(1)[0][0])
+            for (lat, lon, country), labels in zones.items()
+        ),
+        key=lambda m: m[2],
+        reverse=True,
+    )
+
+    payload = ZoneMarkersResponse(
+        zoom=zoom,
+        markers=markers,
+        clusters=_cluster([m[:4] for m in markers], zoom),
+    )
+    return cached_json_response(request, payload.model_dump(mode="json"), _markers_cache_control(date_filter))
@@ -0,0 +1,66 @@
+# app/api/profiling.py
+import hmac
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.services.profiling import SamplingProfiler, SQLCapture
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_PARAM = "profile"
+# Flux sans fin (SSE) : leur corps ne se termine jamais, ils ne sont pas profilés
+STREAMING_PATHS = ("/api/stream",)
+
+
+def _requested_token(request: Request) -> str:
+    return request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_PARAM) or ""
+
+
+def install_profiling(app: FastAPI, token: str) -> None:
+    """
+    Ajoute le profilage à la demande des routes /api : une requête portant le jeton
+    (en-tête X-Profile-Token ou ?profile=<jeton>) renvoie, à la place de sa réponse, le
+    rapport de l'échantillonneur et la liste des requêtes SQL exécutées avec leur durée.
+    ?profile_format=folded renvoie les piles repliées brutes (flamegraph.pl, speedscope).
+    Les flux SSE (/api/stream, réponses text/event-stream) sont servis sans profilage.
+    N'est appelé que si PROFILE_TOKEN est défini : sinon aucun middleware n'est ajouté.
+    """
+    interval = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if (
+            not request.url.path.startswith("/api")
+            or request.url.path.startswith(STREAMING_PATHS)
+            or not hmac.compare_digest(_requested_token(request).encode(), token.encode())
+        ):
+            return await call_next(request)
+
+        # Le profileur échantillonne tous les threads : des requêtes concurrentes
+        # apparaissent aussi dans les piles (pas les requêtes SQL, liées au contexte)
+        start = time.perf_counter()
+        with SQLCapture() as sql, SamplingProfiler(interval) as profiler:
+            response = await call_next(request)
+            streaming = response.headers.get("content-type", "").startswith("text/event-stream")
+            size = 0
+            # La réponse est consommée sous profilage : le travail d'un flux fini en fait partie
+            if not streaming:
+                async for chunk in response.body_iterator:
+                    size += len(chunk)
+        if streaming:
+            return response
+        elapsed = time.perf_counter() - start
+
+        if request.query_params.get("profile_format") == "folded":
+            return PlainTextResponse(profiler.folded())
+        return JSONResponse({
+            "path": request.url.path,
+            "query": str(request.url.query),
+            "status_code": response.status_code,
+            "response_bytes": size,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "profile": profiler.report(),
+            "sql": sql.report(top=None),
+        })
@@ -1,6 +1,6 @@
 # app/api/schemas.py
 from datetime import date, datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel
 
 class DatesResponse(BaseModel):
@@ -31,6 +31,7 @@ class EventMessage(BaseModel):
     url: Optional[str]
     translated_text: Optional[str] = None
     preview: str
+    incident_id: Optional[int] = None
 
 class ZoneEvents(BaseModel):
     region: Optional[str]
@@ -42,3 +43,50 @@ class CountryEventsResponse(BaseModel):
     date: date
     country: str
     zones: List[ZoneEvents]
+
+class IncidentSummary(BaseModel):
+    id: int
+    title: Optional[str]
+    preview: str
+    # Membres de l'incident sur la période demandée
+    messages_count: int
+    message_ids: List[int]
+    sources: List[str]
+    first_seen: datetime
+    last_seen: datetime
+
+class ZoneIncidents(BaseModel):
+    region: Optional[str]
+    location: Optional[str]
+    messages_count: int
+    incidents: List[IncidentSummary]
+
+class CountryIncidentsResponse(BaseModel):
+    date: Optional[date]
+    country: str
+    zones: List[ZoneIncidents]
+    # Messages antérieurs au regroupement (sans incident)
+    unclustered_count: int
+
+class MapMarkersResponse(BaseModel):
+    # [lat, lon, count, pays]
+    markers: List[Tuple[float, float, int, str]]
+    # zoom -> [lat, lon, count, [indices dans markers]]
+    clusters: Dict[int, List[Tuple[float, float, int, List[int]]]]
+    ignored: List[str]
+
+class ZoneMarkersResponse(BaseModel):
+    zoom: int
+    # [lat, lon, count, pays, zone] ; zone vide : seul le pays est connu (centroïde)
+    markers: List[Tuple[float, float, int, str, Optional[str]]]
+    # [lat, lon, count, [indices dans markers]] au zoom demandé
+    clusters: List[Tuple[float, float, int, List[int]]]
+
+class ActivityMatrixResponse(BaseModel):
+    start: date
+    end: date
+    dates: List[date]
+    countries: List[str]
+    # counts[i][j] : messages du pays countries[i] le jour dates[j]
+    counts: List[List[int]]
+    totals: List[int]
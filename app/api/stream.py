@@ -0,0 +1,161 @@
+# app/api/stream.py
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import select, func
+
+from app.config import Settings
+from app.database import get_read_session
+from app.models.message import Message
+from .utils import normalize_country_names, get_country_aliases, get_country_coords
+
+router = APIRouter()
+
+# Nombre max de lignes lues par requête de delta
+DELTA_PAGE_SIZE = 5000
+# Intervalle (s) de lecture des nouveautés (Settings.stream_poll_seconds). L'API n'instancie
+# pas Settings, dont les clés OpenAI / Telegram sont obligatoires : même variable, même défaut
+POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", Settings.model_fields["stream_poll_seconds"].default))
+# Intervalle des commentaires keep-alive (proxys qui coupent les connexions muettes)
+KEEPALIVE_SECONDS = 15.0
+
+
+def _current_max_id() -> int:
+    with get_read_session() as session:
+        return session.exec(select(func.max(Message.id))).one() or 0
+
+
+def _compute_delta(last_id: int) -> Optional[Dict]:
+    """
+    Lit les messages insérés depuis last_id et les résume en delta compact :
+    ids, incréments par (pays, date) et dates rencontrées.
+    """
+    rows: List[Tuple[int, Optional[str], object]] = []
+    cursor = last_id
+    with get_read_session() as session:
+        while True:
+            stmt = (
+                select(Message.id, Message.country, Message.created_at)
+                .where(Message.id > cursor)
+                .order_by(Message.id)
+                .limit(DELTA_PAGE_SIZE)
+            )
+            page = session.exec(stmt).all()
+            rows.extend(page)
+            if len(page) < DELTA_PAGE_SIZE:
+                break
+            cursor = page[-1][0]
+
+    if not rows:
+        return None
+
+    aliases = get_country_aliases()
+    coords = get_country_coords()
+    counts: Dict[Tuple[str, str], int] = {}
+    dates: Set[str] = set()
+    for _, country, created_at in rows:
+        day = created_at.date().isoformat()
+        dates.add(day)
+        for norm_country in normalize_country_names((country or "").strip(), aliases):
+            if norm_country not in coords:
+                continue
+            counts[(norm_country, day)] = counts.get((norm_country, day), 0) + 1
+
+    return {
+        "last_id": rows[-1][0],
+        "ids": [r[0] for r in rows],
+        "counts": [[c, d, n] for (c, d), n in counts.items()],
+        "dates": sorted(dates, reverse=True),
+    }
+
+
+class StreamHub:
+    """
+    Diffusion des nouveautés à tous les dashboards connectés.
+    Une seule tâche interroge la base, chaque client reçoit le même delta.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def publish(self, event: str, payload: Dict) -> None:
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait((event, payload))
+            except asyncio.QueueFull:
+                # Client trop lent : on vide sa file et on lui demande un rechargement complet
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("reset", {}))
+
+    async def _run(self) -> None:
+        try:
+            self.last_id = await asyncio.to_thread(_current_max_id)
+            while self.subscribers:
+                await asyncio.sleep(POLL_SECONDS)
+                try:
+                    delta = await asyncio.to_thread(_compute_delta, self.last_id)
+                except Exception as e:
+                    print(f"[stream] Erreur lecture des nouveautés : {e}")
+                    continue
+                if delta is None:
+                    continue
+                self.last_id = delta["last_id"]
+                self.publish("delta", delta)
+        finally:
+            # Plus aucun abonné : le prochain repartira de l'état courant de la base
+            self.last_id = None
+
+
+hub = StreamHub()
+
+
+def _format_event(event: str, payload: Dict) -> str:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.get("/stream", include_in_schema=False)
+async def stream_updates(request: Request):
+    """
+    Flux Server-Sent Events : pousse les deltas (nouveaux ids, incréments par pays,
+    nouvelles dates) dès que le pipeline a inséré des messages.
+    """
+    queue = hub.subscribe()
+
+    async def event_source():
+        try:
+            yield "retry: 10000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event, payload = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _format_event(event, payload)
+        finally:
+            hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,11 @@
 # app/api/utils.py
 import os
 import json
-from typing import Dict
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict
+
+from fastapi import Request, Response
 
 # Fonction utilitaire pour charger les alias depuis countries.json et normaliser les noms de pays
 def normalize_country_names(name: str, aliases: dict) -> list:
@@ -16,7 +20,35 @@ def normalize_country_names(name: str, aliases: dict) -> list:
     return result
 
 COUNTRIES_JSON_PATH = os.path.join(os.path.dirname(__file__), '../../static/data/countries.json')
-with open(COUNTRIES_JSON_PATH, encoding='utf-8') as f:
-    _countries_data = json.load(f)
-    COUNTRY_ALIASES = _countries_data.get('aliases', {})
-    COUNTRY_COORDS = _countries_data.get('coordinates', {})
+
+
+@lru_cache
+def _load_countries_data() -> Dict[str, Dict]:
+    # Lu au premier appel, pas à l'import
+    with open(COUNTRIES_JSON_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_country_aliases() -> Dict[str, str]:
+    return _load_countries_data().get('aliases', {})
+
+
+def get_country_coords() -> Dict[str, list]:
+    return _load_countries_data().get('coordinates', {})
+
+
+# Jours passés : rarement modifiés mais pas figés (backfill, étape rejouée, purge des
+# messages anciens) ; cache court, puis revalidation par ETag (304 sans corps)
+PAST_DAYS_CACHE_CONTROL = "public, max-age=300"
+
+
+def cached_json_response(request: Request, payload: Any, cache_control: str) -> Response:
+    """
+    Réponse JSON compacte avec ETag : renvoie 304 sans corps si le client a déjà cette version.
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
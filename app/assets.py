@@ -0,0 +1,166 @@
+# app/assets.py
+"""
+Fichiers statiques empreintés, sans étape de build : au démarrage, le contenu de static/
+est haché et servi sous /static/<version>/... avec Cache-Control immutable. La version
+couvre tout le dossier : les imports relatifs des modules JS (./map.js) restent valides
+et changent de version en même temps que la page.
+Les variantes gzip / brotli sont précalculées en mémoire (brotli si le module est installé).
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # gzip seul
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".json", ".svg", ".html", ".txt", ".map"}
+MIN_COMPRESS_BYTES = 256
+VERSION_LENGTH = 12
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# URL sans version (ou d'une version précédente) : le navigateur revalide à chaque fois
+REVALIDATE = "no-cache"
+
+
+@dataclass
+class Asset:
+    body: bytes
+    media_type: str
+    digest: str
+    # encodage ("br", "gzip") -> corps compressé, seulement s'il est plus petit
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    def etag(self, encoding: Optional[str]) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+@dataclass
+class AssetManifest:
+    version: str
+    assets: Dict[str, Asset]
+    # (chemin, mtime, taille) de chaque fichier, comparé en mode STATIC_WATCH
+    stamp: Tuple
+
+
+def _media_type(path: Path) -> str:
+    if path.suffix == ".js":
+        # Type exigé pour les <script type="module">, quel que soit mimetypes du système
+        return "text/javascript"
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def _compress(body: bytes) -> Dict[str, bytes]:
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return {enc: data for enc, data in variants.items() if len(data) < len(body)}
+
+
+def _files(directory: Path):
+    return sorted(
+        p for p in directory.rglob("*")
+        if p.is_file() and not any(part.startswith(".") for part in p.relative_to(directory).parts)
+    )
+
+
+def _stamp(directory: Path) -> Tuple:
+    stamp = []
+    for path in _files(directory):
+        stat = path.stat()
+        stamp.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def build_manifest(directory: Path) -> AssetManifest:
+    assets: Dict[str, Asset] = {}
+    version = hashlib.sha256()
+    for path in _files(directory):
+        name = path.relative_to(directory).as_posix()
+        body = path.read_bytes()
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        version.update(f"{name}\0{digest}\0".encode())
+        variants = {}
+        if path.suffix in COMPRESSIBLE_SUFFIXES and len(body) >= MIN_COMPRESS_BYTES:
+            variants = _compress(body)
+        assets[name] = Asset(body=body, media_type=_media_type(path), digest=digest, variants=variants)
+    return AssetManifest(version=version.hexdigest()[:VERSION_LENGTH], assets=assets, stamp=_stamp(directory))
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etags(header: str) -> set:
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+class StaticAssets:
+    """
+    Route /static/{path} : /static/<version>/<fichier> (empreinté, immutable) ; les URL
+    sans version et celles d'une version précédente (page en cache d'avant un déploiement)
+    sont servies avec revalidation.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        # STATIC_WATCH=true (développement, avec uvicorn --reload) : l'empreinte est
+        # recalculée dès qu'un fichier change, sans redémarrer
+        self.watch = os.getenv("STATIC_WATCH", "").strip().lower() in ("1", "true", "yes")
+        self._manifest: Optional[AssetManifest] = None
+        self._lock = threading.Lock()
+
+    def manifest(self) -> AssetManifest:
+        manifest = self._manifest
+        if manifest is not None and (not self.watch or manifest.stamp == _stamp(self.directory)):
+            return manifest
+        with self._lock:
+            if self._manifest is manifest:
+                self._manifest = build_manifest(self.directory)
+            return self._manifest
+
+    def url(self, path: str) -> str:
+        """URL empreintée d'un fichier de static/ (fonction static_url des templates)."""
+        return f"/static/{self.manifest().version}/{path.lstrip('/')}"
+
+    def _resolve(self, path: str, manifest: AssetManifest) -> Tuple[Optional[Asset], str]:
+        version, _, rest = path.partition("/")
+        if version == manifest.version:
+            return manifest.assets.get(rest), IMMUTABLE
+        if len(version) == VERSION_LENGTH and rest in manifest.assets:
+            return manifest.assets[rest], REVALIDATE
+        return manifest.assets.get(path), REVALIDATE
+
+    async def endpoint(self, request: Request) -> Response:
+        asset, cache_control = self._resolve(request.path_params["path"], self.manifest())
+        if asset is None:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((enc for enc in ("br", "gzip") if enc in accepted and enc in asset.variants), None)
+        headers = {
+            "Cache-Control": cache_control,
+            "ETag": asset.etag(encoding),
+            "Vary": "Accept-Encoding",
+        }
+        if headers["ETag"] in _etags(request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        body = asset.variants[encoding] if encoding else asset.body
+        return Response(body, media_type=asset.media_type, headers=headers)
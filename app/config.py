@@ -21,6 +21,12 @@ class Settings(BaseSettings):
 
     openai_api_key: str
     openai_model: str = "gpt-4o-mini"
+    # Autre point d'accès compatible (ex. tools/fake_openai.py pour les tests locaux)
+    openai_base_url: str | None = None
+
+    # Soumission via la Batch API (run de nuit : moins cher, sans limite par minute)
+    openai_batch: bool = False
+    openai_batch_poll_seconds: int = 30
 
     telegram_api_id: int
     telegram_api_hash: str
@@ -31,6 +37,43 @@ class Settings(BaseSettings):
     max_messages_per_channel: int = 50
     batch_size: int = 20
 
+    # Pré-extraction locale pays / lieux avant l'enrichissement LLM
+    local_enrichment: bool = True
+
+    # Lignes d'en-tête / pied répétées par canal, retirées avant les étapes LLM
+    boilerplate_stripping: bool = True
+    boilerplate_min_ratio: float = 0.4
+
+    # Préfiltre de pertinence avant le LLM (app/services/relevance.py) : règles de
+    # static/data/relevance_rules.json puis modèle entraîné par tools/train_relevance.py
+    relevance_filter: bool = True
+    relevance_model_path: str = "data/relevance_model.npz"
+    relevance_threshold: float = 0.2
+
+    # Ordonnancement des étapes LLM (app/services/scheduler.py) : budget de tokens estimés
+    # par run (0 = illimité), priorité des canaux sans ":priorité" dans SOURCES_TELEGRAM
+    llm_token_budget: int = 0
+    channel_default_priority: int = 0
+    # Envois sans réponse d'un même message avant repli (texte d'origine pour la traduction,
+    # champs vides pour l'enrichissement) au lieu d'un nouvel essai au run suivant
+    llm_max_attempts: int = 3
+
+    # Regroupement des messages en incidents (app/services/incidents.py)
+    incident_window_hours: int = 6
+    incident_similarity: float = 0.45
+
+    # Publication d'un snapshot SQLite en lecture seule pour l'API en fin de run
+    publish_snapshot: bool = False
+
+    # Intervalle (s) de lecture des nouveautés du flux SSE /api/stream. Lu par l'API via
+    # l'environnement (l'API tourne sans les clés OpenAI / Telegram requises ici)
+    stream_poll_seconds: float = 5.0
+
+    # Mode shardé (plusieurs workers run_pipeline se partagent les canaux)
+    shard_lease_ttl_seconds: int = 300
+    shard_channels_per_lease: int = 10
+    shard_cycle_minutes: int = 60
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -1,44 +1,248 @@
 # app/database.py
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 import os
+import threading
+import warnings
 
 
+from sqlalchemy import bindparam, event, inspect, select, text, update
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError, SAWarning
+from sqlalchemy.schema import CreateIndex
 from sqlmodel import SQLModel, create_engine, Session
 
 # Nouvelle logique :
 # 1. Si pas de db locale -> on regarde DB_URL
 # 2. Si pas de DB_URL -> on crée une db locale
+# L'engine n'est créé qu'au premier usage (pas d'effet de bord à l'import).
 
 DB_PATH = Path("data/osint.db")
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-db_url = os.getenv("DB_URL")
-if db_url:
-    # Ajoute sslmode=require si PostgreSQL et pas déjà présent
-    if db_url.startswith("postgres") and "sslmode" not in db_url:
-        sep = '&' if '?' in db_url else '?'
-        db_url = f"{db_url}{sep}sslmode=require"
-    DATABASE_URL = db_url
-    print(f"[DEBUG] DATABASE_URL utilisé : {DATABASE_URL}")
-    is_sqlite = DATABASE_URL.startswith("sqlite")
-else:
-    DATABASE_URL = f"sqlite:///{DB_PATH}"
-    is_sqlite = True
-
-# 2) Création de l'engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    # check_same_thread uniquement pour SQLite
-    connect_args={"check_same_thread": False} if is_sqlite else {},
-)
+
+# Snapshot en lecture seule publié par le pipeline (app/services/snapshot.py).
+# L'API le lit à la place de la base d'ingestion si API_READ_SNAPSHOT=true.
+SNAPSHOT_MMAP_BYTES = 256 * 1024 * 1024
+
+ZONE_BACKFILL_CHUNK = 5000
+
+
+def get_database_url() -> str:
+    db_url = os.getenv("DB_URL")
+    if db_url:
+        # Ajoute sslmode=require si PostgreSQL et pas déjà présent
+        if db_url.startswith("postgres") and "sslmode" not in db_url:
+            sep = '&' if '?' in db_url else '?'
+            db_url = f"{db_url}{sep}sslmode=require"
+        return db_url
+    return f"sqlite:///{DB_PATH}"
+
+
+@lru_cache
+def get_engine() -> Engine:
+    database_url = get_database_url()
+    is_sqlite = database_url.startswith("sqlite")
+    if database_url == f"sqlite:///{DB_PATH}":
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    else:
+        print(f"[DEBUG] DATABASE_URL utilisé : {make_url(database_url).render_as_string(hide_password=True)}")
+
+    return create_engine(
+        database_url,
+        echo=False,
+        # check_same_thread uniquement pour SQLite
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+    )
+
+
+def get_snapshot_path() -> Path:
+    return Path(os.getenv("SNAPSHOT_PATH", "data/snapshot.db"))
+
+
+def _snapshot_enabled() -> bool:
+    return os.getenv("API_READ_SNAPSHOT", "").strip().lower() in ("1", "true", "yes")
+
+
+def _create_snapshot_engine(path: Path) -> Engine:
+    # immutable=1 : ni verrou ni journal, SQLite sait que le fichier ne changera pas
+    engine = create_engine(
+        f"sqlite:///file:{path.resolve()}?mode=ro&immutable=1&uri=true",
+        echo=False,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"PRAGMA mmap_size={SNAPSHOT_MMAP_BYTES}")
+        cursor.execute("PRAGMA query_only=1")
+        cursor.close()
+
+    return engine
+
+
+_snapshot_lock = threading.Lock()
+_snapshot_state: dict = {"key": None, "engine": None}
+
+
+def _get_snapshot_engine() -> Optional[Engine]:
+    """
+    Engine du snapshot courant. Le pipeline remplace le fichier par os.replace : un nouvel
+    inode (ou mtime) signifie un nouveau snapshot, on rouvre alors un engine et on libère
+    l'ancien (les requêtes en cours finissent sur l'ancien fichier).
+    """
+    path = get_snapshot_path()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns)
+    with _snapshot_lock:
+        if _snapshot_state["key"] != key:
+            previous = _snapshot_state["engine"]
+            _snapshot_state["engine"] = _create_snapshot_engine(path)
+            _snapshot_state["key"] = key
+            if previous is not None:
+                previous.dispose()
+        return _snapshot_state["engine"]
+
+
+def get_read_engine() -> Engine:
+    """
+    Engine des lectures de l'API : le snapshot s'il est activé et publié, sinon la base.
+    """
+    if _snapshot_enabled():
+        engine = _get_snapshot_engine()
+        if engine is not None:
+            return engine
+    return get_engine()
+
+
+def is_snapshot_engine(engine: Engine) -> bool:
+    return engine.url.query.get("immutable") == "1"
+
+
+def _migrate_columns(engine: Engine) -> None:
+    """
+    create_all ne modifie pas une table existante : on ajoute les colonnes (nullables)
+    apparues dans les modèles depuis la création de la base, avec leurs index.
+    """
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        missing = [col for col in table.columns if col.name not in existing and col.nullable]
+        if not missing:
+            continue
+        for column in missing:
+            col_type = column.type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {col_type}"
+                    ))
+                print(f"[db] Colonne ajoutée : {table.name}.{column.name}")
+            except (OperationalError, ProgrammingError):
+                # Ajoutée entre-temps par un autre worker
+                pass
+        for index in table.indexes:
+            if any(col in missing for col in index.columns):
+                try:
+                    index.create(engine, checkfirst=True)
+                except (OperationalError, ProgrammingError):
+                    pass
+
+
+def _migrate_indexes(engine: Engine) -> None:
+    """
+    create_all ne crée pas non plus les index ajoutés depuis à une table existante.
+    """
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        with warnings.catch_warnings():
+            # SQLite ne sait pas refléter les index sur expression : IF NOT EXISTS
+            # les laisse en place
+            warnings.simplefilter("ignore", SAWarning)
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except (IntegrityError, OperationalError, ProgrammingError):
+                # Créé au même moment par un autre worker
+                pass
+
+
+def _backfill_zone_keys(engine: Engine) -> None:
+    """
+    Calcule region_key / location_key des messages stockés avant l'ajout de ces colonnes.
+    """
+    from app.models.message import Message
+    from app.services.zones import normalize_zone
+
+    table = Message.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(region_key=bindparam("b_region_key"), location_key=bindparam("b_location_key"))
+    )
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.region, table.c.location)
+                .where(table.c.region_key.is_(None))
+                .limit(ZONE_BACKFILL_CHUNK)
+            ).all()
+            if not rows:
+                break
+            conn.execute(stmt, [
+                {
+                    "b_id": row.id,
+                    "b_region_key": normalize_zone(row.region),
+                    "b_location_key": normalize_zone(row.location),
+                }
+                for row in rows
+            ])
+        total += len(rows)
+    if total:
+        print(f"[db] Clés de zone calculées pour {total} messages existants")
 
 
 def init_db() -> None:
     # importe les modèles pour que SQLModel connaisse les tables
-    from app.models.message import Message  # noqa: F401
-    SQLModel.metadata.create_all(engine)
+    from app.models.message import Message
+    from app.models.channel_lease import ChannelLease
+    from app.models.incident import Incident
+    from app.models.staged_message import StagedMessage
+    from app.models.channel_boilerplate import ChannelBoilerplate
+    from app.models.discarded_message import DiscardedMessage
+    from app.models.backfill_checkpoint import BackfillCheckpoint
+    from app.models.geocode_cache import GeocodeCache
+    # Les tables propres au snapshot (DailyCount) ne sont pas créées dans la base d'ingestion
+    tables = [
+        model.__table__
+        for model in (
+            Message, ChannelLease, Incident, StagedMessage, ChannelBoilerplate, DiscardedMessage,
+            BackfillCheckpoint, GeocodeCache,
+        )
+    ]
+    engine = get_engine()
+    try:
+        SQLModel.metadata.create_all(engine, tables=tables)
+    except (OperationalError, ProgrammingError):
+        # Plusieurs workers démarrés en même temps : un autre a créé les tables entre-temps
+        SQLModel.metadata.create_all(engine, tables=tables)
+    _migrate_columns(engine)
+    _migrate_indexes(engine)
+    _backfill_zone_keys(engine)
 
 
 
@@ -47,11 +251,17 @@ from typing import Generator
 
 @contextmanager
 def get_session() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
+        yield session
+
+
+@contextmanager
+def get_read_session() -> Generator[Session, None, None]:
+    with Session(get_read_engine()) as session:
         yield session
 
 
-# Dépendance FastAPI
+# Dépendance FastAPI (lectures : snapshot si disponible)
 def get_db():
-    with Session(engine) as session:
+    with Session(get_read_engine()) as session:
         yield session
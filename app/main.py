@@ -1,30 +1,54 @@
 # app/main.py
+from contextlib import asynccontextmanager
 from pathlib import Path
+import os
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from app.database import init_db
-init_db()
 
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from app.api import router as api_router
+from app.api.compression import install_compression
+from app.assets import StaticAssets
 
-app = FastAPI(title="OSINT Dashboard (from scratch)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Création des tables au démarrage du serveur, pas à l'import du module
+    init_db()
+    # Empreinte et variantes compressées des fichiers statiques, avant la première requête
+    assets.manifest()
+    yield
+
+
+app = FastAPI(title="OSINT Dashboard (from scratch)", lifespan=lifespan)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
+# /static/<version>/... : empreinte du contenu, variantes gzip / brotli, cache immutable
+assets = StaticAssets(BASE_DIR / "static")
+app.add_route("/static/{path:path}", assets.endpoint, methods=["GET"], include_in_schema=False)
 
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+templates.env.globals["static_url"] = assets.url
 
 
 app.include_router(api_router, prefix="/api")
 
+# Profilage à la demande des routes /api : sans PROFILE_TOKEN, aucun middleware n'est ajouté
+if os.getenv("PROFILE_TOKEN"):
+    from app.api.profiling import install_profiling
+    install_profiling(app, os.getenv("PROFILE_TOKEN"))
+
+# Réponses JSON de /api compressées au-delà du seuil (hors flux SSE). Ajouté après le
+# profilage, donc autour de lui : le rapport mesure la réponse avant compression
+install_compression(app, minimum_size=int(os.getenv("API_GZIP_MIN_BYTES", "1024")))
+
 
 # Route pour la racine qui redirige vers /dashboard
 from fastapi.responses import RedirectResponse
@@ -0,0 +1,23 @@
+# app/models/backfill_checkpoint.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class BackfillCheckpoint(SQLModel, table=True):
+    """
+    Avancement de la reprise d'historique d'un canal (tools/backfill.py).
+    L'historique est lu du plus récent au plus ancien : offset_id est le plus ancien
+    message déjà confié au pipeline, la reprise repart juste avant lui.
+    """
+    channel: str = Field(primary_key=True)
+
+    # Date la plus ancienne demandée
+    since: datetime
+    offset_id: int | None = None
+    offset_date: datetime | None = None
+    messages: int = 0
+
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Historique lu jusqu'à `since` (ou jusqu'au premier message du canal)
+    completed_at: datetime | None = None
@@ -0,0 +1,32 @@
+# app/models/channel_boilerplate.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import UniqueConstraint
+
+
+class ChannelBoilerplate(SQLModel, table=True):
+    """
+    Ligne répétée en tête ou en pied des messages d'un canal (abonnement, signature,
+    bannière), apprise par app/services/boilerplate.py et retirée avant les étapes LLM.
+    """
+    id: int | None = Field(default=None, primary_key=True)
+
+    channel: str = Field(index=True)
+    # "prefix" ou "suffix"
+    position: str
+    line: str
+
+    # Part des messages récents du canal qui portaient la ligne au dernier apprentissage
+    support: float = 0.0
+    active: bool = Field(default=True, index=True)
+
+    # Cumul depuis la création : messages nettoyés et caractères retirés avant le LLM
+    messages_stripped: int = 0
+    chars_saved: int = 0
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    learned_at: datetime = Field(default_factory=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("channel", "position", "line", name="uq_boilerplate_channel_line"),
+    )
@@ -0,0 +1,18 @@
+# app/models/channel_lease.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class ChannelLease(SQLModel, table=True):
+    """
+    Attribution d'un canal Telegram à un worker d'ingestion (mode shardé).
+    Un bail expiré (worker planté) peut être repris par un autre worker.
+    """
+    channel: str = Field(primary_key=True)
+
+    worker_id: str | None = Field(default=None, index=True)
+    expires_at: datetime | None = Field(default=None, index=True)
+    heartbeat_at: datetime | None = None
+
+    # Dernier passage complet sur ce canal (évite de le retraiter dans le même cycle)
+    completed_at: datetime | None = Field(default=None, index=True)
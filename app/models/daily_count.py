@@ -0,0 +1,20 @@
+# app/models/daily_count.py
+from datetime import date
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+
+
+class DailyCount(SQLModel, table=True):
+    """
+    Nombre de messages par (pays brut, jour de created_at). Table pré-agrégée remplie
+    uniquement dans le snapshot en lecture seule (app/services/snapshot.py).
+    """
+    id: int | None = Field(default=None, primary_key=True)
+
+    country: str | None = Field(default=None)
+    day: date
+    count: int
+
+    __table_args__ = (
+        Index("ix_dailycount_day_country", "day", "country"),
+    )
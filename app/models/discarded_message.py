@@ -0,0 +1,36 @@
+# app/models/discarded_message.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, UniqueConstraint
+
+
+class DiscardedMessage(SQLModel, table=True):
+    """
+    Message écarté par le préfiltre de pertinence (pub, appel aux dons, promo, réaction
+    d'une ligne) avant les étapes LLM, gardé pour audit et pour réentraîner le modèle.
+    """
+    id: int | None = Field(default=None, primary_key=True)
+
+    channel: str = Field(index=True)
+    telegram_message_id: int | None = None
+    source: str | None = None
+    orientation: str | None = None
+    text: str = ""
+    date: datetime | None = None
+
+    # Règle ou modèle responsable : "motif:<nom>", "mot:<mot-clé>", "court", "modèle"
+    reason: str = Field(index=True)
+    # Probabilité de pertinence donnée par le modèle, si consulté
+    score: float | None = None
+    run_id: str = Field(index=True)
+    # Empreinte des règles et du modèle (prefilter_version) : le message n'est plus exclu des
+    # runs suivants quand elles changent
+    version: str | None = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("channel", "telegram_message_id", name="uq_discarded_channel_message"),
+        # Messages écartés par la version courante des règles (discarded_keys)
+        Index("ix_discarded_version_key", "version", "channel", "telegram_message_id"),
+    )
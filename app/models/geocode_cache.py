@@ -0,0 +1,22 @@
+# app/models/geocode_cache.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class GeocodeCache(SQLModel, table=True):
+    """
+    Résultat du géocodage d'une zone (pays, région, lieu normalisés) par le gazetteer local
+    (app/services/geocoding.py). Les zones introuvables sont gardées aussi (lat / lon vides) :
+    elles ne sont pas recherchées à nouveau tant que le gazetteer ne change pas.
+    """
+    # "pays|région|lieu" (formes normalize_zone)
+    key: str = Field(primary_key=True)
+
+    lat: float | None = None
+    lon: float | None = None
+    # "location", "region" ou "country" : niveau auquel la zone a été trouvée
+    precision: str | None = None
+
+    # Empreinte du gazetteer et de countries.json au moment du calcul
+    version: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
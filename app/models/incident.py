@@ -0,0 +1,32 @@
+# app/models/incident.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, LargeBinary
+
+
+class Incident(SQLModel, table=True):
+    """
+    Regroupement des messages qui rapportent un même événement (même pays, même zone,
+    dates proches, textes similaires). Mis à jour à chaque lot ingéré.
+    """
+    id: int | None = Field(default=None, primary_key=True)
+
+    country: str = Field(index=True)
+    country_key: str
+    zone_key: str
+    region: str | None = None
+    location: str | None = None
+    title: str | None = None
+
+    first_seen: datetime = Field(index=True)
+    last_seen: datetime = Field(index=True)
+    message_count: int = 0
+
+    # Centroïde des vecteurs de texte des membres (float32, normalisé)
+    centroid: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_incident_key_last_seen", "country_key", "zone_key", "last_seen"),
+    )
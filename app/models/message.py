@@ -1,7 +1,7 @@
 # app/models/message.py
 from datetime import datetime
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Index
+from sqlalchemy import Index, func
 
 
 class Message(SQLModel, table=True):
@@ -18,13 +18,34 @@ class Message(SQLModel, table=True):
     region: str | None = Field(default=None, index=True)
     location: str | None = Field(default=None, index=True)
 
+    # Formes normalisées de region / location (app/services/zones.py), calculées au stockage :
+    # l'API regroupe les messages par zone en SQL
+    region_key: str | None = Field(default=None, index=True)
+    location_key: str | None = Field(default=None, index=True)
+
     title: str | None = Field(default=None)
     event_timestamp: datetime | None = Field(default=None, index=True)
 
     orientation: str | None = Field(default=None, index=True)
 
+    # Coordonnées de la zone (app/services/geocoding.py) et case de la grille spatiale
+    # (app/services/zones.py) : requêtes par emprise de carte
+    lat: float | None = Field(default=None)
+    lon: float | None = Field(default=None)
+    grid_cell: int | None = Field(default=None)
+
+    # Incident auquel le message a été rattaché (app/services/incidents.py)
+    incident_id: int | None = Field(default=None, index=True)
+
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     __table_args__ = (
         Index("ix_message_country_created", "country", "created_at"),
+        Index("ix_message_country_zone", "country", "region_key", "location_key"),
+        Index("ix_message_grid_created", "grid_cell", "created_at"),
     )
+
+
+# Jour de created_at puis pays : comptes quotidiens (app/api/aggregates.py) et derniers jours
+# actifs lus dans l'ordre de l'index, sans tri
+Index("ix_message_day_country", func.date(Message.created_at), Message.country)
@@ -0,0 +1,48 @@
+# app/models/staged_message.py
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, UniqueConstraint, text as sql_text
+
+
+class StagedMessage(SQLModel, table=True):
+    """
+    Message en cours de traitement par le pipeline, avec sa dernière étape terminée
+    (fetched → translated → enriched → stored). Un run interrompu reprend chaque message
+    là où il s'était arrêté au lieu de tout repayer.
+    """
+    id: int | None = Field(default=None, primary_key=True)
+
+    channel: str = Field(index=True)
+    telegram_message_id: int
+
+    stage: str = Field(default="fetched", index=True)
+    # Run qui a fait avancer le message en dernier
+    run_id: str = Field(index=True)
+
+    source: str | None = None
+    orientation: str | None = None
+    text: str = ""
+    date: datetime | None = None
+    # Reprise d'historique : created_at du message stocké = date (MessageRecord.backdated)
+    backdated: bool | None = None
+    # Envois au LLM restés sans réponse à l'étape en cours (remis à zéro à chaque étape)
+    attempts: int | None = None
+
+    translated_text: str | None = None
+    country: str | None = None
+    region: str | None = None
+    location: str | None = None
+    title: str | None = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("channel", "telegram_message_id", name="uq_staged_channel_message"),
+        # Lignes "stored" gardées 7 jours : la reprise ne lit que les messages en attente
+        Index(
+            "ix_stagedmessage_pending", "id",
+            sqlite_where=sql_text("stage != 'stored'"),
+            postgresql_where=sql_text("stage != 'stored'"),
+        ),
+    )
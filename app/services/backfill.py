@@ -0,0 +1,75 @@
+# app/services/backfill.py
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.database import get_session
+from app.models.backfill_checkpoint import BackfillCheckpoint
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def open_checkpoint(channel: str, since: datetime, restart: bool = False) -> BackfillCheckpoint:
+    """
+    Point de reprise du canal pour un historique remontant jusqu'à `since`.
+    Un historique en cours prend la nouvelle date ; un historique terminé n'est rouvert
+    que si `since` est plus ancien. La lecture reprend là où elle s'était arrêtée. `restart` repart du message le plus récent.
+    """
+    since = _naive_utc(since)
+    now = datetime.utcnow()
+    with get_session() as session:
+        row = session.get(BackfillCheckpoint, channel)
+        if row is None:
+            row = BackfillCheckpoint(channel=channel, since=since)
+            session.add(row)
+        elif restart:
+            row.since, row.offset_id, row.offset_date = since, None, None
+            row.messages, row.started_at, row.completed_at = 0, now, None
+        elif row.completed_at is None or since < row.since:
+            row.since, row.completed_at = since, None
+        row.updated_at = now
+        session.commit()
+        session.refresh(row)
+        session.expunge(row)
+    return row
+
+
+def save_progress(channel: str, offset_id: int, offset_date: datetime, count: int) -> None:
+    """Enregistre le plus ancien message confié au pipeline (après traitement du lot)."""
+    with get_session() as session:
+        session.exec(
+            update(BackfillCheckpoint)
+            .where(BackfillCheckpoint.channel == channel)
+            .values(
+                offset_id=offset_id,
+                offset_date=_naive_utc(offset_date),
+                messages=BackfillCheckpoint.messages + count,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        session.commit()
+
+
+def complete_checkpoint(channel: str) -> None:
+    now = datetime.utcnow()
+    with get_session() as session:
+        session.exec(
+            update(BackfillCheckpoint)
+            .where(BackfillCheckpoint.channel == channel)
+            .values(completed_at=now, updated_at=now)
+        )
+        session.commit()
+
+
+def list_checkpoints(channel: Optional[str] = None) -> list:
+    with get_session() as session:
+        stmt = select(BackfillCheckpoint).order_by(BackfillCheckpoint.channel)
+        if channel:
+            stmt = stmt.where(BackfillCheckpoint.channel == channel)
+        return list(session.exec(stmt).all())
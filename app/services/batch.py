@@ -0,0 +1,86 @@
+# app/services/batch.py
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict
+import json
+import time
+
+from app.config import get_settings
+from app.services.llm import get_openai_client
+
+BATCH_DIR = Path("data/batches")
+BATCH_ENDPOINT = "/v1/responses"
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _response_text(body: Dict[str, Any]) -> str:
+    """
+    Équivalent de Response.output_text pour le corps JSON brut d'une réponse du batch.
+    """
+    parts = []
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text") or "")
+    return "".join(parts)
+
+
+def run_batch(prompts: Dict[str, str], name: str = "pipeline") -> Dict[str, str]:
+    """
+    Soumet les prompts {custom_id: prompt} en un seul job Batch API et attend la fin.
+    Renvoie {custom_id: texte produit} pour les seules requêtes réussies : les requêtes en
+    échec ou manquantes sont absentes du résultat, et leurs messages restent en staging à
+    leur étape. Un job en échec, expiré ou annulé lève RuntimeError.
+    """
+    if not prompts:
+        return {}
+    settings = get_settings()
+    client = get_openai_client()
+
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    job_path = BATCH_DIR / f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl"
+    with open(job_path, "w", encoding="utf-8") as f:
+        for custom_id, prompt in prompts.items():
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {"model": settings.openai_model, "input": prompt},
+            }
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    with open(job_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    print(f"[batch] Job {batch.id} soumis : {len(prompts)} requêtes ({job_path})")
+
+    while batch.status not in FINAL_STATUSES:
+        time.sleep(settings.openai_batch_poll_seconds)
+        batch = client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"[batch] {batch.id} : {batch.status} ({counts.completed}/{counts.total})")
+
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"job batch {batch.id} terminé sans résultat (statut {batch.status})")
+
+    results: Dict[str, str] = {}
+    failed = 0
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get("response") or {}
+        if entry.get("error") or response.get("status_code") != 200:
+            failed += 1
+            continue
+        results[entry["custom_id"]] = _response_text(response.get("body") or {})
+    missing = len(prompts) - len(results) - failed
+    print(f"[batch] Job {batch.id} : {len(results)} réponses, {failed} échecs, {missing} manquantes")
+    return results
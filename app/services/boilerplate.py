@@ -0,0 +1,212 @@
+# app/services/boilerplate.py
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import get_session
+from app.models.channel_boilerplate import ChannelBoilerplate
+from app.models.message import Message
+from app.services.records import MessageRecord
+from app.services.scheduler import CHARS_PER_TOKEN
+
+# Lignes examinées en tête et en pied de chaque message
+PREFIX_LINES = 2
+SUFFIX_LINES = 4
+# Échantillon d'apprentissage : messages récents stockés du canal + ceux du run
+RECENT_MESSAGES = 200
+MIN_MESSAGES = 5
+MIN_OCCURRENCES = 3
+# Une ligne retirée n'est plus payée en entrée de traduction, en sortie de traduction
+# ni en entrée d'enrichissement
+LLM_PASSES = 3
+
+Patterns = Dict[str, Tuple[set, set]]
+
+
+def _edge_lines(text: str) -> Tuple[List[str], List[str]]:
+    lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    # Message court : une ligne n'est comptée qu'une fois, en tête ou en pied
+    head = min(PREFIX_LINES, len(lines) // 2)
+    return lines[:head], lines[head:][-SUFFIX_LINES:]
+
+
+def find_boilerplate(texts: List[str], min_ratio: float) -> Dict[Tuple[str, str], float]:
+    """
+    Lignes présentes en tête (ou en pied) d'au moins min_ratio des messages donnés.
+    Renvoie {(position, ligne): part des messages}.
+    """
+    if len(texts) < MIN_MESSAGES:
+        return {}
+    counts: Counter = Counter()
+    for text in texts:
+        prefix, suffix = _edge_lines(text)
+        counts.update(("prefix", line) for line in set(prefix))
+        counts.update(("suffix", line) for line in set(suffix))
+    threshold = max(MIN_OCCURRENCES, min_ratio * len(texts))
+    return {key: count / len(texts) for key, count in counts.items() if count >= threshold}
+
+
+def strip_boilerplate(text: str, prefixes: set, suffixes: set) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Retire les lignes apprises en tête et en pied du texte. Renvoie le texte nettoyé et les
+    lignes retirées [(position, ligne)] ; le texte d'origine si rien d'autre ne resterait.
+    """
+    lines = (text or "").splitlines()
+    removed: List[Tuple[str, str]] = []
+    start, end = 0, len(lines)
+    while start < end and (not lines[start].strip() or lines[start].strip() in prefixes):
+        if lines[start].strip():
+            removed.append(("prefix", lines[start].strip()))
+        start += 1
+    while end > start and (not lines[end - 1].strip() or lines[end - 1].strip() in suffixes):
+        if lines[end - 1].strip():
+            removed.append(("suffix", lines[end - 1].strip()))
+        end -= 1
+    if not removed or start == end:
+        return text, []
+    return "\n".join(lines[start:end]), removed
+
+
+def _recent_texts(session, channel: str) -> List[str]:
+    stmt = (
+        select(Message.raw_text)
+        .where(Message.channel == channel)
+        .order_by(Message.id.desc())
+        .limit(RECENT_MESSAGES)
+    )
+    return list(session.exec(stmt).all())
+
+
+def learn_boilerplate(texts_by_channel: Dict[str, List[str]], min_ratio: Optional[float] = None) -> None:
+    """
+    Réapprend les lignes répétées de chaque canal sur ses messages récents (stockés et du
+    run). Les lignes qui ne se répètent plus sont désactivées, leurs statistiques gardées.
+    """
+    if min_ratio is None:
+        min_ratio = get_settings().boilerplate_min_ratio
+    now = datetime.utcnow()
+    with get_session() as session:
+        for channel, texts in texts_by_channel.items():
+            sample = texts + _recent_texts(session, channel)
+            if len(sample) < MIN_MESSAGES:
+                # Pas assez de messages pour conclure : on garde ce qui a été appris
+                continue
+            found = find_boilerplate(sample, min_ratio)
+            existing = {
+                (row.position, row.line): row
+                for row in session.exec(
+                    select(ChannelBoilerplate).where(ChannelBoilerplate.channel == channel)
+                ).all()
+            }
+            for key, row in existing.items():
+                row.active = key in found
+                if key in found:
+                    row.support = found[key]
+                    row.learned_at = now
+            for (position, line), support in found.items():
+                if (position, line) not in existing:
+                    session.add(ChannelBoilerplate(
+                        channel=channel, position=position, line=line, support=support, learned_at=now,
+                    ))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Un autre worker a appris les mêmes lignes entre-temps
+            session.rollback()
+
+
+def load_patterns(channels: Iterable[str]) -> Patterns:
+    patterns: Patterns = {}
+    with get_session() as session:
+        rows = session.exec(
+            select(ChannelBoilerplate).where(
+                ChannelBoilerplate.channel.in_(list(channels)),
+                ChannelBoilerplate.active.is_(True),
+            )
+        ).all()
+    for row in rows:
+        prefixes, suffixes = patterns.setdefault(row.channel, (set(), set()))
+        (prefixes if row.position == "prefix" else suffixes).add(row.line)
+    return patterns
+
+
+def _record_hits(hits: Dict[Tuple[str, str, str], List[int]]) -> None:
+    table = ChannelBoilerplate.__table__
+    stmt = (
+        update(table)
+        .where(
+            table.c.channel == bindparam("b_channel"),
+            table.c.position == bindparam("b_position"),
+            table.c.line == bindparam("b_line"),
+        )
+        .values(
+            messages_stripped=table.c.messages_stripped + bindparam("b_messages"),
+            chars_saved=table.c.chars_saved + bindparam("b_chars"),
+        )
+    )
+    params = [
+        {"b_channel": c, "b_position": p, "b_line": l, "b_messages": n, "b_chars": chars}
+        for (c, p, l), (n, chars) in hits.items()
+    ]
+    with get_session() as session:
+        session.connection().execute(stmt, params)
+        session.commit()
+
+
+def tokens_saved(chars: int) -> int:
+    """Tokens LLM économisés (estimés) pour chars caractères retirés."""
+    return math.ceil(chars / CHARS_PER_TOKEN) * LLM_PASSES
+
+
+def strip_messages(messages: List[MessageRecord], learn: bool = True) -> Dict[str, Dict[str, int]]:
+    """
+    Apprend (si learn) puis retire les lignes répétées de chaque canal : clean_text est
+    rempli pour les étapes LLM, text (raw_text en base) n'est pas modifié.
+    Renvoie et affiche les statistiques du run par canal.
+    """
+    if not messages or not get_settings().boilerplate_stripping:
+        return {}
+    by_channel: Dict[str, List[MessageRecord]] = {}
+    for msg in messages:
+        if msg.channel:
+            by_channel.setdefault(msg.channel, []).append(msg)
+    if learn:
+        learn_boilerplate({chan: [m.text for m in msgs] for chan, msgs in by_channel.items()})
+    patterns = load_patterns(by_channel)
+
+    stats: Dict[str, Dict[str, int]] = {}
+    hits: Dict[Tuple[str, str, str], List[int]] = {}
+    for chan, msgs in by_channel.items():
+        if chan not in patterns:
+            continue
+        prefixes, suffixes = patterns[chan]
+        chan_stats = {"messages": 0, "chars": 0}
+        for msg in msgs:
+            clean, removed = strip_boilerplate(msg.text, prefixes, suffixes)
+            if not removed:
+                continue
+            msg.clean_text = clean
+            chan_stats["messages"] += 1
+            chan_stats["chars"] += len(msg.text) - len(clean)
+            for position, line in removed:
+                hit = hits.setdefault((chan, position, line), [0, 0])
+                hit[0] += 1
+                hit[1] += len(line)
+        if chan_stats["messages"]:
+            chan_stats["tokens_saved"] = tokens_saved(chan_stats["chars"])
+            stats[chan] = chan_stats
+
+    if hits:
+        _record_hits(hits)
+    for chan, chan_stats in sorted(stats.items(), key=lambda kv: -kv[1]["chars"]):
+        print(
+            f"[boilerplate] {chan} : {chan_stats['messages']}/{len(by_channel[chan])} messages nettoyés, "
+            f"{chan_stats['chars']} caractères retirés (~{chan_stats['tokens_saved']} tokens économisés)"
+        )
+    return stats
@@ -1,24 +1,28 @@
 # app/services/dedupe.py
-from typing import List, Dict
+from typing import List, Optional
 
+from app.services.records import MessageRecord
 
-def dedupe_messages(messages: List[Dict]) -> List[Dict]:
+
+def dedupe_messages(messages: List[MessageRecord], seen: Optional[set] = None) -> List[MessageRecord]:
     """
     Déduplication très simple :
     - si on a un title : clé = (source, channel, country, title)
-    - sinon : clé = (source, channel, translated_text / raw_text)
+    - sinon : clé = (source, channel, translated_text / text)
     On garde le premier, on jette les suivants.
+    seen permet de dédupliquer sur plusieurs lots successifs (pipeline en flux).
     """
-    seen = set()
-    result: List[Dict] = []
+    if seen is None:
+        seen = set()
+    result: List[MessageRecord] = []
 
     for msg in messages:
-        source = msg.get("source")
-        channel = msg.get("channel")
-        country = msg.get("country") or ""
+        source = msg.source
+        channel = msg.channel
+        country = msg.country or ""
 
-        title = (msg.get("title") or "").strip()
-        text = (msg.get("translated_text") or msg.get("raw_text") or msg.get("text") or "").strip()
+        title = (msg.title or "").strip()
+        text = msg.llm_text.strip()
 
         if title:
             key = ("title", source, channel, country, title)
@@ -1,37 +1,18 @@
 # app/services/enrichment.py
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterable, List, Dict, Any, Optional
 import json
+import math
 
-from openai import OpenAI
 from app.config import get_settings
-
-settings = get_settings()
-client = OpenAI(api_key=settings.openai_api_key)
-MODEL_NAME = settings.openai_model
-BATCH_SIZE = settings.batch_size
+from app.services.batch import run_batch
+from app.services.gazetteer import get_gazetteer
+from app.services.llm import stream_lines
+from app.services.records import MessageRecord
 
 EXPECTED_FIELDS = ["country", "region", "location", "title", "source", "timestamp"]
 
 
-def _empty_enrichment() -> Dict[str, Optional[str]]:
-    return {
-        "country": None,
-        "region": None,
-        "location": None,
-        "title": None,
-        "source": None,
-        "timestamp": None,
-    }
-
-
-def _enrich_subbatch(items: List[Dict[str, Any]]) -> List[Dict[str, Optional[str]]]:
-    """
-    items: [{ "id": int, "text": str }]
-    Retourne, dans le même ordre, une liste de dicts avec les champs EXPECTED_FIELDS.
-    """
-    if not items:
-        return []
-
+def _enrich_prompt(items: List[Dict[str, Any]]) -> str:
     header = (
         "Tu es un système d'extraction d'information OSINT.\n"
         "Pour chaque message ci-dessous, produis UNE LIGNE JSON (format JSONL) :\n"
@@ -51,25 +32,49 @@ def _enrich_subbatch(items: List[Dict[str, Any]]) -> List[Dict[str, Optional[str
     )
 
     body = "\n".join(f"[{it['id']}] {it.get('text','')}" for it in items)
-    prompt = header + body
+    return header + body
 
-    resp = client.responses.create(
-        model=MODEL_NAME,
-        input=prompt,
-    )
 
-    try:
-        raw = resp.output_text
-    except AttributeError:
-        raw = str(resp)
+def _enrich_subbatch(
+    items: List[Dict[str, Any]],
+    on_record: Optional[Callable[[int, Dict[str, Optional[str]]], None]] = None,
+) -> List[Optional[Dict[str, Optional[str]]]]:
+    """
+    items: [{ "id": int, "text": str }]
+    Retourne, dans le même ordre, une liste de dicts avec les champs EXPECTED_FIELDS
+    (None pour les messages sans réponse).
+    La réponse est lue en streaming (voir _parse_jsonl_lines pour on_record).
+    """
+    if not items:
+        return []
+    return _parse_jsonl_lines(stream_lines(_enrich_prompt(items)), items, EXPECTED_FIELDS, on_record)
+
 
-    lines = [l.strip() for l in raw.splitlines() if l.strip()]
+def _parse_jsonl_output(
+    raw: str, items: List[Dict[str, Any]], fields: List[str]
+) -> List[Optional[Dict[str, Optional[str]]]]:
+    return _parse_jsonl_lines(raw.splitlines(), items, fields)
 
+
+def _parse_jsonl_lines(
+    lines: Iterable[str],
+    items: List[Dict[str, Any]],
+    fields: List[str],
+    on_record: Optional[Callable[[int, Dict[str, Optional[str]]], None]] = None,
+) -> List[Optional[Dict[str, Optional[str]]]]:
+    """
+    Relit la sortie JSONL du modèle ligne par ligne et renvoie, dans l'ordre des items,
+    un dict par message (None si la ligne manque, est invalide ou si le flux s'est coupé).
+    on_record(position, champs) est appelé dès qu'une ligne valide arrive.
+    """
     id_to_index = {int(it["id"]): idx for idx, it in enumerate(items)}
-    results: List[Dict[str, Optional[str]]] = [_empty_enrichment() for _ in items]
+    results: List[Optional[Dict[str, Optional[str]]]] = [None] * len(items)
     seen_ids = set()
 
     for line in lines:
+        line = line.strip()
+        if not line:
+            continue
         try:
             obj = json.loads(line)
         except json.JSONDecodeError:
@@ -84,7 +89,7 @@ def _enrich_subbatch(items: List[Dict[str, Any]]) -> List[Dict[str, Optional[str
             continue
 
         filtered: Dict[str, Optional[str]] = {}
-        for k in EXPECTED_FIELDS:
+        for k in fields:
             v = obj.get(k, "")
             if v is None:
                 v = ""
@@ -94,35 +99,174 @@ def _enrich_subbatch(items: List[Dict[str, Any]]) -> List[Dict[str, Optional[str
 
         results[id_to_index[obj_id]] = filtered
         seen_ids.add(obj_id)
+        if on_record:
+            on_record(id_to_index[obj_id], filtered)
 
     return results
 
 
-def enrich_messages(messages: List[dict]) -> List[dict]:
+def _title_prompt(items: List[Dict[str, Any]]) -> str:
+    header = (
+        "Tu es un système d'extraction d'information OSINT.\n"
+        "Pour chaque message ci-dessous, produis UNE LIGNE JSON (format JSONL) :\n"
+        '{"id": <int>, "title": "..."}\n\n'
+        "Règles :\n"
+        "- 'id' = identifiant fourni en entrée.\n"
+        "- 'title' = phrase courte (8-18 mots) résumant l'événement.\n"
+        "Pas de texte hors JSON, pas de commentaires.\n\n"
+        "Messages :\n"
+    )
+
+    body = "\n".join(f"[{it['id']}] {it.get('text','')}" for it in items)
+    return header + body
+
+
+def _title_subbatch(
+    items: List[Dict[str, Any]],
+    on_record: Optional[Callable[[int, Dict[str, Optional[str]]], None]] = None,
+) -> List[Optional[Dict[str, Optional[str]]]]:
+    """
+    Variante réduite de _enrich_subbatch pour les messages déjà géolocalisés localement :
+    seul le titre est demandé au modèle.
+    """
+    if not items:
+        return []
+    return _parse_jsonl_lines(stream_lines(_title_prompt(items)), items, ["title"], on_record)
+
+
+def _chunk_jobs(prefix: str, messages: List[MessageRecord], size: int) -> List[tuple]:
+    """
+    Découpe en sous-batchs : [(custom_id, sous-liste, items)].
+    """
+    jobs = []
+    for n, start in enumerate(range(0, len(messages), size)):
+        sub = messages[start:start + size]
+        items = [{"id": i, "text": m.llm_text} for i, m in enumerate(sub)]
+        jobs.append((f"{prefix}-{n}", sub, items))
+    return jobs
+
+
+def _apply_full(sub: List[MessageRecord], enrichments: List[Optional[Dict[str, Optional[str]]]]) -> List[MessageRecord]:
+    """Applique les réponses reçues ; renvoie les messages complétés (les autres sont inchangés)."""
+    applied = []
+    for msg, enr in zip(sub, enrichments):
+        if enr is not None:
+            msg.country = enr.get("country") or None
+            msg.region = enr.get("region") or None
+            msg.location = enr.get("location") or None
+            msg.title = enr.get("title") or None
+            applied.append(msg)
+    return applied
+
+
+def _apply_titles(sub: List[MessageRecord], titles: List[Optional[Dict[str, Optional[str]]]]) -> List[MessageRecord]:
+    applied = []
+    for msg, enr in zip(sub, titles):
+        if enr is not None:
+            msg.title = enr.get("title") or None
+            applied.append(msg)
+    return applied
+
+
+def _run_streamed(call, sub: List[MessageRecord], items: List[Dict[str, Any]], apply, on_message) -> List[MessageRecord]:
+    """
+    Exécute un sous-batch en streaming : chaque message est complété et transmis à
+    on_message dès que sa ligne arrive. Renvoie les messages complétés ; ceux dont la
+    ligne n'est pas arrivée (flux coupé) restent inchangés.
+    """
+    emitted = set()
+
+    def on_record(idx: int, enr: Dict[str, Optional[str]]) -> None:
+        apply([sub[idx]], [enr])
+        emitted.add(idx)
+        on_message(sub[idx])
+
+    results = call(items, on_record=on_record if on_message else None)
+    done = []
+    for idx, (msg, enr) in enumerate(zip(sub, results)):
+        if enr is None:
+            continue
+        done.append(msg)
+        if idx not in emitted:
+            apply([msg], [enr])
+            if on_message:
+                on_message(msg)
+    return done
+
+
+def enrich_messages(
+    messages: List[MessageRecord],
+    use_batch: Optional[bool] = None,
+    on_message: Optional[Callable[[MessageRecord], None]] = None,
+) -> List[MessageRecord]:
     """
-    Prend une liste de dicts avec 'translated_text' (ou 'text'),
-    enrichit par batchs successifs.
+    Remplit country / region / location / title à partir de translated_text (ou text),
+    par batchs successifs.
+    Les messages dont le pays est identifiable localement (alias + gazetteer)
+    ne passent au LLM que pour leur titre.
+    En mode batch, enrichissements et titres partent dans un seul job Batch API.
+    on_message(msg) est appelé pour chaque message dès qu'il est enrichi.
+    Renvoie les messages effectivement enrichis : ceux dont la réponse n'est pas arrivée
+    restent à reprendre au run suivant.
     """
     if not messages:
-        return messages
+        return []
 
-    total = len(messages)
-    for start in range(0, total, BATCH_SIZE):
-        end = min(start + BATCH_SIZE, total)
-        sub = messages[start:end]
+    to_enrich = messages
+    resolved: List[MessageRecord] = []
+    settings = get_settings()
+    if use_batch is None:
+        use_batch = settings.openai_batch
+    if settings.local_enrichment:
+        gazetteer = get_gazetteer()
+        to_enrich = []
+        for msg in messages:
+            local = gazetteer.resolve(msg.llm_text)
+            if local is None:
+                to_enrich.append(msg)
+                continue
+            msg.country = local["country"]
+            msg.region = local["region"]
+            msg.location = local["location"]
+            resolved.append(msg)
 
-        items = [
-            {"id": i, "text": (m.get("translated_text") or m.get("text") or "")}
-            for i, m in enumerate(sub)
-        ]
+    full_jobs = _chunk_jobs("enrich", to_enrich, settings.batch_size)
+    # Les titres seuls produisent des réponses courtes : on peut en demander plus par appel
+    title_jobs = _chunk_jobs("title", resolved, settings.batch_size * 2)
 
-        enrichments = _enrich_subbatch(items)
+    if use_batch:
+        prompts = {cid: _enrich_prompt(items) for cid, _, items in full_jobs}
+        prompts.update({cid: _title_prompt(items) for cid, _, items in title_jobs})
+        raws = run_batch(prompts, name="enrich")
+        done: List[MessageRecord] = []
+        # Requêtes en échec absentes de raws : leurs messages restent à enrichir
+        for cid, sub, items in full_jobs:
+            if cid in raws:
+                done += _apply_full(sub, _parse_jsonl_output(raws[cid], items, EXPECTED_FIELDS))
+        for cid, sub, items in title_jobs:
+            if cid in raws:
+                done += _apply_titles(sub, _parse_jsonl_output(raws[cid], items, ["title"]))
+        if on_message:
+            for msg in done:
+                on_message(msg)
+    else:
+        done = []
+        for _, sub, items in full_jobs:
+            done += _run_streamed(_enrich_subbatch, sub, items, _apply_full, on_message)
+        for _, sub, items in title_jobs:
+            done += _run_streamed(_title_subbatch, sub, items, _apply_titles, on_message)
+    full_calls = len(full_jobs)
+    title_calls = len(title_jobs)
 
-        for msg, enr in zip(sub, enrichments):
-            if enr:
-                msg["country"] = enr.get("country") or None
-                msg["region"] = enr.get("region") or None
-                msg["location"] = enr.get("location") or None
-                msg["title"] = enr.get("title") or None
+    # Les appels titres seuls restent des appels LLM : ils comptent dans la comparaison
+    baseline = math.ceil(len(messages) / settings.batch_size)
+    saved = baseline - (full_calls + title_calls)
+    print(
+        f"[enrich] Extraction locale : {len(resolved)}/{len(messages)} messages résolus sans LLM ; "
+        f"appels LLM : {full_calls} complets + {title_calls} titres seuls (au lieu de {baseline}, "
+        f"{f'{saved} évités' if saved >= 0 else f'{-saved} de plus'})"
+    )
+    if len(done) < len(messages):
+        print(f"[enrich] {len(messages) - len(done)}/{len(messages)} réponses non reçues : messages laissés en attente")
 
-    return messages
+    return done
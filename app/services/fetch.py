@@ -3,28 +3,27 @@ from datetime import datetime, timedelta, timezone
 from typing import List, Dict
 import os
 
-from telethon import TelegramClient
-from telethon.errors import UsernameInvalidError, UsernameNotOccupiedError
-from telethon.sessions import StringSession
-
 from app.config import get_settings
-
-settings = get_settings()
+from app.services.records import MessageRecord
 
 
-def _parse_sources_env() -> Dict[str, str | None]:
+def _parse_sources_entries() -> Dict[str, tuple]:
     """
     Lecture sécurisée de SOURCES_TELEGRAM depuis le .env.
 
     Format attendu :
-        SOURCES_TELEGRAM="channel1:label1,channel2:label2,channel3"
+        SOURCES_TELEGRAM="channel1:label1,channel2:label2:5,channel3"
+
+    Le nombre optionnel après le label est la priorité du canal pour les étapes LLM
+    (plus grand = traité d'abord, voir app/services/scheduler.py).
+    Renvoie {canal: (label, priorité ou None)}.
     """
-    raw = (settings.sources_telegram or "").strip()
+    raw = (get_settings().sources_telegram or "").strip()
 
     if not raw:
         return {}
 
-    mapping: Dict[str, str | None] = {}
+    entries: Dict[str, tuple] = {}
 
     for part in raw.split(","):
         part = part.strip()
@@ -35,35 +34,59 @@ def _parse_sources_env() -> Dict[str, str | None]:
         if part.startswith("@"):
             part = part[1:].strip()
 
-        # Sépare canal / label
+        # Sépare canal / label / priorité
         if ":" in part:
             chan, label = part.split(":", 1)
         else:
             chan, label = part, None
 
+        priority = None
+        if label and ":" in label:
+            head, tail = label.rsplit(":", 1)
+            try:
+                priority = int(tail.strip())
+                label = head
+            except ValueError:
+                pass
+
         # Nettoyage du nom de canal
         import re
         chan = re.sub(r"[^A-Za-z0-9_]", "", chan)
         if not chan:
             continue
 
-        mapping[chan] = (label.strip() if label else None)
+        entries[chan] = ((label.strip() if label else None), priority)
 
-    return mapping
+    return entries
 
 
-async def fetch_raw_messages_24h() -> List[Dict]:
+def _parse_sources_env() -> Dict[str, str | None]:
     """
-    Récupère les messages des 24 dernières heures (max N par canal).
+    Canaux de SOURCES_TELEGRAM et leur label (orientation).
     """
-    sources_map = _parse_sources_env()
-    if not sources_map:
-        print("[fetch] Aucun canal dans SOURCES_TELEGRAM.")
-        return []
+    return {chan: label for chan, (label, _) in _parse_sources_entries().items()}
+
+
+def channel_priorities() -> Dict[str, int]:
+    """
+    Priorité LLM de chaque canal de SOURCES_TELEGRAM (CHANNEL_DEFAULT_PRIORITY si absente).
+    """
+    default = get_settings().channel_default_priority
+    return {
+        chan: (priority if priority is not None else default)
+        for chan, (_, priority) in _parse_sources_entries().items()
+    }
 
-    max_per_channel = settings.max_messages_per_channel
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
 
+def build_telegram_client():
+    """
+    Construit le client Telegram à partir de la session disponible.
+    """
+    # Import local : telethon n'est chargé que par les processus qui collectent
+    from telethon import TelegramClient
+    from telethon.sessions import StringSession
+
+    settings = get_settings()
     # 🔑 Choix de la session :
     # - si TG_SESSION est présente (GitHub Actions) -> StringSession
     # - sinon, on utilise le fichier de session local (settings.telegram_session)
@@ -75,65 +98,101 @@ async def fetch_raw_messages_24h() -> List[Dict]:
     if session_str:
         # Mode CI / GitHub Actions
         print("[DEBUG] Utilisation de TG_SESSION (string session)")
-        client = TelegramClient(
+        return TelegramClient(
             StringSession(session_str),
             settings.telegram_api_id,
             settings.telegram_api_hash,
         )
-    else:
-        # Mode local (fichier .session classique)
-        local_session = settings.telegram_session
-        if local_session:
-            local_session = local_session.strip('"\'')
-        print(f"[DEBUG] Utilisation du fichier de session nettoyé: {local_session}")
-        client = TelegramClient(
-            local_session,
-            settings.telegram_api_id,
-            settings.telegram_api_hash,
-        )
 
-    results: List[Dict] = []
+    # Mode local (fichier .session classique)
+    local_session = settings.telegram_session
+    if local_session:
+        local_session = local_session.strip('"\'')
+    print(f"[DEBUG] Utilisation du fichier de session nettoyé: {local_session}")
+    return TelegramClient(
+        local_session,
+        settings.telegram_api_id,
+        settings.telegram_api_hash,
+    )
+
+
+def to_record(m, entity, chan: str, orient: str | None) -> MessageRecord | None:
+    """Message Telegram → MessageRecord, ou None s'il n'a pas de texte."""
+    text = getattr(m, "message", "") or ""
+    if not text.strip():
+        return None
+    real_source = getattr(entity, "title", None) or getattr(entity, "username", chan)
+    return MessageRecord(
+        source=real_source,
+        channel=chan,
+        orientation=(orient or "inconnu").lower(),
+        text=text,
+        date=m.date,
+        telegram_message_id=m.id,
+    )
+
+
+async def _fetch_channels(client, sources_map: Dict[str, str | None], cutoff: datetime) -> List[MessageRecord]:
+    from telethon.errors import UsernameInvalidError, UsernameNotOccupiedError
+
+    max_per_channel = get_settings().max_messages_per_channel
+    results: List[MessageRecord] = []
+
+    for chan, orient in sources_map.items():
+        try:
+            entity = await client.get_entity(chan)
+        except (UsernameInvalidError, UsernameNotOccupiedError) as e:
+            print(f"[fetch] Canal invalide ou introuvable : {chan} ({e})")
+            continue
+        except Exception as e:
+            print(f"[fetch] Erreur get_entity({chan}) : {e}")
+            continue
+
+        try:
+            msgs = await client.get_messages(entity, limit=max_per_channel)
+        except Exception as e:
+            print(f"[fetch] Erreur get_messages({chan}) : {e}")
+            continue
 
-    async with client:
-        for chan, orient in sources_map.items():
-            try:
-                entity = await client.get_entity(chan)
-            except (UsernameInvalidError, UsernameNotOccupiedError) as e:
-                print(f"[fetch] Canal invalide ou introuvable : {chan} ({e})")
+        for m in msgs:
+            dt = getattr(m, "date", None)
+            if dt is None:
                 continue
-            except Exception as e:
-                print(f"[fetch] Erreur get_entity({chan}) : {e}")
+            if dt < cutoff:
                 continue
 
-            try:
-                msgs = await client.get_messages(entity, limit=max_per_channel)
-            except Exception as e:
-                print(f"[fetch] Erreur get_messages({chan}) : {e}")
-                continue
+            record = to_record(m, entity, chan, orient)
+            if record is not None:
+                results.append(record)
+
+    return results
+
 
-            for m in msgs:
-                dt = getattr(m, "date", None)
-                if dt is None:
-                    continue
-                if dt < cutoff:
-                    continue
-
-                text = getattr(m, "message", "") or ""
-                if not text.strip():
-                    continue
-
-                real_source = getattr(entity, "title", None) or getattr(entity, "username", chan)
-
-                results.append(
-                    {
-                        "source": real_source,
-                        "channel": chan,
-                        "orientation": (orient or "inconnu").lower(),
-                        "text": text,
-                        "date": dt,
-                        "telegram_message_id": m.id,
-                    }
-                )
+async def fetch_raw_messages_24h(
+    sources_map: Dict[str, str | None] | None = None,
+    client=None,
+) -> List[MessageRecord]:
+    """
+    Récupère les messages des 24 dernières heures (max N par canal).
+
+    - sources_map : sous-ensemble de canaux à lire (mode shardé), sinon SOURCES_TELEGRAM.
+    - client : client déjà connecté (réutilisé entre plusieurs lots, ou client factice) ;
+      sinon un client est créé et fermé ici.
+    """
+    if sources_map is None:
+        sources_map = _parse_sources_env()
+    if not sources_map:
+        print("[fetch] Aucun canal dans SOURCES_TELEGRAM.")
+        return []
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+
+    if client is None:
+        client = build_telegram_client()
+        async with client:
+            results = await _fetch_channels(client, sources_map, cutoff)
+    else:
+        results = await _fetch_channels(client, sources_map, cutoff)
 
     print(f"[fetch] Total messages 24h récupérés : {len(results)}")
     return results
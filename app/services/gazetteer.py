@@ -0,0 +1,204 @@
+# app/services/gazetteer.py
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+from app.services.zones import normalize_zone
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "static" / "data"
+COUNTRIES_JSON_PATH = DATA_DIR / "countries.json"
+GAZETTEER_JSON_PATH = DATA_DIR / "gazetteer.json"
+
+
+class AhoCorasick:
+    """
+    Automate d'Aho–Corasick : tous les motifs sont cherchés en un seul passage sur le texte.
+    """
+
+    def __init__(self) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[int, Any]]] = [[]]
+
+    def add(self, pattern: str, value: Any) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append((len(pattern), value))
+
+    def build(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """
+        Renvoie (début, fin, valeur) pour chaque occurrence de motif dans le texte.
+        """
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, value in self.out[node]:
+                yield i - length + 1, i + 1, value
+
+
+def _prepare(text: str) -> str:
+    return text.lower().replace("’", "'")
+
+
+class Gazetteer:
+    """
+    Extraction locale des pays (alias de countries.json) et des lieux (gazetteer.json).
+    """
+
+    def __init__(
+        self,
+        aliases: Dict[str, str],
+        places: List[Dict[str, Any]],
+        coordinates: Optional[Dict[str, List[float]]] = None,
+    ):
+        self.aliases = aliases
+        self.coordinates = coordinates or {}
+        self.automaton = AhoCorasick()
+        # Lieux géoréférencés par nom / alias et par région (formes normalize_zone)
+        self.places_by_name: Dict[str, List[Dict[str, Any]]] = {}
+        self.places_by_region: Dict[str, List[Dict[str, Any]]] = {}
+        # Libellé stocké pour chaque pays : une forme que normalize_country_names sait relire
+        self.country_labels: Dict[str, str] = {}
+        for alias, country in aliases.items():
+            self.automaton.add(_prepare(alias), ("country", country))
+            name = country.split(" ", 1)[-1]
+            if name.lower() == alias:
+                self.country_labels[country] = name
+            else:
+                self.country_labels.setdefault(country, alias)
+        for place in places:
+            for alias in place.get("aliases") or [place["name"]]:
+                self.automaton.add(_prepare(alias), ("place", place))
+            if place.get("lat") is None or place.get("lon") is None:
+                continue
+            for name in {normalize_zone(a) for a in (place.get("aliases") or []) + [place["name"]]}:
+                self.places_by_name.setdefault(name, []).append(place)
+            if place.get("region"):
+                self.places_by_region.setdefault(normalize_zone(place["region"]), []).append(place)
+        self.automaton.build()
+
+    def find(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Occurrences délimitées par des frontières de mots ; en cas de chevauchement,
+        la plus longue l'emporte ("afrique du sud" plutôt que "afrique").
+        """
+        text = _prepare(text)
+        candidates = []
+        for start, end, value in self.automaton.iter_matches(text):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            candidates.append((start, end, value))
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+
+        matches: List[Tuple[str, Any]] = []
+        last_span = (-1, -1)
+        for start, end, value in candidates:
+            # Un même mot peut être à la fois un alias de pays et un lieu ("gaza")
+            if start < last_span[1] and (start, end) != last_span:
+                continue
+            matches.append(value)
+            last_span = (start, end)
+        return matches
+
+    def resolve(self, text: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Renvoie country/region/location si le texte désigne sans ambiguïté un seul pays,
+        sinon None (le message part alors vers le LLM).
+        """
+        countries = set()
+        places: Dict[str, Dict[str, Any]] = {}
+        for kind, value in self.find(text):
+            if kind == "country":
+                countries.add(value)
+            else:
+                countries.add(value["country"])
+                places[value["name"]] = value
+        if len(countries) != 1:
+            return None
+
+        country = countries.pop()
+        regions = {p["region"] for p in places.values() if p.get("region")}
+        region = regions.pop() if len(regions) == 1 else None
+        location = next(iter(places)) if len(places) == 1 else None
+        return {
+            "country": self.country_labels.get(country, country),
+            "region": region,
+            "location": location,
+        }
+
+
+    def locate(
+        self, country: Optional[str], region: Optional[str], location: Optional[str]
+    ) -> Optional[Tuple[float, float, str]]:
+        """
+        Coordonnées d'une zone : le lieu s'il est au gazetteer (nom exact, sinon lieu cité
+        dans le texte), puis le centre des lieux connus de la région, puis le centroïde du
+        pays. Les lieux d'un autre pays que celui du message sont ignorés.
+        Renvoie (lat, lon, précision) ou None.
+        """
+        countries = {
+            self.aliases[name] for name in (n.strip().lower() for n in (country or "").split(","))
+            if name in self.aliases
+        }
+
+        def usable(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            unique = {p["name"]: p for p in places if p.get("lat") is not None and p.get("lon") is not None}
+            return [p for p in unique.values() if not countries or p["country"] in countries]
+
+        if location:
+            found = usable(self.places_by_name.get(normalize_zone(location), []))
+            found = found or usable([v for kind, v in self.find(location) if kind == "place"])
+            # Un lieu doit être désigné sans ambiguïté ; sinon on se rabat sur la région
+            if len(found) == 1:
+                return found[0]["lat"], found[0]["lon"], "location"
+        if region:
+            key = normalize_zone(region)
+            found = usable(self.places_by_region.get(key, []) or self.places_by_name.get(key, []))
+            found = found or usable([v for kind, v in self.find(region) if kind == "place"])
+            if found and len({p["country"] for p in found}) == 1:
+                lat = sum(p["lat"] for p in found) / len(found)
+                lon = sum(p["lon"] for p in found) / len(found)
+                return round(lat, 4), round(lon, 4), "region"
+        if len(countries) == 1:
+            coords = self.coordinates.get(next(iter(countries)))
+            if coords:
+                return coords[0], coords[1], "country"
+        return None
+
+
+@lru_cache
+def get_gazetteer() -> Gazetteer:
+    with open(COUNTRIES_JSON_PATH, encoding="utf-8") as f:
+        countries = json.load(f)
+    aliases = countries.get("aliases", {})
+    places: List[Dict[str, Any]] = []
+    if GAZETTEER_JSON_PATH.exists():
+        with open(GAZETTEER_JSON_PATH, encoding="utf-8") as f:
+            places = json.load(f).get("places", [])
+    return Gazetteer(aliases, places, countries.get("coordinates", {}))
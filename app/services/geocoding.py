@@ -0,0 +1,112 @@
+# app/services/geocoding.py
+"""
+Géocodage hors ligne des zones (pays, région, lieu) des messages par le gazetteer local,
+à l'étape de stockage. Le résultat est mis en cache par zone : en mémoire pour le run, et
+dans la table geocodecache pour les suivants (recalculé quand le gazetteer change).
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import hashlib
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from app.database import get_session
+from app.models.geocode_cache import GeocodeCache
+from app.services.gazetteer import COUNTRIES_JSON_PATH, GAZETTEER_JSON_PATH, get_gazetteer
+from app.services.records import MessageRecord
+from app.services.zones import normalize_zone
+
+LOOKUP_CHUNK = 500
+
+# clé de zone -> (lat, lon, précision) ou None ; valable pour la version courante du gazetteer
+_memory: Dict[str, Optional[Tuple[float, float, str]]] = {}
+
+
+@lru_cache
+def gazetteer_version() -> str:
+    digest = hashlib.sha256()
+    for path in (COUNTRIES_JSON_PATH, GAZETTEER_JSON_PATH):
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def zone_cache_key(country: Optional[str], region: Optional[str], location: Optional[str]) -> str:
+    return f"{normalize_zone(country)}|{normalize_zone(region)}|{normalize_zone(location)}"
+
+
+def _load_cached(keys: List[str], version: str) -> Tuple[Dict[str, Optional[Tuple[float, float, str]]], set]:
+    """Zones déjà en table ; renvoie (résultats à jour, clés calculées par un autre gazetteer)."""
+    found: Dict[str, Optional[Tuple[float, float, str]]] = {}
+    stale = set()
+    with get_session() as session:
+        for i in range(0, len(keys), LOOKUP_CHUNK):
+            for row in session.exec(select(GeocodeCache).where(GeocodeCache.key.in_(keys[i:i + LOOKUP_CHUNK]))).all():
+                if row.version != version:
+                    stale.add(row.key)
+                elif row.lat is None or row.lon is None:
+                    found[row.key] = None
+                else:
+                    found[row.key] = (row.lat, row.lon, row.precision)
+    return found, stale
+
+
+def _save(results: Dict[str, Optional[Tuple[float, float, str]]], stale: set, version: str) -> None:
+    table = GeocodeCache.__table__
+    rows = [
+        {
+            "key": key,
+            "lat": result[0] if result else None,
+            "lon": result[1] if result else None,
+            "precision": result[2] if result else None,
+            "version": version,
+        }
+        for key, result in results.items()
+    ]
+    with get_session() as session:
+        try:
+            if stale:
+                session.connection().execute(delete(table).where(table.c.key.in_(list(stale))))
+            session.connection().execute(insert(table), rows)
+            session.commit()
+        except IntegrityError:
+            # Zones enregistrées au même moment par un autre worker (même résultat)
+            session.rollback()
+
+
+def geocode_messages(messages: List[MessageRecord]) -> int:
+    """
+    Renseigne lat / lon des messages d'après leur zone (grid_cell en découle au stockage).
+    Renvoie le nombre de messages placés.
+    """
+    version = gazetteer_version()
+    zones: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+    for msg in messages:
+        if msg.country or msg.region or msg.location:
+            zones.setdefault(zone_cache_key(msg.country, msg.region, msg.location),
+                             (msg.country, msg.region, msg.location))
+
+    missing = [key for key in zones if key not in _memory]
+    computed: Dict[str, Optional[Tuple[float, float, str]]] = {}
+    if missing:
+        found, stale = _load_cached(missing, version)
+        _memory.update(found)
+        gazetteer = get_gazetteer()
+        computed = {key: gazetteer.locate(*zones[key]) for key in missing if key not in found}
+        if computed:
+            _save(computed, stale, version)
+            _memory.update(computed)
+
+    placed = 0
+    for msg in messages:
+        # Message sans zone : clé "||", jamais en cache
+        result = _memory.get(zone_cache_key(msg.country, msg.region, msg.location))
+        msg.lat, msg.lon = (result[0], result[1]) if result else (None, None)
+        placed += result is not None
+    if messages:
+        print(f"[geocode] {placed}/{len(messages)} messages placés ({len(computed)} zones calculées, "
+              f"{len(zones) - len(computed)} en cache)")
+    return placed
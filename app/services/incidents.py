@@ -0,0 +1,166 @@
+# app/services/incidents.py
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import re
+import zlib
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.database import get_session
+from app.models.incident import Incident
+from app.services.records import MessageRecord
+from app.services.zones import normalize_zone, zone_key
+
+# Vecteurs de hachage (pas de vocabulaire à maintenir entre deux lots)
+VECTOR_DIM = 1 << 12
+TOKEN_RE = re.compile(r"\w{3,}")
+
+
+def text_vector(text: str) -> np.ndarray:
+    """
+    Vecteur creux haché des mots et bigrammes du texte (tf sous-linéaire, norme L2 = 1).
+    """
+    tokens = TOKEN_RE.findall(normalize_zone(text))
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
+    if not features:
+        return vec
+    hashes = np.fromiter(
+        (zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features)
+    )
+    # Le bit de poids fort donne le signe : les collisions se compensent au lieu de s'additionner
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vec, hashes % VECTOR_DIM, signs)
+    vec = np.sign(vec) * np.log1p(np.abs(vec))
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def _message_time(msg: MessageRecord) -> datetime:
+    ts = msg.date
+    if isinstance(ts, str):
+        try:
+            ts = datetime.fromisoformat(ts)
+        except ValueError:
+            ts = None
+    if not isinstance(ts, datetime):
+        return datetime.utcnow()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+class _Cluster:
+    """
+    Incident en cours de mise à jour : centroïde décodé et bornes temporelles.
+    """
+
+    def __init__(self, incident: Incident, centroid: np.ndarray):
+        self.incident = incident
+        self.centroid = centroid
+
+    def add(self, vector: np.ndarray, ts: datetime) -> None:
+        n = self.incident.message_count
+        merged = self.centroid * n + vector
+        norm = np.linalg.norm(merged)
+        self.centroid = merged / norm if norm else merged
+        self.incident.message_count = n + 1
+        self.incident.first_seen = min(self.incident.first_seen, ts)
+        self.incident.last_seen = max(self.incident.last_seen, ts)
+
+
+def cluster_messages(
+    messages: List[MessageRecord],
+    window_hours: Optional[int] = None,
+    threshold: Optional[float] = None,
+    session: Optional[Session] = None,
+) -> int:
+    """
+    Rattache chaque message localisé à un incident (champ incident_id) :
+    même pays et même zone, à moins de window_hours d'un incident existant,
+    similarité cosinus du texte au-dessus du seuil. Sinon un nouvel incident est créé.
+    Les incidents récents en base sont repris, ce qui rend le regroupement incrémental
+    d'un lot à l'autre. Renvoie le nombre d'incidents créés.
+    Avec `session`, les incidents sont seulement envoyés (flush) dans sa transaction :
+    l'appelant les valide avec l'insertion des messages, ou les annule avec elle.
+    """
+    settings = get_settings()
+    window = timedelta(hours=window_hours or settings.incident_window_hours)
+    threshold = settings.incident_similarity if threshold is None else threshold
+
+    candidates = [m for m in messages if m.country]
+    if not candidates:
+        return 0
+    times = [_message_time(m) for m in candidates]
+    vectors = np.vstack([
+        text_vector(f"{m.title or ''} {m.llm_text}")
+        for m in candidates
+    ])
+
+    created = 0
+    own_session = session is None
+    with nullcontext(session) if session is not None else get_session() as session:
+        groups: Dict[Tuple[str, str], List[_Cluster]] = {}
+        recent = session.exec(
+            select(Incident).where(Incident.last_seen >= min(times) - window)
+        ).all()
+        for incident in recent:
+            centroid = np.frombuffer(incident.centroid, dtype=np.float32).copy()
+            groups.setdefault((incident.country_key, incident.zone_key), []).append(
+                _Cluster(incident, centroid)
+            )
+
+        assignments: List[Tuple[MessageRecord, _Cluster]] = []
+        # Ordre chronologique : un incident ne s'étend que de proche en proche
+        for i in sorted(range(len(candidates)), key=lambda k: times[k]):
+            msg, ts, vector = candidates[i], times[i], vectors[i]
+            key = (normalize_zone(msg.country), zone_key(msg.region, msg.location))
+            clusters = groups.setdefault(key, [])
+            live = [
+                c for c in clusters
+                if c.incident.first_seen - window <= ts <= c.incident.last_seen + window
+            ]
+            best = None
+            if live:
+                scores = np.stack([c.centroid for c in live]) @ vector
+                j = int(np.argmax(scores))
+                if scores[j] >= threshold:
+                    best = live[j]
+            if best is None:
+                incident = Incident(
+                    country=msg.country,
+                    country_key=key[0],
+                    zone_key=key[1],
+                    region=msg.region,
+                    location=msg.location,
+                    title=msg.title,
+                    first_seen=ts,
+                    last_seen=ts,
+                    message_count=0,
+                    centroid=b"",
+                )
+                session.add(incident)
+                best = _Cluster(incident, np.zeros(VECTOR_DIM, dtype=np.float32))
+                clusters.append(best)
+                created += 1
+            best.add(vector, ts)
+            assignments.append((msg, best))
+
+        for cluster in {id(c): c for _, c in assignments}.values():
+            cluster.incident.centroid = cluster.centroid.astype(np.float32).tobytes()
+            session.add(cluster.incident)
+        if own_session:
+            session.commit()
+        else:
+            session.flush()
+        for msg, cluster in assignments:
+            msg.incident_id = cluster.incident.id
+
+    print(
+        f"[incidents] {len(assignments)} messages regroupés en "
+        f"{len({id(c) for _, c in assignments})} incidents ({created} nouveaux)"
+    )
+    return created
@@ -0,0 +1,196 @@
+# app/services/leases.py
+from datetime import datetime, timedelta
+from typing import Iterable, List
+import threading
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, func
+
+from app.database import get_session
+from app.models.channel_lease import ChannelLease
+
+
+def _lease_is_free(now: datetime):
+    return or_(ChannelLease.worker_id.is_(None), ChannelLease.expires_at < now)
+
+
+def _not_done_since(cycle_start: datetime):
+    return or_(ChannelLease.completed_at.is_(None), ChannelLease.completed_at < cycle_start)
+
+
+def ensure_channels(channels: Iterable[str]) -> None:
+    """
+    Crée les lignes de bail manquantes. Plusieurs workers peuvent le faire en même temps :
+    un conflit de clé signifie simplement qu'un autre worker a déjà créé la ligne.
+    """
+    channels = list(channels)
+    with get_session() as session:
+        existing = set(
+            session.exec(select(ChannelLease.channel).where(ChannelLease.channel.in_(channels))).all()
+        )
+        for chan in channels:
+            if chan in existing:
+                continue
+            session.add(ChannelLease(channel=chan))
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+
+
+def acquire_channels(
+    worker_id: str,
+    channels: Iterable[str],
+    limit: int,
+    ttl_seconds: int,
+    cycle_start: datetime,
+) -> List[str]:
+    """
+    Réserve jusqu'à `limit` canaux libres (jamais attribués ou bail expiré)
+    et pas encore traités depuis `cycle_start`.
+    Chaque réservation est un UPDATE conditionnel : un seul worker peut gagner un canal.
+    """
+    now = datetime.utcnow()
+    acquired: List[str] = []
+    with get_session() as session:
+        candidates = session.exec(
+            select(ChannelLease.channel)
+            .where(
+                ChannelLease.channel.in_(list(channels)),
+                _lease_is_free(now),
+                _not_done_since(cycle_start),
+            )
+            .order_by(ChannelLease.completed_at.is_not(None), ChannelLease.completed_at, ChannelLease.channel)
+        ).all()
+
+        for chan in candidates:
+            stmt = (
+                update(ChannelLease)
+                .where(
+                    ChannelLease.channel == chan,
+                    _lease_is_free(now),
+                    _not_done_since(cycle_start),
+                )
+                .values(
+                    worker_id=worker_id,
+                    expires_at=now + timedelta(seconds=ttl_seconds),
+                    heartbeat_at=now,
+                )
+            )
+            result = session.exec(stmt)
+            session.commit()
+            if result.rowcount == 1:
+                acquired.append(chan)
+            if len(acquired) >= limit:
+                break
+    return acquired
+
+
+def renew_leases(worker_id: str, channels: Iterable[str], ttl_seconds: int) -> List[str]:
+    """
+    Prolonge les baux encore détenus par ce worker. Renvoie les canaux toujours possédés
+    (un bail expiré entre-temps a pu être repris par un autre worker).
+    """
+    now = datetime.utcnow()
+    channels = list(channels)
+    with get_session() as session:
+        session.exec(
+            update(ChannelLease)
+            .where(
+                ChannelLease.channel.in_(channels),
+                ChannelLease.worker_id == worker_id,
+            )
+            .values(expires_at=now + timedelta(seconds=ttl_seconds), heartbeat_at=now)
+        )
+        session.commit()
+        owned = session.exec(
+            select(ChannelLease.channel).where(
+                ChannelLease.channel.in_(channels),
+                ChannelLease.worker_id == worker_id,
+            )
+        ).all()
+    return list(owned)
+
+
+def complete_channels(worker_id: str, channels: Iterable[str]) -> None:
+    """
+    Marque les canaux comme traités pour ce cycle et libère les baux.
+    """
+    now = datetime.utcnow()
+    with get_session() as session:
+        session.exec(
+            update(ChannelLease)
+            .where(
+                ChannelLease.channel.in_(list(channels)),
+                ChannelLease.worker_id == worker_id,
+            )
+            .values(worker_id=None, expires_at=None, completed_at=now)
+        )
+        session.commit()
+
+
+def release_leases(worker_id: str) -> None:
+    """
+    Libère tous les baux de ce worker sans les marquer traités (arrêt propre / erreur).
+    """
+    with get_session() as session:
+        session.exec(
+            update(ChannelLease)
+            .where(ChannelLease.worker_id == worker_id)
+            .values(worker_id=None, expires_at=None)
+        )
+        session.commit()
+
+
+def count_unfinished(channels: Iterable[str], cycle_start: datetime) -> int:
+    """
+    Nombre de canaux pas encore traités dans ce cycle (libres ou détenus par un worker).
+    """
+    with get_session() as session:
+        return session.exec(
+            select(func.count())
+            .select_from(ChannelLease)
+            .where(
+                ChannelLease.channel.in_(list(channels)),
+                _not_done_since(cycle_start),
+            )
+        ).one()
+
+
+class LeaseHeartbeat:
+    """
+    Renouvelle les baux d'un worker dans un thread séparé, pour que les étapes
+    synchrones (traduction, enrichissement) ne laissent pas les baux expirer.
+    """
+
+    def __init__(self, worker_id: str, channels: List[str], ttl_seconds: int):
+        self.worker_id = worker_id
+        self.channels = list(channels)
+        self.ttl_seconds = ttl_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        interval = max(1.0, self.ttl_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                owned = renew_leases(self.worker_id, self.channels, self.ttl_seconds)
+            except Exception as e:
+                print(f"[leases] Erreur heartbeat ({self.worker_id}) : {e}")
+                continue
+            lost = set(self.channels) - set(owned)
+            if lost:
+                print(f"[leases] Baux perdus par {self.worker_id} : {', '.join(sorted(lost))}")
+                self.channels = owned
+
+    def owned(self) -> List[str]:
+        return list(self.channels)
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
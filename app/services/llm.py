@@ -0,0 +1,48 @@
+# app/services/llm.py
+from functools import lru_cache
+from typing import Iterator
+
+from app.config import get_settings
+
+
+@lru_cache
+def get_openai_client():
+    """
+    Client OpenAI partagé, créé au premier appel (l'import d'openai est coûteux
+    et inutile pour l'API).
+    """
+    from openai import OpenAI
+
+    settings = get_settings()
+    return OpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url or None)
+
+
+def stream_lines(prompt: str) -> Iterator[str]:
+    """
+    Appel en streaming de l'API Responses : chaque ligne de la sortie est renvoyée dès
+    qu'elle est complète. Si le flux se coupe après les premières lignes, celles-ci restent
+    acquises et l'itération s'arrête ; une erreur avant toute sortie est propagée.
+    """
+    buffer = ""
+    received = False
+    try:
+        stream = get_openai_client().responses.create(
+            model=get_settings().openai_model,
+            input=prompt,
+            stream=True,
+        )
+        for event in stream:
+            if event.type != "response.output_text.delta":
+                continue
+            buffer += event.delta
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                received = True
+                yield line
+    except Exception as e:
+        if not received:
+            raise
+        print(f"[llm] Flux interrompu ({type(e).__name__}: {e}) : lignes déjà reçues conservées")
+    if buffer:
+        # Dernière ligne sans saut de ligne final (ou tronquée : le parseur l'ignorera)
+        yield buffer
@@ -0,0 +1,281 @@
+# app/services/profiling.py
+"""
+Profilage à la demande, désactivé par défaut :
+- SamplingProfiler échantillonne les piles de tous les threads (sys._current_frames) à
+  intervalle fixe et les agrège en piles repliées (format "folded" de flamegraph.pl,
+  lisible aussi par speedscope) ;
+- SQLCapture relève les requêtes SQL exécutées et leur durée via les événements
+  SQLAlchemy.
+Rien n'est branché tant qu'aucun profilage n'est actif : les écouteurs SQL sont ajoutés au
+premier SQLCapture ouvert et retirés au dernier fermé.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Un thread dont la pile se termine dans ces modules attend (boucle asyncio au repos,
+# pool de threads, files) : ses échantillons ne disent rien du travail en cours
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py")
+SQL_MAX_CHARS = 500
+
+# Étape du pipeline en cours, par thread (voir stage())
+_thread_stages: Dict[int, str] = {}
+_active_profilers: List["SamplingProfiler"] = []
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Échantillonneur de piles dans un thread dédié. Les piles sont préfixées par l'étape
+    du pipeline du thread échantillonné (stage()), quand il y en a une.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.leaves: Counter = Counter()
+        self.samples = 0
+        self.stage_seconds: Counter = Counter()
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        _active_profilers.append(self)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        if self in _active_profilers:
+            _active_profilers.remove(self)
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or Path(frame.f_code.co_filename).name in IDLE_MODULES:
+                    continue
+                leaf = frame.f_code
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stage_name = _thread_stages.get(ident)
+                if stage_name:
+                    labels.append(f"[{stage_name}]")
+                self.stacks[";".join(reversed(labels))] += 1
+                self.leaves[_frame_label(leaf)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Une ligne par pile distincte : "racine;...;feuille nb_échantillons"."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def report(self, top: int = 20) -> Dict[str, Any]:
+        return {
+            "duration_ms": round(self.duration * 1000, 2),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "top_functions": [
+                {"function": name, "samples": count} for name, count in self.leaves.most_common(top)
+            ],
+            "stacks": [
+                {"stack": stack, "samples": count} for stack, count in self.stacks.most_common(top)
+            ],
+        }
+
+    def stage_summary(self, top: int = 5) -> Dict[str, Dict[str, Any]]:
+        """Échantillons et fonctions les plus présentes (en feuille) par étape du pipeline."""
+        per_stage: Dict[str, Dict[str, Any]] = {}
+        for stack, count in self.stacks.items():
+            root = stack.split(";", 1)[0]
+            name = root[1:-1] if root.startswith("[") else "(hors étape)"
+            entry = per_stage.setdefault(name, {"samples": 0, "leaves": Counter()})
+            entry["samples"] += count
+            entry["leaves"][stack.rsplit(";", 1)[-1]] += count
+        return {
+            name: {
+                "seconds": round(self.stage_seconds.get(name, 0.0), 3),
+                "samples": entry["samples"],
+                "top_functions": entry["leaves"].most_common(top),
+            }
+            for name, entry in sorted(per_stage.items(), key=lambda kv: -kv[1]["samples"])
+        }
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Marque le thread courant comme exécutant une étape du pipeline. Sans profileur actif,
+    seul le test de la liste est exécuté.
+    """
+    if not _active_profilers:
+        yield
+        return
+    ident = threading.get_ident()
+    previous = _thread_stages.get(ident)
+    _thread_stages[ident] = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for profiler in _active_profilers:
+            profiler.stage_seconds[name] += elapsed
+        if previous is None:
+            _thread_stages.pop(ident, None)
+        else:
+            _thread_stages[ident] = previous
+
+
+# Capture SQL de la requête HTTP en cours (le contexte suit run_in_threadpool)
+_current_capture: ContextVar[Optional["SQLCapture"]] = ContextVar("sql_capture", default=None)
+_global_captures: List["SQLCapture"] = []
+_listeners_lock = threading.Lock()
+_listeners_users = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profile_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    captures = list(_global_captures)
+    current = _current_capture.get()
+    if current is not None and current not in captures:
+        captures.append(current)
+    if not captures:
+        return
+    entry = {
+        "statement": " ".join(statement.split())[:SQL_MAX_CHARS],
+        "duration_ms": round(elapsed * 1000, 3),
+        "rows": len(parameters) if executemany else 1,
+        "stage": _thread_stages.get(threading.get_ident()),
+    }
+    for capture in captures:
+        capture.statements.append(entry)
+
+
+def _retain_listeners() -> None:
+    global _listeners_users
+    with _listeners_lock:
+        if _listeners_users == 0:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _listeners_users += 1
+
+
+def _release_listeners() -> None:
+    global _listeners_users
+    with _listeners_lock:
+        _listeners_users -= 1
+        if _listeners_users == 0:
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLCapture:
+    """
+    Requêtes SQL exécutées pendant le bloc. all_threads=False : seulement celles du
+    contexte courant (une requête HTTP) ; all_threads=True : celles de tout le processus
+    (pipeline, dont les étapes tournent dans plusieurs threads).
+    """
+
+    def __init__(self, all_threads: bool = False) -> None:
+        self.all_threads = all_threads
+        self.statements: List[Dict[str, Any]] = []
+        self._token = None
+
+    def __enter__(self) -> "SQLCapture":
+        _retain_listeners()
+        if self.all_threads:
+            _global_captures.append(self)
+        else:
+            self._token = _current_capture.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.all_threads:
+            _global_captures.remove(self)
+        else:
+            _current_capture.reset(self._token)
+        _release_listeners()
+
+    def report(self, top: int = 50) -> Dict[str, Any]:
+        slowest = sorted(self.statements, key=lambda s: s["duration_ms"], reverse=True)
+        return {
+            "count": len(self.statements),
+            "total_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+            "statements": self.statements if top is None else slowest[:top],
+        }
+
+
+def write_pipeline_profile(profiler: SamplingProfiler, sql: SQLCapture, directory: Path) -> Path:
+    """
+    Écrit le profil d'un run du pipeline : piles repliées (<nom>.folded, pour flamegraph.pl
+    ou speedscope) et rapport JSON par étape (<nom>.json), puis en affiche le résumé.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    base = directory / f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}"
+    base.with_suffix(".folded").write_text(profiler.folded() + "\n", encoding="utf-8")
+
+    stages = profiler.stage_summary()
+    sql_by_stage: Dict[str, Counter] = {}
+    for entry in sql.statements:
+        totals = sql_by_stage.setdefault(entry["stage"] or "(hors étape)", Counter())
+        totals["count"] += 1
+        totals["ms"] += entry["duration_ms"]
+    report = {
+        "duration_ms": round(profiler.duration * 1000, 2),
+        "interval_ms": profiler.interval * 1000,
+        "samples": profiler.samples,
+        "stages": stages,
+        "sql": {
+            **sql.report(top=20),
+            "by_stage": {
+                name: {"count": int(t["count"]), "ms": round(t["ms"], 3)} for name, t in sql_by_stage.items()
+            },
+        },
+    }
+    base.with_suffix(".json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"[profile] Run profilé : {profiler.duration:.2f}s, {profiler.samples} échantillons")
+    for name, entry in stages.items():
+        totals = sql_by_stage.get(name, Counter())
+        print(
+            f"[profile]   {name:<14} {entry['seconds']:8.2f}s  {entry['samples']:6d} éch.  "
+            f"SQL {int(totals['count']):5d} req. / {totals['ms']:8.1f} ms"
+        )
+        for function, count in entry["top_functions"][:3]:
+            print(f"[profile]       {count:6d}  {function}")
+    print(f"[profile] Piles repliées : {base.with_suffix('.folded')} ; rapport : {base.with_suffix('.json')}")
+    return base
@@ -0,0 +1,99 @@
+# app/services/records.py
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.services.zones import grid_cell, normalize_zone
+
+
+@dataclass(slots=True)
+class MessageRecord:
+    """
+    Message en transit dans le pipeline, de la collecte au stockage.
+    __slots__ : pas de dict par instance, et un nom de champ mal orthographié lève une
+    AttributeError au lieu de créer silencieusement une nouvelle clé.
+    """
+    source: Optional[str]
+    channel: Optional[str]
+    text: str
+    date: Optional[datetime] = None
+    telegram_message_id: Optional[int] = None
+    orientation: Optional[str] = None
+
+    # Texte sans les lignes répétées du canal (app/services/boilerplate.py), envoyé au LLM ;
+    # text reste le texte brut stocké dans Message.raw_text
+    clean_text: Optional[str] = None
+
+    translated_text: Optional[str] = None
+    country: Optional[str] = None
+    region: Optional[str] = None
+    location: Optional[str] = None
+    title: Optional[str] = None
+    # Coordonnées de la zone, renseignées au stockage (app/services/geocoding.py)
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    incident_id: Optional[int] = None
+
+    # Message repris de l'historique (tools/backfill.py) : stocké avec created_at = date du
+    # message, pour apparaître à son jour sur le dashboard et non au jour de l'insertion
+    backdated: bool = False
+
+    # Tentatives LLM sans réponse à l'étape en cours (StagedMessage.attempts)
+    attempts: int = 0
+
+    # Ligne de staging (reprise) et ligne Message (étape rejouée sur des messages stockés)
+    staging_id: Optional[int] = None
+    message_id: Optional[int] = None
+
+    @property
+    def source_text(self) -> str:
+        """Texte à traduire : l'original débarrassé de ses lignes répétées, s'il y en a."""
+        return self.text if self.clean_text is None else self.clean_text
+
+    @property
+    def llm_text(self) -> str:
+        """Texte à analyser : la traduction si elle existe, sinon l'original."""
+        return self.translated_text or self.source_text or ""
+
+    @property
+    def region_key(self) -> str:
+        return normalize_zone(self.region)
+
+    @property
+    def location_key(self) -> str:
+        return normalize_zone(self.location)
+
+    @property
+    def grid_cell(self) -> Optional[int]:
+        return grid_cell(self.lat, self.lon)
+
+    def to_row(self, created_at: datetime) -> Dict[str, Any]:
+        """
+        Colonnes de la table message, pour une insertion en masse.
+        """
+        event_timestamp = self.date
+        if isinstance(event_timestamp, datetime) and event_timestamp.tzinfo is None:
+            event_timestamp = event_timestamp.replace(tzinfo=timezone.utc)
+        if self.backdated and isinstance(event_timestamp, datetime):
+            # created_at est en UTC naïf (datetime.utcnow)
+            created_at = event_timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return {
+            "source": self.source or "unknown",
+            "channel": self.channel,
+            "raw_text": self.text or "",
+            "translated_text": self.translated_text,
+            "country": self.country,
+            "region": self.region,
+            "location": self.location,
+            "region_key": self.region_key,
+            "location_key": self.location_key,
+            "title": self.title,
+            "lat": self.lat,
+            "lon": self.lon,
+            "grid_cell": self.grid_cell,
+            "event_timestamp": event_timestamp,
+            "telegram_message_id": self.telegram_message_id,
+            "orientation": self.orientation,
+            "incident_id": self.incident_id,
+            "created_at": created_at,
+        }
@@ -0,0 +1,267 @@
+# app/services/relevance.py
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import re
+import zlib
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import delete, or_, select
+
+from app.config import get_settings
+from app.database import get_session
+from app.models.discarded_message import DiscardedMessage
+from app.services.records import MessageRecord
+from app.services.zones import normalize_zone
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "static" / "data"
+RULES_JSON_PATH = DATA_DIR / "relevance_rules.json"
+
+# Modèle : régression logistique sur n-grammes de mots hachés (pas de vocabulaire)
+N_FEATURES = 1 << 18
+TOKEN_RE = re.compile(r"\w{2,}")
+
+
+def hashed_features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices et valeurs (tf sous-linéaire, norme L2 = 1) des mots et bigrammes du texte.
+    """
+    tokens = TOKEN_RE.findall(normalize_zone(text))
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashes = np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) % N_FEATURES for g in grams), dtype=np.int64, count=len(grams)
+    )
+    indices, counts = np.unique(hashes, return_counts=True)
+    values = np.log1p(counts).astype(np.float32)
+    return indices, values / np.linalg.norm(values)
+
+
+@dataclass
+class RelevanceModel:
+    weights: np.ndarray
+    bias: float
+
+    def score(self, text: str) -> float:
+        """Probabilité que le message soit pertinent (événement à cartographier)."""
+        indices, values = hashed_features(text)
+        z = self.bias + float(values @ self.weights[indices]) if len(indices) else self.bias
+        return 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=np.array([self.bias]))
+
+    @classmethod
+    def load(cls, path: Path) -> "RelevanceModel":
+        with np.load(path) as data:
+            return cls(weights=data["weights"].astype(np.float32), bias=float(data["bias"][0]))
+
+
+@lru_cache
+def get_relevance_model() -> Optional[RelevanceModel]:
+    """Modèle entraîné par tools/train_relevance.py, ou None (règles seules)."""
+    path = Path(get_settings().relevance_model_path)
+    if not path.exists():
+        return None
+    return RelevanceModel.load(path)
+
+
+@lru_cache
+def prefilter_version() -> str:
+    """
+    Empreinte des règles, du modèle et du seuil : un message écarté n'est plus exclu des
+    runs suivants (il est réévalué) dès que l'un d'eux change.
+    """
+    settings = get_settings()
+    digest = hashlib.sha256(str(settings.relevance_threshold).encode())
+    for path in (RULES_JSON_PATH, Path(settings.relevance_model_path)):
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+@dataclass
+class ChannelRules:
+    min_chars: int
+    keep_keywords: List[str]
+    drop_keywords: List[str]
+    drop_patterns: List[Tuple[str, re.Pattern]]
+
+
+@lru_cache
+def _load_rules() -> dict:
+    with open(RULES_JSON_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_channel_rules(channel: Optional[str]) -> ChannelRules:
+    """
+    Règles du canal : les listes s'ajoutent à celles de "default", min_chars la remplace.
+    """
+    data = _load_rules()
+    default = data.get("default", {})
+    specific = data.get("channels", {}).get(channel or "", {})
+
+    def merged(key: str) -> list:
+        return list(default.get(key, [])) + list(specific.get(key, []))
+
+    return ChannelRules(
+        min_chars=int(specific.get("min_chars", default.get("min_chars", 0))),
+        keep_keywords=[normalize_zone(k) for k in merged("keep_keywords")],
+        drop_keywords=[normalize_zone(k) for k in merged("drop_keywords")],
+        drop_patterns=[
+            (p["name"], re.compile(p["pattern"], re.IGNORECASE)) for p in merged("drop_patterns")
+        ],
+    )
+
+
+def _without_footer(text: str) -> str:
+    """
+    Texte sans son dernier paragraphe (ou sa dernière ligne) s'il en a plusieurs : place
+    habituelle d'un pied de page ("abonnez-vous", lien de dons) pas encore appris.
+    """
+    stripped = text.strip()
+    paragraphs = re.split(r"\n\s*\n", stripped)
+    if len(paragraphs) > 1:
+        return "\n\n".join(paragraphs[:-1])
+    lines = stripped.splitlines()
+    if len(lines) > 1:
+        return "\n".join(lines[:-1])
+    return stripped
+
+
+def classify(msg: MessageRecord, model: Optional[RelevanceModel], threshold: float) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Renvoie (raison, score) : raison None si le message part vers le LLM.
+    Ordre : mots-clés à garder, puis motifs / mots écartés du canal, puis longueur minimale
+    et modèle. Tant que le pied de page du canal n'est pas appris (texte non nettoyé), les
+    motifs et mots écartés ne portent pas sur le dernier paragraphe : un compte rendu qui
+    finit par "Subscribe to our channel" n'est pas une pub.
+    """
+    rules = get_channel_rules(msg.channel)
+    text = msg.source_text or ""
+    normalized = normalize_zone(text)
+    if any(keyword in normalized for keyword in rules.keep_keywords):
+        return None, None
+    body = text if msg.clean_text is not None else _without_footer(text)
+    lowered = body.lower()
+    for name, pattern in rules.drop_patterns:
+        if pattern.search(lowered):
+            return f"motif:{name}", None
+    normalized_body = normalize_zone(body)
+    for keyword in rules.drop_keywords:
+        if keyword in normalized_body:
+            return f"mot:{keyword}", None
+    if len(text.strip()) < rules.min_chars:
+        return "court", None
+    if model is None:
+        return None, None
+    score = model.score(text)
+    if score < threshold:
+        return "modèle", score
+    return None, score
+
+
+def prefilter_messages(messages: List[MessageRecord], run_id: str) -> List[MessageRecord]:
+    """
+    Préfiltre local avant les étapes LLM : renvoie les messages gardés, les autres sont
+    enregistrés dans la table d'audit (discardedmessage). Un message déjà écarté par une
+    version antérieure des règles ou du modèle voit son entrée d'audit remplacée (ou retirée
+    s'il est désormais gardé).
+    """
+    settings = get_settings()
+    if not messages or not settings.relevance_filter:
+        return messages
+    model = get_relevance_model()
+    version = prefilter_version()
+    kept: List[MessageRecord] = []
+    discarded: List[Tuple[MessageRecord, str, Optional[float]]] = []
+    for msg in messages:
+        reason, score = classify(msg, model, settings.relevance_threshold)
+        if reason is None:
+            kept.append(msg)
+        else:
+            discarded.append((msg, reason, score))
+    _drop_stale_entries(messages, version)
+    if not discarded:
+        return kept
+
+    with get_session() as session:
+        for msg, reason, score in discarded:
+            session.add(DiscardedMessage(
+                channel=msg.channel,
+                telegram_message_id=msg.telegram_message_id,
+                source=msg.source,
+                orientation=msg.orientation,
+                text=msg.text or "",
+                date=msg.date,
+                reason=reason,
+                score=score,
+                run_id=run_id,
+                version=version,
+            ))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Déjà écartés par un autre worker : rien à ajouter
+            session.rollback()
+
+    reasons: Dict[str, int] = {}
+    for _, reason, _ in discarded:
+        key = reason.split(":", 1)[0]
+        reasons[key] = reasons.get(key, 0) + 1
+    detail = ", ".join(f"{k} {v}" for k, v in sorted(reasons.items(), key=lambda kv: -kv[1]))
+    print(
+        f"[relevance] {len(discarded)}/{len(messages)} messages écartés avant le LLM ({detail}) ; "
+        f"modèle {'actif' if model is not None else 'absent (règles seules)'}"
+    )
+    return kept
+
+
+def _drop_stale_entries(messages: List[MessageRecord], version: str) -> None:
+    """Retire les entrées d'audit de ces messages laissées par une version antérieure."""
+    keys = {(m.channel, m.telegram_message_id) for m in messages}
+    channels = {k[0] for k in keys if k[0] is not None}
+    ids = {k[1] for k in keys if k[1] is not None}
+    if not channels or not ids:
+        return
+    with get_session() as session:
+        rows = session.exec(
+            select(DiscardedMessage.id, DiscardedMessage.channel, DiscardedMessage.telegram_message_id).where(
+                DiscardedMessage.channel.in_(channels),
+                DiscardedMessage.telegram_message_id.in_(ids),
+                or_(DiscardedMessage.version.is_(None), DiscardedMessage.version != version),
+            )
+        ).all()
+        stale = [row[0] for row in rows if (row[1], row[2]) in keys]
+        if stale:
+            session.exec(delete(DiscardedMessage).where(DiscardedMessage.id.in_(stale)))
+            session.commit()
+
+
+def discarded_keys(keys: List[Tuple[str, int]], version: str) -> set:
+    """
+    Clés (canal, id Telegram) écartées lors d'un run précédent par les règles et le modèle
+    de cette version (prefilter_version) ; après un changement, ces messages sont réévalués.
+    """
+    channels = {k[0] for k in keys if k[0] is not None}
+    ids = {k[1] for k in keys if k[1] is not None}
+    if not channels or not ids:
+        return set()
+    with get_session() as session:
+        rows = session.exec(
+            select(DiscardedMessage.channel, DiscardedMessage.telegram_message_id).where(
+                DiscardedMessage.channel.in_(channels),
+                DiscardedMessage.telegram_message_id.in_(ids),
+                DiscardedMessage.version == version,
+            )
+        ).all()
+    return {(row[0], row[1]) for row in rows}
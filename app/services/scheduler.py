@@ -0,0 +1,142 @@
+# app/services/scheduler.py
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import math
+
+from app.config import get_settings
+from app.services.records import MessageRecord
+
+# Estimation grossière (textes souvent en cyrillique / arabe : ~3 caractères par token)
+CHARS_PER_TOKEN = 3
+# Consignes du prompt réparties sur les messages d'un batch, et sortie de l'enrichissement
+PROMPT_TOKENS_PER_CALL = 300
+ENRICH_OUTPUT_TOKENS = 60
+
+REPORTS_DIR = Path("data/reports")
+
+
+def estimate_tokens(msg: MessageRecord, stage: str, batch_size: int) -> int:
+    """
+    Tokens (entrée + sortie) estimés pour amener le message de son étape actuelle
+    ("fetched" ou "translated") jusqu'à "enriched".
+    """
+    overhead = PROMPT_TOKENS_PER_CALL / max(batch_size, 1)
+    text_tokens = math.ceil(len(msg.llm_text) / CHARS_PER_TOKEN)
+    enrich = text_tokens + ENRICH_OUTPUT_TOKENS + overhead
+    if stage == "fetched":
+        # Traduction : le texte en entrée, sa traduction en sortie
+        return math.ceil(2 * text_tokens + overhead + enrich)
+    return math.ceil(enrich)
+
+
+@dataclass
+class TokenBudget:
+    """
+    Budget de tokens estimés d'un run (0 = illimité), partagé par les lots d'un worker
+    shardé. Garde la trace des messages traités et reportés pour le rapport de fin de run.
+    """
+    limit: int = 0
+    used: int = 0
+    processed: List[dict] = field(default_factory=list)
+    deferred: List[dict] = field(default_factory=list)
+
+    def take(self, tokens: int) -> bool:
+        if self.limit and self.used + tokens > self.limit:
+            return False
+        self.used += tokens
+        return True
+
+
+def _sort_key(msg: MessageRecord, priorities: Dict[str, int], default: int):
+    date = msg.date
+    if date is None:
+        ts = 0.0
+    else:
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        ts = date.timestamp()
+    # Priorité du canal décroissante, puis les plus récents d'abord
+    return (-priorities.get(msg.channel, default), -ts)
+
+
+def schedule_llm_work(
+    pending: Dict[str, List[MessageRecord]],
+    budget: TokenBudget,
+    priorities: Dict[str, int],
+) -> Dict[str, List[MessageRecord]]:
+    """
+    Ordonne le travail LLM (étapes "fetched" et "translated") par priorité de canal puis
+    récence, et ne garde que ce qui tient dans le budget. Un message trop coûteux est
+    reporté et les suivants, moins chers, peuvent encore passer. Les messages reportés
+    restent à leur étape dans le staging : le run suivant les reprend. Les messages déjà
+    enrichis ne coûtent plus rien et sont toujours gardés.
+    """
+    settings = get_settings()
+    default = settings.channel_default_priority
+    candidates = [(stage, msg) for stage in ("fetched", "translated") for msg in pending.get(stage, [])]
+    candidates.sort(key=lambda item: _sort_key(item[1], priorities, default))
+
+    scheduled: Dict[str, List[MessageRecord]] = {stage: [] for stage in pending}
+    scheduled["enriched"] = list(pending.get("enriched", []))
+    for stage, msg in candidates:
+        tokens = estimate_tokens(msg, stage, settings.batch_size)
+        entry = {
+            "channel": msg.channel,
+            "telegram_message_id": msg.telegram_message_id,
+            "stage": stage,
+            "priority": priorities.get(msg.channel, default),
+            "date": msg.date.isoformat() if isinstance(msg.date, datetime) else None,
+            "tokens": tokens,
+        }
+        if budget.take(tokens):
+            scheduled[stage].append(msg)
+            budget.processed.append(entry)
+        else:
+            budget.deferred.append(entry)
+    return scheduled
+
+
+def _per_channel(entries: List[dict]) -> Dict[str, Dict[str, int]]:
+    summary: Dict[str, Dict[str, int]] = {}
+    for entry in entries:
+        chan = summary.setdefault(entry["channel"] or "?", {"messages": 0, "tokens": 0})
+        chan["messages"] += 1
+        chan["tokens"] += entry["tokens"]
+    return summary
+
+
+def write_schedule_report(budget: TokenBudget, run_id: str, directory: Optional[Path] = None) -> Optional[Path]:
+    """
+    Rapport de fin de run : messages traités et reportés (par canal et en détail), dans
+    data/reports/schedule-<run_id>.json, avec un résumé affiché.
+    """
+    if not budget.processed and not budget.deferred:
+        return None
+    directory = directory or REPORTS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"schedule-{run_id}.json"
+    report = {
+        "run_id": run_id,
+        "token_budget": budget.limit or None,
+        "tokens_used": budget.used,
+        "processed": {"by_channel": _per_channel(budget.processed), "messages": budget.processed},
+        "deferred": {"by_channel": _per_channel(budget.deferred), "messages": budget.deferred},
+    }
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    limit = f"{budget.limit}" if budget.limit else "illimité"
+    print(
+        f"[scheduler] Run {run_id} : {len(budget.processed)} messages traités "
+        f"(~{budget.used} tokens, budget {limit}), {len(budget.deferred)} reportés au run suivant"
+    )
+    deferred = _per_channel(budget.deferred)
+    for chan, stats in sorted(_per_channel(budget.processed).items(), key=lambda kv: -kv[1]["tokens"]):
+        later = deferred.get(chan, {"messages": 0})
+        print(f"[scheduler]   {chan:<24} {stats['messages']:5d} traités  {later['messages']:5d} reportés")
+    for chan in sorted(set(deferred) - set(_per_channel(budget.processed))):
+        print(f"[scheduler]   {chan:<24} {0:5d} traités  {deferred[chan]['messages']:5d} reportés")
+    print(f"[scheduler] Rapport : {path}")
+    return path
@@ -0,0 +1,88 @@
+# app/services/snapshot.py
+from pathlib import Path
+from typing import Optional
+import os
+import time
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.schema import CreateTable
+
+from app.database import get_engine, get_snapshot_path
+from app.models.daily_count import DailyCount
+from app.models.incident import Incident
+from app.models.message import Message
+
+COPY_CHUNK = 5000
+
+
+def _build_engine(path: Path):
+    engine = create_engine(f"sqlite:///{path}")
+
+    # Fichier temporaire reconstruit de zéro : pas besoin de journal pendant la copie
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+    return engine
+
+
+def publish_snapshot(path: Optional[Path] = None) -> Path:
+    """
+    Construit un snapshot SQLite en lecture seule des tables lues par l'API (messages,
+    incidents, comptes quotidiens pré-agrégés), indexé, ANALYZE puis VACUUM, et le met
+    en place atomiquement (os.replace) : l'API bascule sur le nouveau fichier sans jamais
+    voir un snapshot incomplet.
+    """
+    path = path or get_snapshot_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    t0 = time.perf_counter()
+
+    tables = [Message.__table__, Incident.__table__]
+    dst = _build_engine(tmp)
+    copied = {}
+    try:
+        with get_engine().connect() as src_conn, dst.begin() as dst_conn:
+            # Index créés après la copie : insertion plus rapide, index compacts
+            for table in tables + [DailyCount.__table__]:
+                dst_conn.execute(CreateTable(table))
+            for table in tables:
+                result = src_conn.execution_options(yield_per=COPY_CHUNK).execute(select(table))
+                copied[table.name] = 0
+                for part in result.partitions():
+                    dst_conn.execute(table.insert(), [dict(row._mapping) for row in part])
+                    copied[table.name] += len(part)
+
+            day = func.date(Message.created_at)
+            dst_conn.execute(
+                insert(DailyCount.__table__).from_select(
+                    ["country", "day", "count"],
+                    select(Message.country, day, func.count()).group_by(Message.country, day),
+                )
+            )
+            for table in tables + [DailyCount.__table__]:
+                for index in table.indexes:
+                    index.create(dst_conn)
+
+        with dst.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE")
+            conn.exec_driver_sql("VACUUM")
+        dst.dispose()
+
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        dst.dispose()
+        tmp.unlink(missing_ok=True)
+
+    size_mb = path.stat().st_size / (1024 * 1024)
+    print(
+        f"[snapshot] {path} publié en {time.perf_counter() - t0:.1f}s "
+        f"({copied.get('message', 0)} messages, {copied.get('incident', 0)} incidents, {size_mb:.1f} Mo)"
+    )
+    return path
@@ -0,0 +1,173 @@
+# app/services/staging.py
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import uuid
+
+from sqlalchemy import bindparam, delete, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from app.database import get_session
+from app.models.staged_message import StagedMessage
+from app.services.records import MessageRecord
+
+# Étapes dans l'ordre : un message ne recule jamais
+STAGES = ("fetched", "translated", "enriched", "stored")
+# Champs produits par les étapes, réécrits à chaque transition
+PAYLOAD_FIELDS = ("translated_text", "country", "region", "location", "title")
+
+
+def new_run_id() -> str:
+    return f"{datetime.utcnow():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def stage_messages(messages: List[MessageRecord], run_id: str) -> int:
+    """
+    Enregistre les messages collectés à l'étape "fetched". Les messages déjà présents
+    gardent leur étape (reprise). Renvoie le nombre de nouveaux messages.
+    """
+    if not messages:
+        return 0
+    channels = {m.channel for m in messages}
+    ids = {m.telegram_message_id for m in messages}
+    with get_session() as session:
+        existing = set(
+            session.exec(
+                select(StagedMessage.channel, StagedMessage.telegram_message_id).where(
+                    StagedMessage.channel.in_(channels),
+                    StagedMessage.telegram_message_id.in_(ids),
+                )
+            ).all()
+        )
+        added = 0
+        for msg in messages:
+            key = (msg.channel, msg.telegram_message_id)
+            if key in existing:
+                continue
+            existing.add(key)
+            date = msg.date
+            if isinstance(date, datetime) and date.tzinfo is not None:
+                date = date.replace(tzinfo=None) - date.utcoffset()
+            session.add(StagedMessage(
+                channel=key[0],
+                telegram_message_id=key[1],
+                run_id=run_id,
+                source=msg.source,
+                orientation=msg.orientation,
+                text=msg.text or "",
+                date=date,
+                backdated=msg.backdated or None,
+            ))
+            added += 1
+        try:
+            session.commit()
+        except IntegrityError:
+            # Un autre worker a inséré les mêmes messages entre-temps : on garde les siens
+            session.rollback()
+            added = 0
+    return added
+
+
+def load_pending(channels: Optional[Iterable[str]] = None) -> Dict[str, List[MessageRecord]]:
+    """
+    Messages non terminés (de ce run ou d'un run interrompu), groupés par étape atteinte.
+    """
+    pending: Dict[str, List[MessageRecord]] = {stage: [] for stage in STAGES[:-1]}
+    with get_session() as session:
+        # Même condition que l'index partiel ix_stagedmessage_pending : seules les lignes
+        # en attente sont lues, dans l'ordre des ids
+        stmt = select(StagedMessage).where(StagedMessage.stage != "stored")
+        if channels is not None:
+            stmt = stmt.where(StagedMessage.channel.in_(list(channels)))
+        for row in session.exec(stmt.order_by(StagedMessage.id)).all():
+            pending.setdefault(row.stage, []).append(MessageRecord(
+                staging_id=row.id,
+                source=row.source,
+                channel=row.channel,
+                orientation=row.orientation,
+                text=row.text,
+                date=row.date,
+                backdated=bool(row.backdated),
+                attempts=row.attempts or 0,
+                telegram_message_id=row.telegram_message_id,
+                **{field: getattr(row, field) for field in PAYLOAD_FIELDS},
+            ))
+    return pending
+
+
+def advance(messages: List[MessageRecord], stage: str, run_id: str) -> None:
+    """
+    Fait passer les messages à l'étape donnée en enregistrant leurs champs produits.
+    Transition idempotente et monotone : un message déjà plus loin n'est pas modifié,
+    ce qui permet aux étapes parallèles de marquer leurs messages dans n'importe quel ordre.
+    """
+    rows = [m for m in messages if m.staging_id is not None]
+    if not rows:
+        return
+    table = StagedMessage.__table__
+    stmt = (
+        update(table)
+        .where(
+            table.c.id == bindparam("b_id"),
+            or_(*(table.c.stage == earlier for earlier in STAGES[:STAGES.index(stage)])),
+        )
+        .values(
+            stage=stage,
+            run_id=run_id,
+            attempts=0,
+            updated_at=datetime.utcnow(),
+            **{field: bindparam(f"b_{field}") for field in PAYLOAD_FIELDS},
+        )
+    )
+    params = [
+        {"b_id": m.staging_id, **{f"b_{field}": getattr(m, field) for field in PAYLOAD_FIELDS}}
+        for m in rows
+    ]
+    with get_session() as session:
+        session.connection().execute(stmt, params)
+        session.commit()
+    for msg in rows:
+        # Nouvelle étape : les envois sans réponse sont comptés à nouveau depuis zéro
+        msg.attempts = 0
+
+
+def record_missed(messages: List[MessageRecord], max_attempts: int) -> List[MessageRecord]:
+    """
+    Compte un envoi au LLM resté sans réponse (ligne absente, flux coupé, requête batch en
+    échec) pour chacun de ces messages. Renvoie ceux qui ont atteint max_attempts : à
+    l'appelant de leur appliquer un repli plutôt que de les renvoyer au run suivant.
+    """
+    if not messages:
+        return []
+    ids = [m.staging_id for m in messages if m.staging_id is not None]
+    if ids:
+        table = StagedMessage.__table__
+        with get_session() as session:
+            session.connection().execute(
+                update(table)
+                .where(table.c.id.in_(ids))
+                .values(attempts=func.coalesce(table.c.attempts, 0) + 1)
+            )
+            session.commit()
+    for msg in messages:
+        msg.attempts += 1
+    return [m for m in messages if m.attempts >= max_attempts]
+
+
+def drop_staged(messages: List[MessageRecord]) -> None:
+    """
+    Retire du staging des messages qui ne seront pas traités (écartés par le préfiltre).
+    """
+    ids = [m.staging_id for m in messages if m.staging_id is not None]
+    if not ids:
+        return
+    with get_session() as session:
+        session.exec(delete(StagedMessage).where(StagedMessage.id.in_(ids)))
+        session.commit()
+
+
+def purge_staging(days: int = 7) -> None:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with get_session() as session:
+        session.exec(delete(StagedMessage).where(StagedMessage.created_at < cutoff))
+        session.commit()
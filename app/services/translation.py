@@ -1,24 +1,14 @@
 # app/services/translation.py
-from typing import List
-from openai import OpenAI
+from typing import Callable, Iterable, List, Optional
+import json
 
 from app.config import get_settings
+from app.services.batch import run_batch
+from app.services.llm import stream_lines
+from app.services.records import MessageRecord
 
-settings = get_settings()
-client = OpenAI(api_key=settings.openai_api_key)
-MODEL_NAME = settings.openai_model
-# Nombre de messages par appel OpenAI
-BATCH_SIZE = settings.batch_size
-
-
-def _translate_subbatch(texts: List[str]) -> List[str]:
-    """
-    Traduit un sous-batch de messages vers un français naturel.
-    Texte => texte, même ordre.
-    """
-    if not texts:
-        return []
 
+def _translation_prompt(texts: List[str]) -> str:
     header = (
         "Tu es un traducteur professionnel.\n"
         "Je vais te donner une liste de messages numérotés.\n"
@@ -34,23 +24,24 @@ def _translate_subbatch(texts: List[str]) -> List[str]:
     body_lines = []
     for i, txt in enumerate(texts):
         body_lines.append(f"[{i}] {txt}")
-    prompt = header + "\n".join(body_lines)
-
-    resp = client.responses.create(
-        model=MODEL_NAME,
-        input=prompt,
-    )
+    return header + "\n".join(body_lines)
 
-    try:
-        raw = resp.output_text
-    except AttributeError:
-        raw = str(resp)
 
-    import json
-    lines = [l.strip() for l in raw.splitlines() if l.strip()]
-    translations = [""] * len(texts)
+def _parse_translation_lines(
+    lines: Iterable[str],
+    texts: List[str],
+    on_record: Optional[Callable[[int, str], None]] = None,
+) -> List[Optional[str]]:
+    """
+    Relit la sortie JSONL du modèle ligne par ligne ; on_record(index, traduction) est appelé
+    dès qu'une ligne valide arrive. None pour les index manquants (ligne absente ou flux coupé).
+    """
+    translations: List[Optional[str]] = [None] * len(texts)
 
     for line in lines:
+        line = line.strip()
+        if not line:
+            continue
         try:
             obj = json.loads(line)
         except json.JSONDecodeError:
@@ -62,35 +53,88 @@ def _translate_subbatch(texts: List[str]) -> List[str]:
         idx = obj["index"]
         if not isinstance(idx, int):
             continue
-        if 0 <= idx < len(texts):
-            translations[idx] = str(obj["translation"])
-
-    # fallback si certains indices sont vides => on remet le texte d’origine
-    for i, t in enumerate(translations):
-        if not t:
-            translations[i] = texts[i]
+        if 0 <= idx < len(texts) and not translations[idx]:
+            translations[idx] = str(obj["translation"]) or None
+            if on_record and translations[idx]:
+                on_record(idx, translations[idx])
 
     return translations
 
 
-def translate_messages(messages: List[dict]) -> List[dict]:
+def _parse_translations(raw: str, texts: List[str]) -> List[Optional[str]]:
+    return _parse_translation_lines(raw.splitlines(), texts)
+
+
+def _translate_subbatch(
+    texts: List[str],
+    on_record: Optional[Callable[[int, str], None]] = None,
+) -> List[Optional[str]]:
     """
-    Prend une liste de dicts avec au moins 'text',
-    ajoute 'translated_text' en batchs successifs.
-    Modifie la liste en place et la renvoie.
+    Traduit un sous-batch de messages vers un français naturel.
+    Texte => texte (None si non reçu), même ordre. La réponse est lue en streaming.
     """
-    if not messages:
-        return messages
-
-    total = len(messages)
-    for start in range(0, total, BATCH_SIZE):
-        end = min(start + BATCH_SIZE, total)
-        sub = messages[start:end]
-        texts = [m.get("text", "") for m in sub]
+    if not texts:
+        return []
+    return _parse_translation_lines(stream_lines(_translation_prompt(texts)), texts, on_record)
 
-        translations = _translate_subbatch(texts)
 
-        for msg, trans in zip(sub, translations):
-            msg["translated_text"] = trans
+def translate_messages(
+    messages: List[MessageRecord],
+    use_batch: Optional[bool] = None,
+    on_message: Optional[Callable[[MessageRecord], None]] = None,
+) -> List[MessageRecord]:
+    """
+    Remplit translated_text à partir de source_text, en batchs successifs.
+    En mode batch, tous les sous-batchs partent dans un seul job Batch API.
+    on_message(msg) est appelé pour chaque message dès que sa traduction est disponible.
+    Renvoie les messages effectivement traduits : ceux dont la ligne n'est pas arrivée
+    (flux coupé, requête batch en échec) restent inchangés, à reprendre au run suivant.
+    """
+    if not messages:
+        return []
 
-    return messages
+    settings = get_settings()
+    if use_batch is None:
+        use_batch = settings.openai_batch
+
+    # Nombre de messages par appel OpenAI
+    batch_size = settings.batch_size
+    subs = [messages[start:start + batch_size] for start in range(0, len(messages), batch_size)]
+
+    raws = {}
+    if use_batch:
+        raws = run_batch(
+            {f"translate-{n}": _translation_prompt([m.source_text for m in sub]) for n, sub in enumerate(subs)},
+            name="translate",
+        )
+
+    done: List[MessageRecord] = []
+    for n, sub in enumerate(subs):
+        texts = [m.source_text for m in sub]
+        emitted = set()
+
+        def on_record(idx: int, translation: str) -> None:
+            sub[idx].translated_text = translation
+            emitted.add(idx)
+            on_message(sub[idx])
+
+        if use_batch:
+            if f"translate-{n}" not in raws:
+                # Requête en échec : le sous-batch reste à traduire
+                continue
+            translations = _parse_translations(raws[f"translate-{n}"], texts)
+        else:
+            translations = _translate_subbatch(texts, on_record=on_record if on_message else None)
+
+        for idx, (msg, trans) in enumerate(zip(sub, translations)):
+            if trans is None:
+                continue
+            msg.translated_text = trans
+            done.append(msg)
+            if on_message and idx not in emitted:
+                on_message(msg)
+
+    missing = len(messages) - len(done)
+    if missing:
+        print(f"[translate] {missing}/{len(messages)} traductions non reçues : messages laissés en attente")
+    return done
@@ -0,0 +1,74 @@
+# app/services/zones.py
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+
+def normalize_zone(value: Optional[str]) -> str:
+    """
+    Forme de comparaison d'un nom de zone : minuscules, sans accents, espaces réduits.
+    """
+    if value is None:
+        return ""
+    s = str(value).strip().lower()
+    s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+    s = re.sub(r'\s+', ' ', s)
+    return s
+
+
+def zone_key(region: Optional[str], location: Optional[str]) -> str:
+    """
+    Clé (région, lieu) utilisée pour regrouper les messages d'une même zone.
+    """
+    return f"{normalize_zone(region)}|{normalize_zone(location)}"
+
+
+# Grille spatiale des messages géocodés (Message.grid_cell) : cases de GRID_DEGREES degrés
+# numérotées ligne par ligne depuis (-90, -180). Une emprise se traduit en quelques
+# intervalles de numéros, lus par l'index (grid_cell, created_at) sur SQLite comme PostgreSQL
+GRID_DEGREES = 1.0
+GRID_COLUMNS = int(360 / GRID_DEGREES)
+GRID_ROWS = int(180 / GRID_DEGREES)
+
+
+def _grid_row(lat: float) -> int:
+    return min(max(int((lat + 90) // GRID_DEGREES), 0), GRID_ROWS - 1)
+
+
+def _grid_column(lon: float) -> int:
+    return int(((lon + 180) % 360) // GRID_DEGREES)
+
+
+def grid_cell(lat: Optional[float], lon: Optional[float]) -> Optional[int]:
+    if lat is None or lon is None:
+        return None
+    return _grid_row(lat) * GRID_COLUMNS + _grid_column(lon)
+
+
+def grid_ranges(west: float, south: float, east: float, north: float) -> List[Tuple[int, int]]:
+    """
+    Intervalles [début, fin] de numéros de case qui couvrent l'emprise : un par ligne de la
+    grille (deux si l'emprise traverse l'antiméridien), fusionnés quand ils se suivent.
+    """
+    if east - west >= 360:
+        spans = [(0, GRID_COLUMNS - 1)]
+    else:
+        first, last = _grid_column(west), _grid_column(east)
+        spans = [(first, last)] if first <= last else [(first, GRID_COLUMNS - 1), (0, last)]
+    cells = sorted(
+        (row * GRID_COLUMNS + start, row * GRID_COLUMNS + end)
+        for row in range(_grid_row(south), _grid_row(north) + 1)
+        for start, end in spans
+    )
+    ranges: List[Tuple[int, int]] = []
+    for start, end in cells:
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def in_longitudes(lon: float, west: float, east: float) -> bool:
+    """Longitude comprise dans [west, east], y compris à travers l'antiméridien."""
+    return east - west >= 360 or (lon - west) % 360 <= east - west
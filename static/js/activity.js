@@ -0,0 +1,75 @@
+// activity.js
+// Matrice d'activité pays × jour (une seule requête) et sparklines du panneau latéral
+
+import { store } from './store.js';
+
+export async function loadActivityMatrix(days = 30) {
+    const end = new Date();
+    const start = new Date(end.getTime() - (days - 1) * 86400000);
+    const iso = (d) => d.toISOString().slice(0, 10);
+    const resp = await fetch(`/api/activity/matrix?start=${iso(start)}&end=${iso(end)}`);
+    if (!resp.ok) {
+        console.error("Erreur /api/activity/matrix", resp.status);
+        return;
+    }
+    const data = await resp.json();
+    const rowByCountry = {};
+    data.countries.forEach((c, i) => { rowByCountry[c] = i; });
+    store.activity = { ...data, rowByCountry };
+    if (store.currentCountry) {
+        renderCountrySparkline(store.currentCountry);
+    }
+}
+
+// Incréments [pays, jour, n] du flux SSE appliqués à la matrice en mémoire
+export function applyActivityDeltas(counts) {
+    const activity = store.activity;
+    if (!activity) {
+        return;
+    }
+    counts.forEach(([country, day, n]) => {
+        const col = activity.dates.indexOf(day);
+        if (col < 0) {
+            return;
+        }
+        if (!(country in activity.rowByCountry)) {
+            activity.rowByCountry[country] = activity.countries.length;
+            activity.countries.push(country);
+            activity.counts.push(new Array(activity.dates.length).fill(0));
+            activity.totals.push(0);
+        }
+        const row = activity.rowByCountry[country];
+        activity.counts[row][col] += n;
+        activity.totals[row] += n;
+    });
+    if (store.currentCountry) {
+        renderCountrySparkline(store.currentCountry);
+    }
+}
+
+export function renderCountrySparkline(country) {
+    const container = document.getElementById("panel-sparkline");
+    const activity = store.activity;
+    if (!container) {
+        return;
+    }
+    if (!activity || !(country in activity.rowByCountry)) {
+        container.innerHTML = "";
+        return;
+    }
+    const values = activity.counts[activity.rowByCountry[country]];
+    const width = 300;
+    const height = 36;
+    const max = Math.max(1, ...values);
+    const barWidth = width / values.length;
+    const bars = values
+        .map((v, i) => {
+            const h = Math.max(v > 0 ? 2 : 0, (v / max) * (height - 2));
+            return `<rect x="${(i * barWidth).toFixed(1)}" y="${(height - h).toFixed(1)}" width="${Math.max(1, barWidth - 1).toFixed(1)}" height="${h.toFixed(1)}"><title>${activity.dates[i]} : ${v}</title></rect>`;
+        })
+        .join("");
+    container.innerHTML = `
+        <svg viewBox="0 0 ${width} ${height}" preserveAspectRatio="none" class="sparkline">${bars}</svg>
+        <span class="sparkline-legend">${activity.dates[0]} → ${activity.dates[activity.dates.length - 1]}</span>
+    `;
+}
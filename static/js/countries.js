@@ -1,128 +1,288 @@
 // countries.js
-// Gestion des données pays et des pastilles
+// Gestion des pastilles pays (données précalculées par /api/map/markers) et, aux zooms
+// élevés, des zones géocodées de l'emprise visible (/api/events/bbox)
 
 
-import { map, markersByCountry, flagMarkersByCountry, clearMarkers, markerStyle, IS_MOBILE } from './map.js';
-import { openSidePanel } from './events.js';
+import { map, markersByCountry, flagMarkersByCountry, hitMarkersByCountry, clusterMarkers, zoneMarkers, clearMarkers, markerStyle, IS_MOBILE } from './map.js';
+import { openSidePanel, prefetchCountryEvents } from './events.js';
 import { store } from './store.js';
 
+// pays -> [lat, lon] (connu via la réponse markers, plus besoin de countries.json côté client)
 export let countryCoords = {};
-export let countryAliases = {};
+export let countryCounts = {};
 
-export async function loadCountryData() {
-    const resp = await fetch("/static/data/countries.json");
-    const data = await resp.json();
-    countryCoords = data.coordinates || {};
-    countryAliases = data.aliases || {};
-}
+// Dernière réponse /api/map/markers : { markers: [[lat, lon, count, key]], clusters: { zoom: [[lat, lon, count, [idx]]] } }
+let markerData = { markers: [], clusters: {} };
+let zoomListenerAttached = false;
+const PREFETCH_TOP_COUNTRIES = 5;
+
+// À partir de ce zoom, les zones de l'emprise remplacent les pastilles pays
+const ZONE_MIN_ZOOM = 5;
+// Emprise max acceptée par /api/events/bbox (degrés, cf. app/api/map.py)
+const MAX_BBOX_DEGREES = 120;
+// Marge chargée autour de la vue : un petit déplacement ne relance pas de requête
+const BBOX_PADDING = 0.25;
+// Dernière réponse /api/events/bbox et emprise / zoom / date correspondants
+let zoneData = null;
+let zoneLoaded = null;
+let zoneRequest = null;
+let zoneRefreshTimer = null;
 
 export async function loadActiveCountries(currentGlobalDate = store.currentGlobalDate) {
-    console.log("[DEBUG] Clés countryCoords:", Object.keys(countryCoords));
-    console.log("[DEBUG] Aliases:", countryAliases);
-    let url = "/api/countries/active";
+    let url = "/api/map/markers";
     if (currentGlobalDate && currentGlobalDate !== "ALL") {
         url += `?date=${encodeURIComponent(currentGlobalDate)}`;
     }
-    const resp = await fetch(url);
+    // Revalidation systématique (ETag) : après un delta SSE la version en cache HTTP est périmée
+    const resp = await fetch(url, { cache: "no-cache" });
     if (!resp.ok) {
-        console.error("Erreur /api/countries/active", resp.status);
+        console.error("Erreur /api/map/markers", resp.status);
         return;
     }
     const apiData = await resp.json();
-    const countries = apiData.countries || [];
-    const ignored = apiData.ignored_countries || [];
-    console.log("[DEBUG] Pays reçus de l'API:", countries.map(c => c.country));
-    clearMarkers();
-    const missing = [];
+    markerData = { markers: apiData.markers || [], clusters: apiData.clusters || {} };
+    countryCoords = {};
+    countryCounts = {};
+    markerData.markers.forEach(([lat, lon, count, key]) => {
+        countryCoords[key] = [lat, lon];
+        countryCounts[key] = count;
+    });
+    if (!zoomListenerAttached) {
+        // moveend suit aussi chaque zoomend
+        map.on("moveend", () => updateMarkers());
+        zoomListenerAttached = true;
+    }
+    updateMarkers(true);
+    // Les pays sont triés par activité : on précharge le panneau des premiers
+    prefetchCountryEvents(markerData.markers.slice(0, PREFETCH_TOP_COUNTRIES).map((m) => m[3]), currentGlobalDate);
+
+    const ignored = apiData.ignored || [];
     const alert = document.getElementById("dashboard-alert");
-    const getTolerance = () => {
-        const zoom = map.getZoom();
-        if (zoom >= 5) return 2000;
-        if (zoom >= 4) return 6000;
-        if (zoom >= 3) return 15000;
-        return 30000;
-    };
-    countries.forEach((c) => {
-        let normName = c.country;
-        const count = c.events_count;
-        let key = normName;
-        if (!(key in countryCoords)) {
-            if (countryAliases[normName] && countryCoords[countryAliases[normName]]) {
-                key = countryAliases[normName];
-            } else {
-                missing.push(normName);
-                return;
-            }
+    if (alert) {
+        if (ignored.length > 0) {
+            alert.textContent = `⚠️ Pays non reconnus côté backend : ${ignored.join(", ")}`;
+            alert.style.display = "block";
+        } else {
+            alert.style.display = "none";
         }
-        const [lat, lon] = countryCoords[key];
-        if (markersByCountry[key]) {
-            return;
+    }
+}
+
+// Pastilles pays aux zooms faibles, zones de l'emprise visible au-delà
+function updateMarkers(force = false) {
+    if (map.getZoom() < ZONE_MIN_ZOOM) {
+        zoneLoaded = null;
+        renderMarkers();
+        return;
+    }
+    loadZoneMarkers(force);
+}
+
+function zoneBounds() {
+    const padded = map.getBounds().pad(BBOX_PADDING);
+    if (padded.getEast() - padded.getWest() <= MAX_BBOX_DEGREES) {
+        return padded;
+    }
+    const visible = map.getBounds();
+    return visible.getEast() - visible.getWest() <= MAX_BBOX_DEGREES ? visible : null;
+}
+
+async function loadZoneMarkers(force = false) {
+    const zoom = map.getZoom();
+    const date = store.currentGlobalDate;
+    if (!force && zoneLoaded && zoneLoaded.zoom === zoom && zoneLoaded.date === date
+        && zoneLoaded.bounds.contains(map.getBounds())) {
+        return;
+    }
+    const bounds = zoneBounds();
+    if (!bounds) {
+        renderMarkers();
+        return;
+    }
+    const params = new URLSearchParams({
+        west: bounds.getWest().toFixed(3),
+        south: Math.max(bounds.getSouth(), -90).toFixed(3),
+        east: bounds.getEast().toFixed(3),
+        north: Math.min(bounds.getNorth(), 90).toFixed(3),
+        zoom: String(zoom),
+    });
+    if (date && date !== "ALL") {
+        params.set("date", date);
+    }
+    // Seule la dernière vue compte : la requête précédente est abandonnée
+    if (zoneRequest) {
+        zoneRequest.abort();
+    }
+    const request = new AbortController();
+    zoneRequest = request;
+    let resp;
+    try {
+        resp = await fetch(`/api/events/bbox?${params}`, { signal: request.signal, cache: "no-cache" });
+    } catch (err) {
+        if (err.name !== "AbortError") {
+            console.error("Erreur /api/events/bbox", err);
         }
-        const style = markerStyle(count);
-        const clickableRadius = style.radius * 2.5;
-        const interactiveCircle = L.circleMarker([lat, lon], {
-            radius: clickableRadius,
-            color: 'transparent',
-            fillColor: 'transparent',
-            fillOpacity: 0,
-            weight: 0,
-            interactive: true,
-            pane: 'markerPane',
-        });
-        // Affiche la pastille colorée (circleMarker)
-        const marker = L.circleMarker([lat, lon], style);
-        // Ajoute le drapeau au centre avec un marker HTML transparent superposé
-        const flag = key.split(' ')[0];
-        const flagMarker = L.marker([lat, lon], {
-            icon: L.divIcon({
-                className: 'country-flag-marker',
-                html: `<div style="display:flex;align-items:center;justify-content:center;width:${style.radius*2}px;height:${style.radius*2}px;font-size:${style.radius*1.2}px;pointer-events:none;">${flag}</div>`,
-                iconSize: [style.radius*2, style.radius*2],
-                iconAnchor: [style.radius, style.radius],
-            }),
-            interactive: false,
-            pane: 'markerPane',
-        });
-        if (!IS_MOBILE) {
-            const countryName = key.substring(flag.length + 1);
-            marker.bindPopup(`
-                <div style="font-size:2em; line-height:1; margin-bottom:2px;">${flag}</div>
-                <b>${countryName}</b>
-            `);
+        return;
+    }
+    if (!resp.ok) {
+        console.error("Erreur /api/events/bbox", resp.status);
+        renderMarkers();
+        return;
+    }
+    const data = await resp.json();
+    if (request !== zoneRequest || map.getZoom() < ZONE_MIN_ZOOM) {
+        return;
+    }
+    zoneData = data;
+    zoneLoaded = { bounds, zoom, date };
+    renderZoneMarkers();
+}
+
+// Regroupements de zones calculés par le serveur pour ce zoom
+function renderZoneMarkers() {
+    clearMarkers();
+    zoneData.clusters.forEach(([lat, lon, count, members]) => {
+        if (members.length === 1) {
+            addZoneMarker(zoneData.markers[members[0]]);
+        } else {
+            addClusterMarker(lat, lon, count);
         }
-        interactiveCircle.on("mouseover", function (e) {
-            marker.setStyle({ radius: style.radius * 1.15 });
-            if (!IS_MOBILE) {
-                marker.openPopup && marker.openPopup();
-            }
-        });
-        interactiveCircle.on("mouseout", function (e) {
-            marker.setStyle({ radius: style.radius });
-            if (!IS_MOBILE) {
-                marker.closePopup && marker.closePopup();
-            }
-        });
-        interactiveCircle.on("click", () => openSidePanel(key));
-        interactiveCircle.addTo(map);
-        marker.addTo(map);
-        flagMarker.addTo(map);
-        markersByCountry[key] = marker;
-        flagMarkersByCountry[key] = flagMarker;
     });
-    if (alert) {
-        let alertMsg = "";
-        if (missing.length > 0) {
-            alertMsg += `⚠️ Pays non géolocalisés : ${missing.join(", ")}`;
+}
+
+function addZoneMarker([lat, lon, count, key, label]) {
+    const marker = L.circleMarker([lat, lon], { ...markerStyle(count), pane: 'markerPane' });
+    const countryName = key.substring(key.split(' ')[0].length + 1);
+    // Sans nom de zone, seul le pays est connu : pastille au centroïde du pays
+    const title = label ? `${label} (${countryName})` : countryName;
+    if (!IS_MOBILE) {
+        marker.bindTooltip(`${title} — ${count}`);
+    }
+    marker.on("click", () => openSidePanel(key));
+    marker.addTo(map);
+    zoneMarkers.push(marker);
+}
+
+// Affiche les regroupements du zoom courant, ou les pastilles pays au-delà du dernier niveau fusionné
+function renderMarkers() {
+    clearMarkers();
+    const level = markerData.clusters[map.getZoom()];
+    if (!level) {
+        markerData.markers.forEach(([, , count, key]) => addCountryMarker(key, count));
+        return;
+    }
+    level.forEach(([lat, lon, count, members]) => {
+        if (members.length === 1) {
+            const [, , memberCount, key] = markerData.markers[members[0]];
+            addCountryMarker(key, memberCount);
+        } else {
+            addClusterMarker(lat, lon, count);
         }
-        if (ignored.length > 0) {
-            if (alertMsg) alertMsg += " | ";
-            alertMsg += `⚠️ Pays non reconnus côté backend : ${ignored.join(", ")}`;
+    });
+}
+
+function addClusterMarker(lat, lon, count) {
+    const style = markerStyle(count);
+    const radius = style.radius * 1.6;
+    const cluster = L.marker([lat, lon], {
+        icon: L.divIcon({
+            className: 'country-cluster-marker',
+            html: `<div style="display:flex;align-items:center;justify-content:center;width:${radius*2}px;height:${radius*2}px;border-radius:50%;background:${style.fillColor};opacity:${style.fillOpacity};color:#111;font-size:${Math.max(10, radius)}px;font-weight:600;">${count}</div>`,
+            iconSize: [radius*2, radius*2],
+            iconAnchor: [radius, radius],
+        }),
+        pane: 'markerPane',
+    });
+    cluster.on("click", () => map.setView([lat, lon], Math.min(map.getZoom() + 2, map.getMaxZoom())));
+    cluster.addTo(map);
+    clusterMarkers.push(cluster);
+}
+
+export function addCountryMarker(key, count) {
+    const [lat, lon] = countryCoords[key];
+    const style = markerStyle(count);
+    const clickableRadius = style.radius * 2.5;
+    const interactiveCircle = L.circleMarker([lat, lon], {
+        radius: clickableRadius,
+        color: 'transparent',
+        fillColor: 'transparent',
+        fillOpacity: 0,
+        weight: 0,
+        interactive: true,
+        pane: 'markerPane',
+    });
+    // Affiche la pastille colorée (circleMarker)
+    const marker = L.circleMarker([lat, lon], style);
+    // Ajoute le drapeau au centre avec un marker HTML transparent superposé
+    const flag = key.split(' ')[0];
+    const flagMarker = L.marker([lat, lon], {
+        icon: L.divIcon({
+            className: 'country-flag-marker',
+            html: `<div style="display:flex;align-items:center;justify-content:center;width:${style.radius*2}px;height:${style.radius*2}px;font-size:${style.radius*1.2}px;pointer-events:none;">${flag}</div>`,
+            iconSize: [style.radius*2, style.radius*2],
+            iconAnchor: [style.radius, style.radius],
+        }),
+        interactive: false,
+        pane: 'markerPane',
+    });
+    if (!IS_MOBILE) {
+        const countryName = key.substring(flag.length + 1);
+        marker.bindPopup(`
+            <div style="font-size:2em; line-height:1; margin-bottom:2px;">${flag}</div>
+            <b>${countryName}</b>
+        `);
+    }
+    interactiveCircle.on("mouseover", function (e) {
+        marker.setStyle({ radius: style.radius * 1.15 });
+        if (!IS_MOBILE) {
+            marker.openPopup && marker.openPopup();
         }
-        if (alertMsg) {
-            alert.textContent = alertMsg;
-            alert.style.display = "block";
-        } else {
-            alert.style.display = "none";
+    });
+    interactiveCircle.on("mouseout", function (e) {
+        marker.setStyle({ radius: style.radius });
+        if (!IS_MOBILE) {
+            marker.closePopup && marker.closePopup();
         }
+    });
+    interactiveCircle.on("click", () => openSidePanel(key));
+    interactiveCircle.addTo(map);
+    marker.addTo(map);
+    flagMarker.addTo(map);
+    markersByCountry[key] = marker;
+    flagMarkersByCountry[key] = flagMarker;
+    hitMarkersByCountry[key] = interactiveCircle;
+}
+
+// Applique des incréments { pays: n } reçus du flux SSE aux pastilles et regroupements existants
+export function applyCountryDeltas(increments) {
+    const keys = Object.keys(increments);
+    if (keys.length === 0) {
+        return;
+    }
+    if (keys.some((key) => !(key in countryCoords))) {
+        // Nouveau pays : ses coordonnées viennent du serveur (réponse courte, revalidée par ETag)
+        loadActiveCountries(store.currentGlobalDate);
+        return;
+    }
+    const indexByKey = {};
+    markerData.markers.forEach((m, idx) => { indexByKey[m[3]] = idx; });
+    keys.forEach((key) => {
+        const idx = indexByKey[key];
+        markerData.markers[idx][2] += increments[key];
+        countryCounts[key] = markerData.markers[idx][2];
+        Object.values(markerData.clusters).forEach((level) => {
+            level.forEach((cluster) => {
+                if (cluster[3].includes(idx)) {
+                    cluster[2] += increments[key];
+                }
+            });
+        });
+    });
+    if (map.getZoom() < ZONE_MIN_ZOOM) {
+        renderMarkers();
+        return;
     }
+    // Vue par zones : rechargée au plus une fois par rafale de deltas (revalidation ETag)
+    clearTimeout(zoneRefreshTimer);
+    zoneRefreshTimer = setTimeout(() => loadZoneMarkers(true), 2000);
 }
@@ -2,92 +2,278 @@
 // Rendu et chargement des événements, gestion du panneau latéral
 
 import { IS_MOBILE } from './map.js';
-import { store } from './store.js';
+import { store, fetchJsonCached, isCached, responseCache } from './store.js';
+import { renderCountrySparkline } from './activity.js';
+
+// Au-delà de ce nombre de messages, une zone dépliée n'insère que les lignes visibles
+const VIRTUAL_THRESHOLD = 80;
+const ESTIMATED_ROW_HEIGHT = 44;
+const OVERSCAN_ROWS = 8;
+
+// État du panneau courant : zones reçues, listes virtualisées, messages dépliés ("zone:msg")
+let panelZones = [];
+let panelRows = [];
+let virtualLists = new Map();
+let expandedMessages = new Set();
+
+function escapeHtml(value) {
+    return String(value ?? "").replace(/[&<>"']/g, (ch) => ({
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "'": "&#39;",
+    }[ch]));
+}
+
+function zoneLabel(zone) {
+    return [zone.region, zone.location].filter(Boolean).join(" – ") || "Zone inconnue";
+}
+
+// Messages d'une zone regroupés par incident (même événement rapporté par plusieurs canaux)
+function groupByIncident(messages) {
+    const rows = [];
+    const byIncident = new Map();
+    messages.forEach((m) => {
+        if (m.incident_id == null) {
+            rows.push([m]);
+            return;
+        }
+        let row = byIncident.get(m.incident_id);
+        if (!row) {
+            row = [];
+            byIncident.set(m.incident_id, row);
+            rows.push(row);
+        }
+        row.push(m);
+    });
+    return rows;
+}
+
+function eventMetaHtml(m) {
+    const orientation = m.orientation ? ` • ${escapeHtml(m.orientation)}` : "";
+    const postLink = m.url
+        ? `<a href="${escapeHtml(m.url)}" target="_blank">post n° ${escapeHtml(m.telegram_message_id)}</a>`
+        : "";
+    const timeStr = new Date(m.event_timestamp || m.created_at).toLocaleString();
+    return `
+                    <div class="evt-meta">
+                        <span class="evt-source">${escapeHtml(m.source)}${orientation}</span>
+                        <span class="evt-time">${timeStr}</span>
+                        <span class="evt-link">${postLink}</span>
+                    </div>`;
+}
+
+function eventRowHtml(zoneIdx, mIdx, top = null) {
+    const row = panelRows[zoneIdx][mIdx];
+    const m = row[0];
+    const title = m.title || "(Sans titre)";
+    const reports = row.length > 1 ? ` <span class="evt-reports">×${row.length}</span>` : "";
+    const position = top === null ? "" : ` style="top:${top}px;"`;
+    let details = "";
+    // Le texte complet n'est construit que pour les messages dépliés
+    if (expandedMessages.has(`${zoneIdx}:${mIdx}`)) {
+        const fullText = m.translated_text || m.preview || "";
+        details = `
+                <div class="evt-text" style="display:block;">${escapeHtml(fullText)}${row.map(eventMetaHtml).join("")}
+                </div>`;
+    }
+    return `
+            <li class="event" data-zone="${zoneIdx}" data-msg="${mIdx}"${position}>
+                <div class="evt-title">${escapeHtml(title)}${reports}</div>${details}
+            </li>`;
+}
+
+// Liste fenêtrée : un espaceur donne la hauteur totale, seules les lignes visibles sont dans le DOM.
+// Les hauteurs réelles (titres sur plusieurs lignes, messages dépliés) sont mesurées puis mémorisées.
+class VirtualList {
+    constructor(listEl, zoneIdx) {
+        this.listEl = listEl;
+        this.zoneIdx = zoneIdx;
+        this.count = panelRows[zoneIdx].length;
+        this.heights = new Float64Array(this.count).fill(ESTIMATED_ROW_HEIGHT);
+        this.frame = null;
+        listEl.classList.add("virtual");
+        listEl.innerHTML = `<div class="virtual-spacer"></div><ul class="virtual-rows"></ul>`;
+        this.spacer = listEl.firstElementChild;
+        this.rows = listEl.lastElementChild;
+    }
+
+    offsets() {
+        const offsets = new Float64Array(this.count + 1);
+        for (let i = 0; i < this.count; i++) {
+            offsets[i + 1] = offsets[i] + this.heights[i];
+        }
+        return offsets;
+    }
+
+    render() {
+        const offsets = this.offsets();
+        const top = this.listEl.scrollTop;
+        const bottom = top + this.listEl.clientHeight;
+        // Recherche dichotomique de la première ligne visible
+        let lo = 0;
+        let hi = this.count;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (offsets[mid + 1] <= top) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        const start = Math.max(0, lo - OVERSCAN_ROWS);
+        let end = lo;
+        while (end < this.count && offsets[end] < bottom) {
+            end++;
+        }
+        end = Math.min(this.count, end + OVERSCAN_ROWS);
+
+        this.spacer.style.height = `${offsets[this.count]}px`;
+        let html = "";
+        for (let i = start; i < end; i++) {
+            html += eventRowHtml(this.zoneIdx, i, offsets[i]);
+        }
+        this.rows.innerHTML = html;
+        this.measure();
+    }
+
+    measure() {
+        let changed = false;
+        this.rows.querySelectorAll(".event").forEach((row) => {
+            const idx = Number(row.dataset.msg);
+            const height = row.offsetHeight;
+            if (height && height !== this.heights[idx]) {
+                this.heights[idx] = height;
+                changed = true;
+            }
+        });
+        if (changed) {
+            this.schedule();
+        }
+    }
+
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
+}
+
+function expandZone(zoneIdx, listEl) {
+    const rows = panelRows[zoneIdx];
+    if (rows.length > VIRTUAL_THRESHOLD) {
+        const list = new VirtualList(listEl, zoneIdx);
+        virtualLists.set(zoneIdx, list);
+        listEl.style.display = "";
+        list.render();
+        return;
+    }
+    listEl.innerHTML = `<ul class="event-rows">${rows.map((_, mIdx) => eventRowHtml(zoneIdx, mIdx)).join("")}</ul>`;
+    listEl.style.display = "";
+}
+
+function collapseZone(zoneIdx, listEl) {
+    listEl.style.display = "none";
+    // La liste sera reconstruite au prochain dépliage : le DOM replié reste vide
+    listEl.innerHTML = "";
+    listEl.classList.remove("virtual");
+    virtualLists.delete(zoneIdx);
+}
+
+function toggleMessage(row) {
+    const zoneIdx = Number(row.dataset.zone);
+    const mIdx = Number(row.dataset.msg);
+    const key = `${zoneIdx}:${mIdx}`;
+    if (expandedMessages.has(key)) {
+        expandedMessages.delete(key);
+    } else {
+        expandedMessages.add(key);
+    }
+    const list = virtualLists.get(zoneIdx);
+    if (list) {
+        list.render();
+        return;
+    }
+    row.outerHTML = eventRowHtml(zoneIdx, mIdx);
+}
+
+// Un seul gestionnaire de clic pour tout le panneau (en-têtes de zone et titres)
+function onEventsClick(e) {
+    if (e.target.closest("a")) {
+        return;
+    }
+    const title = e.target.closest(".evt-title");
+    if (title) {
+        toggleMessage(title.closest(".event"));
+        return;
+    }
+    const header = e.target.closest(".zone-header");
+    if (!header) {
+        return;
+    }
+    const zoneIdx = Number(header.dataset.idx);
+    const listEl = document.getElementById(`zone-list-${zoneIdx}`);
+    const btn = header.querySelector(".toggle-btn");
+    if (listEl.style.display === "none") {
+        expandZone(zoneIdx, listEl);
+        btn.textContent = "▼";
+    } else {
+        collapseZone(zoneIdx, listEl);
+        btn.textContent = "▶";
+    }
+}
+
+// scroll ne remonte pas : capture au niveau du conteneur pour toutes les listes virtualisées
+function onEventsScroll(e) {
+    const list = e.target.classList && e.target.classList.contains("virtual")
+        ? virtualLists.get(Number(e.target.dataset.idx))
+        : null;
+    if (list) {
+        list.schedule();
+    }
+}
+
+const eventsRoot = document.getElementById("events");
+if (eventsRoot) {
+    eventsRoot.addEventListener("click", onEventsClick);
+    eventsRoot.addEventListener("scroll", onEventsScroll, true);
+}
 
 export function renderEvents(data) {
     const eventsContainer = document.getElementById("events");
+    panelZones = [];
+    panelRows = [];
+    virtualLists = new Map();
+    expandedMessages = new Set();
     if (!data || !data.zones || data.zones.length === 0) {
         eventsContainer.textContent = "Aucun événement.";
         return;
     }
-    const html = data.zones
-        .map((zone, idx) => {
-            const header =
-                [zone.region, zone.location].filter(Boolean).join(" – ") ||
-                "Zone inconnue";
-            const msgs = zone.messages
-                .map((m, mIdx) => {
-                    const title = m.title || "(Sans titre)";
-                    const fullText = m.translated_text || m.preview || "";
-                    const orientation = m.orientation ? ` • ${m.orientation}` : "";
-                    const postLink = m.url ? `<a href="${m.url}" target="_blank">post n° ${m.telegram_message_id}</a>` : "";
-                    const timeStr = new Date(m.event_timestamp || m.created_at).toLocaleString();
-                    return `
-            <li class="event">
-                <div class="evt-title" data-zone="${idx}" data-msg="${mIdx}" style="cursor:pointer;">${title}</div>
-                <div class="evt-text" style="display:none;">
-                    ${fullText}
-                    <div class="evt-meta">
-                        <span class="evt-source">${m.source}${orientation}</span>
-                        <span class="evt-time">${timeStr}</span>
-                        <span class="evt-link">${postLink}</span>
-                    </div>
-                </div>
-            </li>
-        `;
-                })
-                .join("");
-            return `
+    panelZones = data.zones;
+    panelRows = panelZones.map((zone) => groupByIncident(zone.messages));
+    // Seuls les en-têtes sont rendus : les listes sont construites au dépliage
+    eventsContainer.innerHTML = panelZones
+        .map((zone, idx) => `
             <section class="zone-block">
                 <h4 class="zone-header" data-idx="${idx}">
-                    <span class="toggle-btn">▶</span> ${header}
+                    <span class="toggle-btn">▶</span> ${escapeHtml(zoneLabel(zone))}
                     <span class="evt-count">(${zone.messages_count})</span>
                 </h4>
-                <ul class="event-list" id="zone-list-${idx}" style="display:none;">
-                    ${msgs}
-                </ul>
+                <div class="event-list" id="zone-list-${idx}" data-idx="${idx}" style="display:none;"></div>
             </section>
-        `;
-        })
+        `)
         .join("");
-    eventsContainer.innerHTML = html;
-    data.zones.forEach((zone, idx) => {
-        const headerEl = document.querySelector(
-            `.zone-header[data-idx='${idx}']`
-        );
-        const listEl = document.getElementById(`zone-list-${idx}`);
-        const btn = headerEl.querySelector(".toggle-btn");
-
-        headerEl.addEventListener("click", () => {
-            if (listEl.style.display === "none") {
-                listEl.style.display = "";
-                btn.textContent = "▼";
-                listEl.querySelectorAll('.evt-title').forEach(titleEl => {
-                    if (!titleEl.dataset.listener) {
-                        titleEl.addEventListener('click', function(e) {
-                            e.stopPropagation();
-                            const text = this.nextElementSibling;
-                            if (text.style.display === "none" || !text.style.display) {
-                                text.style.display = "block";
-                            } else {
-                                text.style.display = "none";
-                            }
-                        });
-                        titleEl.dataset.listener = "1";
-                    }
-                });
-            } else {
-                listEl.style.display = "none";
-                btn.textContent = "▶";
-            }
-        });
-    });
 }
 
 
 export async function openSidePanel(normCountry) {
     store.currentCountry = normCountry;
     document.getElementById("panel-country-text").textContent = normCountry;
+    renderCountrySparkline(normCountry);
     const selectPanel = document.getElementById("timeline-panel");
     if (selectPanel && store.currentGlobalDate) {
         selectPanel.value = store.currentGlobalDate;
@@ -114,17 +300,42 @@ document.getElementById("sidepanel-backdrop").addEventListener("click", () => {
     }
 });
 
+function eventsUrl(country, date) {
+    const base = `/api/countries/${encodeURIComponent(country)}`;
+    if (date === "LATEST") {
+        return `${base}/latest-events`;
+    }
+    if (date === "ALL") {
+        return `${base}/all-events`;
+    }
+    return `${base}/events?date=${date}`;
+}
+
+// Clé de cache (pays, date) des réponses du panneau
+function eventsCacheKey(country, date) {
+    return `${country}|${date}`;
+}
+
+// Appelé quand le flux SSE signale de nouveaux messages pour ce pays et ce jour
+export function invalidateCountryEvents(country, day) {
+    [day, "ALL", "LATEST"].forEach((d) => responseCache.delete(eventsCacheKey(country, d)));
+}
+
 export async function loadLatestEvents(country) {
     const eventsContainer = document.getElementById("events");
     eventsContainer.innerHTML = "Chargement...";
-    const resp = await fetch(
-        `/api/countries/${encodeURIComponent(country)}/latest-events`
-    );
-    if (!resp.ok) {
+    const result = await fetchJsonCached(eventsUrl(country, "LATEST"), {
+        key: eventsCacheKey(country, "LATEST"),
+        channel: "panel",
+    });
+    if (result.aborted) {
+        return;
+    }
+    if (!result.ok) {
         eventsContainer.textContent = "Aucun événement pour ce pays.";
         return;
     }
-    const data = await resp.json();
+    const data = result.data;
     store.currentPanelDate = data.date;
     const select = document.getElementById("timeline-panel");
     if (select && store.currentPanelDate) {
@@ -145,23 +356,51 @@ export async function loadLatestEvents(country) {
 
 export async function loadEvents(country) {
     const eventsContainer = document.getElementById("events");
-    if (!store.currentPanelDate) {
+    const date = store.currentPanelDate;
+    if (!date) {
         eventsContainer.textContent = "Aucune date sélectionnée.";
         return;
     }
-    eventsContainer.innerHTML = "Chargement...";
-    let url, resp, data;
-    if (store.currentPanelDate === "ALL") {
-        url = `/api/countries/${encodeURIComponent(country)}/all-events`;
-        resp = await fetch(url);
-    } else {
-        url = `/api/countries/${encodeURIComponent(country)}/events?date=${store.currentPanelDate}`;
-        resp = await fetch(url);
+    const key = eventsCacheKey(country, date);
+    if (!isCached(key)) {
+        eventsContainer.innerHTML = "Chargement...";
+    }
+    const isCurrent = () => store.currentCountry === country && store.currentPanelDate === date;
+    const result = await fetchJsonCached(eventsUrl(country, date), {
+        key,
+        channel: "panel",
+        onUpdate: (data) => {
+            if (isCurrent()) {
+                renderEvents(data);
+            }
+        },
+    });
+    // Requête remplacée par une plus récente (autre pays / autre date)
+    if (result.aborted || !isCurrent()) {
+        return;
     }
-    if (!resp.ok) {
+    if (!result.ok) {
         eventsContainer.textContent = "Erreur de chargement.";
         return;
     }
-    data = await resp.json();
-    renderEvents(data);
+    renderEvents(result.data);
+}
+
+// Préchargement des pays les plus actifs pendant les temps morts du navigateur
+export function prefetchCountryEvents(countries, date = store.currentGlobalDate) {
+    if (!date) {
+        return;
+    }
+    const idle = window.requestIdleCallback || ((cb) => setTimeout(cb, 200));
+    const queue = countries.filter((c) => !isCached(eventsCacheKey(c, date)));
+    const next = () => {
+        const country = queue.shift();
+        if (!country || date !== store.currentGlobalDate) {
+            return;
+        }
+        fetchJsonCached(eventsUrl(country, date), { key: eventsCacheKey(country, date) })
+            .catch(() => null)
+            .then(() => idle(next));
+    };
+    idle(next);
 }
@@ -2,16 +2,18 @@
 // Point d'entrée principal, initialisation globale
 
 import { initMap } from './map.js';
-import { loadCountryData } from './countries.js';
 import { loadTimeline } from './timeline.js';
 import { loadActiveCountries } from './countries.js';
 import { store } from './store.js';
+import { initStream } from './stream.js';
+import { loadActivityMatrix } from './activity.js';
 
 export async function init() {
     initMap();
-    await loadCountryData();
     await loadTimeline();
     await loadActiveCountries(store.currentGlobalDate);
+    loadActivityMatrix();
+    initStream();
 }
 
 window.addEventListener("load", init);
@@ -4,6 +4,9 @@
 export let map;
 export let markersByCountry = {};
 export let flagMarkersByCountry = {};
+export let hitMarkersByCountry = {};
+export let clusterMarkers = [];
+export let zoneMarkers = [];
 
 const IS_MOBILE = window.matchMedia("(max-width: 768px)").matches;
 
@@ -27,8 +30,14 @@ export function initMap() {
 export function clearMarkers() {
     Object.values(markersByCountry).forEach((m) => map.removeLayer(m));
     Object.values(flagMarkersByCountry).forEach((fm) => map.removeLayer(fm));
+    Object.values(hitMarkersByCountry).forEach((hm) => map.removeLayer(hm));
+    clusterMarkers.forEach((cm) => map.removeLayer(cm));
+    zoneMarkers.forEach((zm) => map.removeLayer(zm));
     markersByCountry = {};
     flagMarkersByCountry = {};
+    hitMarkersByCountry = {};
+    clusterMarkers = [];
+    zoneMarkers = [];
 }
 
 export function markerStyle(count) {
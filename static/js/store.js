@@ -1,8 +1,117 @@
 // store.js
-// Stockage centralisé des variables d'état globales
+// Stockage centralisé des variables d'état globales et cache des réponses API
 
 export const store = {
   currentCountry: null,
   currentGlobalDate: null,
   currentPanelDate: null,
+  // Matrice pays × jour de /api/activity/matrix
+  activity: null,
 };
+
+// Cache LRU borné : l'ordre d'insertion de la Map sert d'ordre d'usage
+class ResponseCache {
+  constructor(maxEntries) {
+    this.maxEntries = maxEntries;
+    this.entries = new Map();
+  }
+
+  get(key) {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      return null;
+    }
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return entry;
+  }
+
+  set(key, entry) {
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    while (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value);
+    }
+  }
+
+  delete(key) {
+    this.entries.delete(key);
+  }
+}
+
+export const responseCache = new ResponseCache(60);
+
+// Une requête par canal ("panel", ...) : une nouvelle requête annule la précédente
+const inflightByChannel = new Map();
+
+async function request(url, key, cached, channel) {
+  let controller = null;
+  if (channel) {
+    const previous = inflightByChannel.get(channel);
+    if (previous) {
+      previous.abort();
+    }
+    controller = new AbortController();
+    inflightByChannel.set(channel, controller);
+  }
+  const headers = {};
+  if (cached && cached.etag) {
+    headers["If-None-Match"] = cached.etag;
+  }
+  try {
+    const resp = await fetch(url, {
+      headers,
+      cache: "no-store",
+      signal: controller ? controller.signal : undefined,
+    });
+    if (resp.status === 304 && cached) {
+      cached.time = Date.now();
+      return { ok: true, data: cached.data, changed: false };
+    }
+    if (!resp.ok) {
+      return { ok: false, status: resp.status };
+    }
+    const data = await resp.json();
+    responseCache.set(key, { data, etag: resp.headers.get("ETag"), time: Date.now() });
+    return { ok: true, data, changed: true };
+  } catch (err) {
+    if (err.name === "AbortError") {
+      return { ok: false, aborted: true };
+    }
+    throw err;
+  } finally {
+    if (channel && inflightByChannel.get(channel) === controller) {
+      inflightByChannel.delete(channel);
+    }
+  }
+}
+
+// Renvoie la réponse en cache immédiatement si présente ; au-delà de maxAge elle est
+// revalidée en arrière-plan (If-None-Match) et onUpdate reçoit la nouvelle version.
+// La revalidation a son propre canal : elle n'annule pas la requête de premier plan du
+// canal et n'est pas annulée par elle, seulement par la revalidation suivante.
+export async function fetchJsonCached(url, { key = url, channel = null, maxAge = 30000, onUpdate = null } = {}) {
+  const cached = responseCache.get(key);
+  if (!cached) {
+    return request(url, key, null, channel);
+  }
+  if (Date.now() - cached.time > maxAge) {
+    const revalidateChannel = channel ? `${channel}:revalidate` : null;
+    request(url, key, cached, revalidateChannel)
+      .then((result) => {
+        if (result.ok && result.changed && onUpdate) {
+          onUpdate(result.data);
+        }
+      })
+      .catch((err) => {
+        if (err.name !== "AbortError") {
+          console.error("Erreur de revalidation", url, err);
+        }
+      });
+  }
+  return { ok: true, data: cached.data, changed: false };
+}
+
+export function isCached(key) {
+  return responseCache.entries.has(key);
+}
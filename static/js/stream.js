@@ -0,0 +1,53 @@
+// stream.js
+// Flux SSE : applique les deltas poussés par le serveur au lieu de tout recharger
+
+import { applyCountryDeltas, loadActiveCountries } from './countries.js';
+import { loadEvents, invalidateCountryEvents } from './events.js';
+import { addTimelineDates } from './timeline.js';
+import { applyActivityDeltas } from './activity.js';
+import { store } from './store.js';
+
+let source = null;
+
+export function initStream() {
+    if (!window.EventSource || source) {
+        return;
+    }
+    source = new EventSource("/api/stream");
+    source.addEventListener("delta", (e) => applyDelta(JSON.parse(e.data)));
+    // Le serveur a perdu le fil (client trop lent) : rechargement complet
+    source.addEventListener("reset", () => {
+        loadActiveCountries(store.currentGlobalDate);
+        if (store.currentCountry && isPanelOpen()) {
+            loadEvents(store.currentCountry);
+        }
+    });
+}
+
+function isPanelOpen() {
+    const panel = document.getElementById("sidepanel");
+    return panel && panel.classList.contains("visible");
+}
+
+function applyDelta(delta) {
+    const selected = store.currentGlobalDate;
+    (delta.counts || []).forEach(([country, day]) => invalidateCountryEvents(country, day));
+    const increments = {};
+    (delta.counts || []).forEach(([country, day, n]) => {
+        if (selected && selected !== "ALL" && selected !== day) {
+            return;
+        }
+        increments[country] = (increments[country] || 0) + n;
+    });
+    applyCountryDeltas(increments);
+    applyActivityDeltas(delta.counts || []);
+    addTimelineDates(delta.dates || []);
+    // Le panneau ouvert n'est rechargé que si le pays affiché a reçu des messages
+    const panelDate = store.currentPanelDate;
+    const touchesPanel = (delta.counts || []).some(([country, day]) =>
+        country === store.currentCountry && (panelDate === "ALL" || panelDate === day)
+    );
+    if (touchesPanel && isPanelOpen()) {
+        loadEvents(store.currentCountry);
+    }
+}
@@ -8,26 +8,40 @@ import { store } from './store.js';
 
 export let timelineDates = [];
 
+function fillSelect(select, value) {
+    select.innerHTML = "";
+    const allOpt = document.createElement("option");
+    allOpt.value = "ALL";
+    allOpt.textContent = "Toutes les dates";
+    select.appendChild(allOpt);
+    timelineDates.forEach((dateStr) => {
+        const opt = document.createElement("option");
+        opt.value = dateStr;
+        opt.textContent = dateStr;
+        select.appendChild(opt);
+    });
+    select.value = value || "ALL";
+}
+
+// Ajoute les nouvelles dates poussées par le flux SSE sans recharger /api/dates
+export function addTimelineDates(dates) {
+    const added = dates.filter((d) => !timelineDates.includes(d));
+    if (added.length === 0) {
+        return;
+    }
+    timelineDates = [...timelineDates, ...added].sort().reverse().slice(0, 10);
+    const selectGlobal = document.getElementById("timeline-global");
+    const selectPanel = document.getElementById("timeline-panel");
+    if (selectGlobal) fillSelect(selectGlobal, store.currentGlobalDate);
+    if (selectPanel) fillSelect(selectPanel, store.currentPanelDate);
+}
+
 export async function loadTimeline() {
     const resp = await fetch("/api/dates");
     const data = await resp.json();
     timelineDates = data.dates || [];
     const selectGlobal = document.getElementById("timeline-global");
     const selectPanel = document.getElementById("timeline-panel");
-    function fillSelect(select, value) {
-        select.innerHTML = "";
-        const allOpt = document.createElement("option");
-        allOpt.value = "ALL";
-        allOpt.textContent = "Toutes les dates";
-        select.appendChild(allOpt);
-        timelineDates.forEach((dateStr) => {
-            const opt = document.createElement("option");
-            opt.value = dateStr;
-            opt.textContent = dateStr;
-            select.appendChild(opt);
-        });
-        select.value = value || "ALL";
-    }
     store.currentGlobalDate = "ALL";
     store.currentPanelDate = "ALL";
     if (selectGlobal) fillSelect(selectGlobal, store.currentGlobalDate);
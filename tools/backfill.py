@@ -0,0 +1,225 @@
+# tools/backfill.py
+"""
+Reprise de l'historique des canaux (ex. canaux tout juste ajoutés à SOURCES_TELEGRAM) :
+lit N jours de messages par pagination iter_messages (offset_id / offset_date), du plus
+récent au plus ancien, et les fait passer par les étapes habituelles du pipeline
+(préfiltre, traduction, enrichissement, stockage) par lots bornés.
+
+- Plusieurs canaux sont lus en parallèle (--concurrency), avec une pause entre deux pages
+  d'historique (--wait-time) ; une FloodWaitError suspend le canal le temps demandé.
+- Les lots sont traités un par un (une seule écriture à la fois en base) ; un canal attend
+  que son lot soit traité avant de lire la suite : la mémoire reste bornée par
+  concurrency × batch-size messages.
+- Les messages sont stockés avec created_at = date du message : le dashboard (jours, cartes,
+  comptes quotidiens) les range à leur jour, pas au jour de la reprise.
+- Après chaque lot, le point de reprise du canal (table backfillcheckpoint) est mis à jour :
+  relancer la même commande reprend où elle s'était arrêtée.
+
+    python tools/backfill.py --channels chan1,chan2 --days 7 [--concurrency 3] [--batch-size 200]
+    python tools/backfill.py --status
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+load_dotenv()
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.config import get_settings
+from app.database import init_db
+from app.services.backfill import complete_checkpoint, list_checkpoints, open_checkpoint, save_progress
+from app.services.fetch import _parse_sources_env, build_telegram_client, to_record
+from app.services.scheduler import TokenBudget, write_schedule_report
+from app.services.staging import new_run_id
+from tools.run_pipeline import process_messages
+
+# Au-delà, delete_old_messages supprime les messages au run suivant
+RETENTION_DAYS = 7
+
+
+class Backfill:
+    def __init__(self, client, args, sources_map: dict):
+        self.client = client
+        self.args = args
+        self.sources_map = sources_map
+        self.since = datetime.now(timezone.utc) - timedelta(days=args.days)
+        self.fetch_slots = asyncio.Semaphore(args.concurrency)
+        self.process_lock = asyncio.Lock()
+        self.budget = TokenBudget(limit=get_settings().llm_token_budget)
+        self.budget_exhausted = False
+        self.totals: dict = {}
+
+    async def _process(self, chan: str, batch: list) -> None:
+        """Traite un lot puis avance le point de reprise du canal."""
+        oldest = batch[-1]
+        async with self.process_lock:
+            if self.budget_exhausted:
+                # Lot lu pendant que le budget s'épuisait : il sera relu à la reprise
+                return
+            deferred = len(self.budget.deferred)
+            await asyncio.to_thread(
+                process_messages,
+                batch,
+                use_llm=not self.args.no_llm,
+                use_batch=self.args.batch,
+                channels=[chan],
+                budget=self.budget,
+            )
+            # Les messages reportés restent en staging (repris par le prochain run) :
+            # inutile de lire davantage d'historique tant que le budget est épuisé
+            if len(self.budget.deferred) > deferred:
+                self.budget_exhausted = True
+        save_progress(chan, oldest.telegram_message_id, oldest.date, len(batch))
+        self.totals[chan] = self.totals.get(chan, 0) + len(batch)
+        print(f"[backfill] {chan} : {self.totals[chan]} messages traités (jusqu'au {oldest.date:%Y-%m-%d %H:%M})")
+
+    async def _read_history(self, chan: str, entity, checkpoint) -> bool:
+        """
+        Lit l'historique du canal depuis son point de reprise. Renvoie True si la date
+        demandée (ou le premier message du canal) est atteinte.
+        """
+        from telethon.errors import FloodWaitError
+
+        orient = self.sources_map.get(chan)
+        offset_id = checkpoint.offset_id or 0
+        # Premier passage : depuis maintenant. Reprise : juste avant le dernier message traité
+        offset_date = None if offset_id else datetime.now(timezone.utc)
+        batch: list = []
+        while True:
+            try:
+                async for m in self.client.iter_messages(
+                    entity, offset_date=offset_date, offset_id=offset_id, wait_time=self.args.wait_time
+                ):
+                    if m.date is None:
+                        continue
+                    if m.date < self.since:
+                        break
+                    offset_id, offset_date = m.id, None
+                    record = to_record(m, entity, chan, orient)
+                    if record is not None:
+                        record.backdated = True
+                        batch.append(record)
+                    if len(batch) >= self.args.batch_size:
+                        await self._process(chan, batch)
+                        batch = []
+                        if self.budget_exhausted:
+                            return False
+            except FloodWaitError as e:
+                print(f"[backfill] {chan} : limite Telegram, pause de {e.seconds} s")
+                await asyncio.sleep(e.seconds)
+                continue
+            break
+        if batch:
+            await self._process(chan, batch)
+        return not self.budget_exhausted
+
+    async def backfill_channel(self, chan: str) -> None:
+        from telethon.errors import UsernameInvalidError, UsernameNotOccupiedError
+
+        checkpoint = open_checkpoint(chan, self.since, restart=self.args.restart)
+        if checkpoint.completed_at is not None:
+            print(f"[backfill] {chan} : historique déjà repris jusqu'au {checkpoint.since:%Y-%m-%d}")
+            return
+        async with self.fetch_slots:
+            if self.budget_exhausted:
+                return
+            try:
+                entity = await self.client.get_entity(chan)
+            except (UsernameInvalidError, UsernameNotOccupiedError) as e:
+                print(f"[backfill] Canal invalide ou introuvable : {chan} ({e})")
+                return
+            except Exception as e:
+                print(f"[backfill] Erreur get_entity({chan}) : {e}")
+                return
+            if checkpoint.offset_date is not None:
+                print(f"[backfill] {chan} : reprise avant le {checkpoint.offset_date:%Y-%m-%d %H:%M}")
+            try:
+                done = await self._read_history(chan, entity, checkpoint)
+            except Exception as e:
+                # Point de reprise conservé : relancer la commande repart du dernier lot traité
+                print(f"[backfill] Erreur sur {chan} : {e}")
+                return
+        if done:
+            complete_checkpoint(chan)
+            print(f"[backfill] {chan} : terminé ({self.totals.get(chan, 0)} messages ce run)")
+
+    async def run(self, channels: list) -> None:
+        async with self.client:
+            await asyncio.gather(*(self.backfill_channel(chan) for chan in channels))
+        if self.budget_exhausted:
+            print("[backfill] Budget de tokens épuisé : relancer la commande pour continuer.")
+        write_schedule_report(self.budget, f"{new_run_id()}-backfill")
+        print(f"[backfill] Total : {sum(self.totals.values())} messages sur {len(self.totals)} canaux")
+
+
+def _print_status() -> None:
+    rows = list_checkpoints()
+    if not rows:
+        print("[backfill] Aucun historique repris.")
+    for row in rows:
+        state = f"terminé le {row.completed_at:%Y-%m-%d %H:%M}" if row.completed_at else "en cours"
+        reached = f"{row.offset_date:%Y-%m-%d %H:%M}" if row.offset_date else "-"
+        print(f"[backfill] {row.channel:<30} depuis {row.since:%Y-%m-%d}  atteint {reached}  "
+              f"{row.messages:6d} msg  {state}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reprise de l'historique des canaux Telegram")
+    parser.add_argument("--channels", help="canaux séparés par des virgules (défaut : tout SOURCES_TELEGRAM)")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="profondeur d'historique en jours")
+    parser.add_argument("--concurrency", type=int, default=3, help="canaux lus en parallèle")
+    parser.add_argument("--batch-size", type=int, default=200, help="messages par lot envoyé au pipeline")
+    parser.add_argument("--wait-time", type=float, default=1.0,
+                        help="pause (s) entre deux pages d'historique d'un canal")
+    parser.add_argument("--restart", action="store_true", help="ignore les points de reprise existants")
+    parser.add_argument("--status", action="store_true", help="affiche l'avancement et quitte")
+    parser.add_argument("--fake-telegram", action="store_true",
+                        help="utilise le client Telegram factice (tests locaux)")
+    parser.add_argument("--no-llm", action="store_true",
+                        help="saute traduction et enrichissement (tests locaux)")
+    parser.add_argument("--batch", action="store_true", default=None,
+                        help="passe traduction et enrichissement par la Batch API")
+    args = parser.parse_args()
+
+    init_db()
+    if args.status:
+        _print_status()
+        return 0
+
+    sources_map = _parse_sources_env()
+    if args.channels:
+        channels = [c.strip() for c in args.channels.split(",") if c.strip()]
+        missing = [c for c in channels if c not in sources_map]
+        if missing:
+            print(f"[backfill] Hors SOURCES_TELEGRAM (orientation inconnue) : {', '.join(missing)}")
+    else:
+        channels = list(sources_map)
+    if not channels:
+        print("[backfill] Aucun canal à reprendre.")
+        return 1
+    if args.days > RETENTION_DAYS:
+        print(f"[backfill] Attention : les messages de plus de {RETENTION_DAYS} jours seront supprimés au prochain run.")
+
+    if args.fake_telegram:
+        from tools.fake_telegram import FakeTelegramClient
+        client = FakeTelegramClient(latency=0.05)
+    else:
+        client = build_telegram_client()
+    print(f"[backfill] {len(channels)} canaux, {args.days} jours, {args.concurrency} en parallèle")
+    try:
+        asyncio.run(Backfill(client, args, sources_map).run(channels))
+    except KeyboardInterrupt:
+        print("[backfill] Interrompu : relancer la même commande pour reprendre.")
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# tools/bench_message_memory.py
+"""
+Mesure l'empreinte mémoire d'un lot de messages en transit dans le pipeline :
+dicts (ancienne représentation) contre MessageRecord (__slots__).
+
+    python tools/bench_message_memory.py --count 100000
+"""
+
+import argparse
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.services.records import MessageRecord
+
+
+def _fields(i: int, start: datetime) -> dict:
+    # Messages après enrichissement : tous les champs produits sont remplis
+    return {
+        "source": "telegram",
+        "channel": f"canal{i % 50}",
+        "text": f"message {i}",
+        "date": start + timedelta(seconds=i),
+        "telegram_message_id": 1_000_000 + i,
+        "orientation": "neutre",
+        "translated_text": f"traduction {i}",
+        "country": "Ukraine",
+        "region": "Donetsk",
+        "location": "Bakhmout",
+        "title": f"titre {i}",
+        "incident_id": i // 10,
+    }
+
+
+def _measure(build, count: int) -> int:
+    """Octets alloués par le conteneur des messages (textes et dates exclus)."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # Les valeurs sont créées avant la mesure : seule la structure du message est comptée
+    values = [_fields(i, start) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    messages = [build(v) for v in values]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del messages
+    return size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Empreinte mémoire des messages du pipeline")
+    parser.add_argument("--count", type=int, default=100_000, help="nombre de messages")
+    args = parser.parse_args()
+
+    results = {
+        "dict": _measure(dict, args.count),
+        "MessageRecord": _measure(lambda v: MessageRecord(**v), args.count),
+    }
+    for name, size in results.items():
+        print(
+            f"[bench] {name:<14} {size / 1024 / 1024:8.1f} Mo "
+            f"({size / args.count:6.0f} octets/message, {args.count} messages)"
+        )
+    ratio = results["dict"] / results["MessageRecord"]
+    print(f"[bench] MessageRecord : {ratio:.1f}x moins de mémoire que les dicts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
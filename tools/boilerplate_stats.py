@@ -0,0 +1,65 @@
+# tools/boilerplate_stats.py
+"""
+Lignes répétées apprises par canal (app/services/boilerplate.py) et tokens LLM économisés
+depuis leur apprentissage.
+
+    python tools/boilerplate_stats.py [--channel nom] [--all]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+load_dotenv()
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from sqlmodel import select
+
+from app.database import init_db, get_session
+from app.models.channel_boilerplate import ChannelBoilerplate
+from app.services.boilerplate import tokens_saved
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Statistiques des lignes répétées retirées avant le LLM")
+    parser.add_argument("--channel", help="un seul canal")
+    parser.add_argument("--all", action="store_true", help="inclut les lignes désactivées")
+    args = parser.parse_args()
+
+    init_db()
+    with get_session() as session:
+        stmt = select(ChannelBoilerplate).order_by(ChannelBoilerplate.channel, ChannelBoilerplate.position)
+        if args.channel:
+            stmt = stmt.where(ChannelBoilerplate.channel == args.channel)
+        if not args.all:
+            stmt = stmt.where(ChannelBoilerplate.active.is_(True))
+        rows = session.exec(stmt).all()
+
+    if not rows:
+        print("[boilerplate] Aucune ligne apprise.")
+        return 0
+
+    by_channel: dict = {}
+    for row in rows:
+        by_channel.setdefault(row.channel, []).append(row)
+    total = 0
+    for channel, patterns in sorted(by_channel.items(), key=lambda kv: -sum(r.chars_saved for r in kv[1])):
+        chars = sum(r.chars_saved for r in patterns)
+        total += tokens_saved(chars)
+        print(f"[boilerplate] {channel} : ~{tokens_saved(chars)} tokens économisés ({chars} caractères)")
+        for row in patterns:
+            state = "" if row.active else " (désactivée)"
+            print(
+                f"[boilerplate]   {row.position:<6} {row.support:5.0%}  {row.messages_stripped:6d} msg  "
+                f"{row.line[:70]}{state}"
+            )
+    print(f"[boilerplate] Total : ~{total} tokens économisés")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
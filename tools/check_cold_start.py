@@ -0,0 +1,100 @@
+# tools/check_cold_start.py
+"""
+Vérifie le démarrage à froid de l'API (utilisable en CI, code de sortie non nul si échec) :
+- temps d'import de app.main sous un budget,
+- aucun effet de bord à l'import (pas de base ni de dossier data/ créés),
+- openai / telethon jamais chargés par le processus API, même après quelques requêtes.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+FORBIDDEN_MODULES = ("openai", "telethon")
+
+PROBE = r"""
+import json, sys, time
+from pathlib import Path
+forbidden = %(forbidden)r
+
+t0 = time.perf_counter()
+import app.main
+import_seconds = time.perf_counter() - t0
+
+report = {
+    "import_seconds": import_seconds,
+    "data_dir_after_import": Path("data").exists(),
+    "loaded_after_import": [m for m in forbidden if m in sys.modules],
+}
+
+if %(requests)r:
+    from fastapi.testclient import TestClient
+    with TestClient(app.main.app) as client:
+        statuses = {
+            url: client.get(url).status_code
+            for url in ("/api/dates", "/api/countries/active", "/dashboard")
+        }
+    report["statuses"] = statuses
+    report["loaded_after_requests"] = [m for m in forbidden if m in sys.modules]
+
+print(json.dumps(report))
+"""
+
+
+def _probe(workdir: str, with_requests: bool) -> dict:
+    env = {k: v for k, v in os.environ.items() if k != "DB_URL"}
+    env["PYTHONPATH"] = str(ROOT_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    code = PROBE % {"forbidden": FORBIDDEN_MODULES, "requests": with_requests}
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Contrôle du démarrage à froid de l'API")
+    parser.add_argument("--budget", type=float, default=1.5, help="temps d'import max (s)")
+    parser.add_argument("--runs", type=int, default=3, help="nombre de mesures (on garde la meilleure)")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        timings = [_probe(workdir, with_requests=False) for _ in range(args.runs)]
+        best = min(t["import_seconds"] for t in timings)
+        print(f"[cold-start] import app.main : {best:.3f}s (budget {args.budget:.2f}s)")
+        if best > args.budget:
+            failures.append(f"import trop lent ({best:.3f}s > {args.budget:.2f}s)")
+
+        first = timings[0]
+        if first["data_dir_after_import"]:
+            failures.append("l'import a créé le dossier data/")
+        if first["loaded_after_import"]:
+            failures.append(f"modules chargés à l'import : {first['loaded_after_import']}")
+
+        full = _probe(workdir, with_requests=True)
+        print(f"[cold-start] réponses : {full['statuses']}")
+        if any(status >= 500 for status in full["statuses"].values()):
+            failures.append(f"erreurs serveur : {full['statuses']}")
+        if full["loaded_after_requests"]:
+            failures.append(f"modules chargés par l'API : {full['loaded_after_requests']}")
+
+    for failure in failures:
+        print(f"[cold-start] ÉCHEC : {failure}")
+    if not failures:
+        print("[cold-start] OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+# tools/check_query_plans.py
+"""
+Contrôle des plans d'exécution (utilisable en CI, code de sortie non nul si échec) :
+sur une base jetable remplie de messages synthétiques, capture chaque requête SQL émise
+par les routes /api et les fonctions du pipeline, l'explique (EXPLAIN) et échoue si une
+requête lit toute une table chaude ou trie ses lignes dans un B-tree temporaire.
+
+- SQLite : base temporaire, puis les mêmes routes sur le snapshot publié (API_READ_SNAPSHOT).
+- PostgreSQL (--postgres-url ou QUERY_PLAN_PG_URL, ex. un conteneur local) : schéma
+  temporaire, supprimé en fin de contrôle. Les plans sont demandés avec enable_seqscan et
+  enable_sort désactivés : un Seq Scan ou un Sort restant signifie qu'aucun index ne convient
+  (sur une petite base, PostgreSQL choisirait de toute façon un parcours complet).
+
+    python tools/check_query_plans.py [--messages 20000] [--postgres-url postgresql://…] [-v]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Tables qui grossissent avec l'ingestion ; les autres (baux, lignes répétées, points de
+# reprise) restent petites par construction
+HOT_TABLES = {"message", "incident", "stagedmessage", "discardedmessage", "dailycount"}
+
+# Plans acceptés malgré tout : (motif de la requête, motif du problème, raison)
+ALLOWED: list = [
+    (
+        r"count\(message\.id\) AS count_1\s+FROM message\s+WHERE .*message\.country IN .*GROUP BY",
+        r"GROUP BY|tri : Sort",
+        "zones d'un pays (events) : le regroupement porte sur les seuls messages du pays "
+        "(et du jour), et la clé de zone d'affichage est une expression qu'aucun index ne trie",
+    ),
+    (
+        r"FROM message\s+WHERE .*message\.country IN .*ORDER BY message\.created_at, message\.id\s*$",
+        r"ORDER BY|tri : Sort",
+        "messages d'un pays (events) : avec plusieurs valeurs de pays dans le IN, l'index "
+        "(country, created_at) ne donne pas l'ordre chronologique global ; tri borné au pays",
+    ),
+]
+
+SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)(?: USING (COVERING )?INDEX (\w+))?")
+SQLITE_TEMP_RE = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT|RIGHT PART OF ORDER BY)")
+LIMIT_RE = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+AGGREGATE_RE = re.compile(r"\b(GROUP BY|count\(|max\(|min\(|sum\()", re.IGNORECASE)
+
+
+# ---------------------------------------------------------------------------
+# Processus fils : une base, un jeu de données, les requêtes capturées et leurs plans
+# ---------------------------------------------------------------------------
+
+def seed_database(n_messages: int) -> dict:
+    """
+    Messages sur 30 jours, répartis sur une cinquantaine de pays (noms canoniques, alias,
+    listes "A, B"), une centaine de canaux et quelques zones ; incidents, staging et
+    messages écartés en proportion. Renvoie les valeurs utiles aux sondes.
+    """
+    import random
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, text
+
+    from app.api.utils import get_country_aliases, get_country_coords, normalize_country_names
+    from app.database import get_engine
+    from app.models.discarded_message import DiscardedMessage
+    from app.models.incident import Incident
+    from app.models.message import Message
+    from app.models.staged_message import StagedMessage
+    from app.services.zones import grid_cell, normalize_zone
+
+    rng = random.Random(0)
+    coords_map = get_country_coords()
+    coords = list(coords_map)
+    countries = coords[:50]
+    aliases = [a for a, c in get_country_aliases().items() if c in countries][:30]
+    country_values = countries + aliases + [f"{a}, {b}" for a, b in zip(aliases[:10], countries[10:20])]
+    channels = [f"canal_{i}" for i in range(100)]
+    regions = [None, ""] + [f"Région {i}" for i in range(30)]
+    now = datetime.utcnow()
+    # Quelques zones géocodées autour du centroïde de chaque pays
+    aliases_map = get_country_aliases()
+    zone_offsets = [(0.0, 0.0)] + [(rng.uniform(-4, 4), rng.uniform(-4, 4)) for _ in range(8)]
+
+    messages = []
+    for i in range(n_messages):
+        created = now - timedelta(minutes=rng.randint(0, 30 * 24 * 60))
+        region = rng.choice(regions)
+        location = rng.choice([None, f"Ville {rng.randint(0, 200)}"])
+        country = rng.choice(country_values) if rng.random() < 0.9 else None
+        lat = lon = None
+        names = normalize_country_names(country, aliases_map)
+        if names and rng.random() < 0.8:
+            d_lat, d_lon = rng.choice(zone_offsets)
+            lat = round(max(min(coords_map[names[0]][0] + d_lat, 89.9), -89.9), 4)
+            lon = round(coords_map[names[0]][1] + d_lon, 4)
+        messages.append({
+            "telegram_message_id": 1_000_000 + i,
+            "source": "Canal",
+            "channel": rng.choice(channels),
+            "raw_text": f"message {i}",
+            "translated_text": f"message {i}",
+            "country": country,
+            "region": region,
+            "location": location,
+            "region_key": normalize_zone(region),
+            "location_key": normalize_zone(location),
+            "title": None,
+            "lat": lat,
+            "lon": lon,
+            "grid_cell": grid_cell(lat, lon),
+            "event_timestamp": created,
+            "orientation": "inconnu",
+            "incident_id": rng.randint(1, max(n_messages // 20, 1)) if rng.random() < 0.5 else None,
+            "created_at": created,
+        })
+    incidents = [
+        {
+            "country": rng.choice(countries),
+            "country_key": "",
+            "zone_key": "",
+            "first_seen": now - timedelta(hours=rng.randint(0, 720)),
+            "last_seen": now - timedelta(hours=rng.randint(0, 720)),
+            "message_count": 2,
+            "centroid": b"\0" * 16,
+            "created_at": now,
+        }
+        for _ in range(max(n_messages // 20, 1))
+    ]
+    staged = [
+        {
+            "channel": rng.choice(channels),
+            "telegram_message_id": 2_000_000 + i,
+            "stage": rng.choice(["fetched", "translated", "enriched"] + ["stored"] * 7),
+            "run_id": "seed",
+            "text": "",
+            "created_at": now - timedelta(hours=rng.randint(0, 200)),
+            "updated_at": now,
+        }
+        for i in range(n_messages // 2)
+    ]
+    discarded = [
+        {
+            "channel": rng.choice(channels),
+            "telegram_message_id": 3_000_000 + i,
+            "text": "",
+            "reason": "court",
+            "run_id": "seed",
+            "version": "seed",
+            "created_at": now,
+        }
+        for i in range(n_messages // 10)
+    ]
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        for table, rows in (
+            (Message.__table__, messages),
+            (Incident.__table__, incidents),
+            (StagedMessage.__table__, staged),
+            (DiscardedMessage.__table__, discarded),
+        ):
+            for start in range(0, len(rows), 5000):
+                conn.execute(insert(table), rows[start:start + 5000])
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+    latest = max(messages, key=lambda m: m["created_at"])
+    country = aliases_map[aliases[0]]
+    return {
+        # Pays désigné par plusieurs valeurs brutes (nom, alias, liste) : IN à plusieurs valeurs
+        "country": country,
+        "coords": coords_map[country],
+        "day": latest["created_at"].date().isoformat(),
+        "channel": channels[0],
+        "sample": messages[:200],
+    }
+
+
+class Capture:
+    """Requêtes exécutées pendant chaque sonde : {(texte SQL, base): (sonde, paramètres, engine)}."""
+
+    def __init__(self):
+        self.label = None
+        self.statements = {}
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.label is None or executemany:
+            return
+        keyword = statement.lstrip().split(None, 1)[0].upper()
+        if keyword not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            return
+        # Même texte SQL sur la base et sur le snapshot : deux plans à vérifier
+        self.statements.setdefault((statement, str(conn.engine.url)), (self.label, parameters, conn.engine))
+
+
+def _probe_api(capture: Capture, seed: dict, prefix: str) -> None:
+    from fastapi.testclient import TestClient
+    import app.main
+    from app.api.stream import _compute_delta, _current_max_id
+
+    country, day = seed["country"], seed["day"]
+    lat, lon = seed["coords"]
+    urls = [
+        "/api/dates",
+        "/api/countries/active",
+        f"/api/countries/active?date={day}",
+        f"/api/countries?date={day}",
+        f"/api/countries/{country}/all-events",
+        f"/api/countries/{country}/latest-events",
+        f"/api/countries/{country}/events?date={day}",
+        f"/api/countries/{country}/incidents",
+        f"/api/countries/{country}/incidents?date={day}",
+        f"/api/countries/{country}/all-incidents",
+        f"/api/countries/{country}/latest-incidents",
+        "/api/map/markers",
+        f"/api/map/markers?date={day}",
+        "/api/activity/matrix",
+        f"/api/events/bbox?west={lon - 10}&south={lat - 8}&east={lon + 10}&north={lat + 8}&zoom=6",
+        f"/api/events/bbox?west={lon - 10}&south={lat - 8}&east={lon + 10}&north={lat + 8}&zoom=6&date={day}",
+    ]
+    with TestClient(app.main.app) as client:
+        for url in urls:
+            capture.label = f"{prefix} {url}"
+            response = client.get(url)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{url} : HTTP {response.status_code}")
+    capture.label = f"{prefix} stream"
+    _compute_delta(_current_max_id() - 50)
+    capture.label = None
+
+
+def _probe_pipeline(capture: Capture, seed: dict) -> None:
+    from app.database import get_session
+    from app.services.boilerplate import _recent_texts, load_patterns
+    from app.services.records import MessageRecord
+    from app.services.relevance import discarded_keys
+    from app.services.staging import load_pending
+    from tools.run_pipeline import delete_old_messages, filter_existing_messages
+
+    records = [
+        MessageRecord(
+            source=m["source"], channel=m["channel"], text=m["raw_text"],
+            date=m["created_at"], telegram_message_id=m["telegram_message_id"],
+        )
+        for m in seed["sample"]
+    ]
+    probes = [
+        # Version explicite : prefilter_version() lirait les Settings complets du pipeline
+        ("filter_existing_messages", lambda: filter_existing_messages(records, "seed")),
+        ("discarded_keys", lambda: discarded_keys([(r.channel, r.telegram_message_id) for r in records], "seed")),
+        ("load_pending", lambda: load_pending()),
+        ("load_pending(canal)", lambda: load_pending([seed["channel"]])),
+        ("boilerplate", lambda: load_patterns([seed["channel"]])),
+        ("delete_old_messages", lambda: delete_old_messages(days=7)),
+    ]
+    for label, probe in probes:
+        capture.label = f"pipeline {label}"
+        probe()
+    capture.label = "pipeline boilerplate"
+    with get_session() as session:
+        _recent_texts(session, seed["channel"])
+    capture.label = "pipeline incidents"
+    _incident_candidates()
+    capture.label = None
+
+
+def _incident_candidates() -> None:
+    # Requête de cluster_messages sans le calcul des vecteurs
+    from datetime import datetime, timedelta
+    from sqlmodel import select
+    from app.database import get_session
+    from app.models.incident import Incident
+
+    with get_session() as session:
+        session.exec(select(Incident).where(Incident.last_seen >= datetime.utcnow() - timedelta(hours=6))).all()
+
+
+def _tables_in(statement: str) -> set:
+    return {t.lower() for t in re.findall(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+"?(\w+)"?', statement, re.IGNORECASE)}
+
+
+def _explain_sqlite(engine, statement: str, parameters) -> tuple:
+    issues = []
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        partial = set(conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'"
+        ).scalars())
+    aggregated = bool(AGGREGATE_RE.search(statement))
+    limited = bool(LIMIT_RE.search(statement))
+    sorted_in_temp = any(SQLITE_TEMP_RE.search(row[-1]) for row in rows)
+    for row in rows:
+        detail = row[-1]
+        scan = SQLITE_SCAN_RE.match(detail)
+        # Parcours d'index dans l'ordre demandé, arrêté par LIMIT : seules les premières
+        # entrées sont lues
+        early_stop = scan and scan.group(3) and limited and not sorted_in_temp
+        # Index partiel : ne contient que les lignes qui vérifient sa condition
+        if scan and scan.group(1).lower() in HOT_TABLES and not early_stop and scan.group(3) not in partial:
+            issues.append(f"parcours complet : {detail}")
+        temp = SQLITE_TEMP_RE.search(detail)
+        # Trier les groupes d'un agrégat (ORDER BY count(...)) ne trie pas les lignes
+        if temp and not (temp.group(1) == "ORDER BY" and aggregated):
+            issues.append(f"tri temporaire : {detail}")
+    return issues, [row[-1] for row in rows]
+
+
+def _pg_nodes(node, parents=()):
+    yield node, parents
+    for child in node.get("Plans", []):
+        yield from _pg_nodes(child, parents + (node,))
+
+
+def _explain_postgres(engine, statement: str, parameters) -> tuple:
+    issues = []
+    with engine.connect() as conn:
+        partial = set(conn.exec_driver_sql(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND indexdef LIKE '% WHERE %'"
+        ).scalars())
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        conn.exec_driver_sql("SET enable_sort = off")
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    lines = []
+    for node, parents in _pg_nodes(root):
+        kind = node["Node Type"]
+        relation = node.get("Relation Name", "")
+        lines.append(f"{'  ' * len(parents)}{kind} {relation} {node.get('Index Name', '')}".rstrip())
+        if relation in HOT_TABLES:
+            if kind == "Seq Scan":
+                issues.append(f"parcours complet : Seq Scan on {relation}")
+            elif (
+                kind in ("Index Scan", "Index Only Scan")
+                and "Index Cond" not in node
+                and node.get("Index Name") not in partial
+                and not any(p["Node Type"] == "Limit" for p in parents)
+            ):
+                issues.append(f"parcours complet : {kind} {node.get('Index Name')} sans condition")
+        if kind in ("Sort", "Incremental Sort"):
+            below = [n["Node Type"] for n, _ in _pg_nodes(node)]
+            if not any(t in ("Aggregate", "HashAggregate", "GroupAggregate") for t in below[1:]):
+                issues.append(f"tri : {kind} ({', '.join(node.get('Sort Key', []))})")
+    return issues, lines
+
+
+def _allowed(statement: str, issue: str) -> bool:
+    return any(
+        re.search(q, statement, re.IGNORECASE | re.DOTALL) and re.search(i, issue)
+        for q, i, _ in ALLOWED
+    )
+
+
+def _child(args) -> int:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    sys.path.insert(0, str(ROOT_DIR))
+    from app.database import get_engine, init_db
+
+    init_db()
+    backend = get_engine().dialect.name
+    seed = seed_database(args.messages)
+
+    capture = Capture()
+    event.listen(Engine, "before_cursor_execute", capture)
+    _probe_api(capture, seed, "api")
+    if backend == "sqlite":
+        from app.services.snapshot import publish_snapshot
+        capture.label = None
+        publish_snapshot()
+        os.environ["API_READ_SNAPSHOT"] = "true"
+        _probe_api(capture, seed, "snapshot")
+        os.environ["API_READ_SNAPSHOT"] = "false"
+    _probe_pipeline(capture, seed)
+    event.remove(Engine, "before_cursor_execute", capture)
+
+    explain = _explain_sqlite if backend == "sqlite" else _explain_postgres
+    results = []
+    for (statement, _), (label, parameters, engine) in capture.statements.items():
+        if not _tables_in(statement) & HOT_TABLES:
+            continue
+        issues, plan = explain(engine, statement, parameters)
+        results.append({
+            "probe": label,
+            "sql": " ".join(statement.split()),
+            "plan": plan,
+            "issues": [i for i in issues if not _allowed(statement, i)],
+        })
+    print(json.dumps({"backend": backend, "results": results}))
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Processus principal : un processus fils par base (engine et caches propres)
+# ---------------------------------------------------------------------------
+
+def _run_backend(args, workdir: str, db_url: str = None) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    # Valeurs explicites : un .env local (chargé par load_dotenv) ne doit pas viser la vraie base
+    data_dir = Path(workdir) / "data"
+    data_dir.mkdir(exist_ok=True)
+    env["DB_URL"] = db_url or f"sqlite:///{data_dir / 'osint.db'}"
+    env["SNAPSHOT_PATH"] = str(data_dir / "snapshot.db")
+    env["API_READ_SNAPSHOT"] = "false"
+    out = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child", "--messages", str(args.messages)],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        sys.stderr.write(out.stderr)
+        raise RuntimeError("échec du processus de contrôle")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _postgres_schema(url: str):
+    """Crée un schéma jetable ; renvoie (URL qui l'utilise, fonction de nettoyage)."""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    if "sslmode" not in parsed.query and parsed.host in ("localhost", "127.0.0.1", None):
+        parsed = parsed.update_query_dict({"sslmode": "disable"})
+    schema = f"query_plans_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(parsed)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    def cleanup():
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+    scoped = parsed.update_query_dict({"options": f"-csearch_path={schema}"})
+    return scoped.render_as_string(hide_password=False), cleanup
+
+
+def _report(report: dict, verbose: bool) -> int:
+    failures = 0
+    backend = report["backend"]
+    for result in report["results"]:
+        if result["issues"]:
+            failures += 1
+            print(f"[query-plans] {backend} ÉCHEC {result['probe']}")
+            print(f"[query-plans]   {result['sql'][:300]}")
+            for issue in result["issues"]:
+                print(f"[query-plans]   → {issue}")
+        elif verbose:
+            print(f"[query-plans] {backend} ok {result['probe']} : {' | '.join(result['plan'])[:200]}")
+    print(f"[query-plans] {backend} : {len(report['results'])} requêtes, {failures} en échec")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Contrôle des plans d'exécution des requêtes API et pipeline")
+    parser.add_argument("--messages", type=int, default=20000, help="messages synthétiques")
+    parser.add_argument("--postgres-url", default=os.getenv("QUERY_PLAN_PG_URL"),
+                        help="base PostgreSQL de test (un schéma temporaire y est créé)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="affiche aussi les plans corrects")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return _child(args)
+
+    sys.path.insert(0, str(ROOT_DIR))
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        failures += _report(_run_backend(args, workdir), args.verbose)
+
+        if args.postgres_url:
+            try:
+                url, cleanup = _postgres_schema(args.postgres_url)
+            except Exception as e:
+                print(f"[query-plans] PostgreSQL indisponible ({e.__class__.__name__}) : contrôle ignoré")
+            else:
+                try:
+                    failures += _report(_run_backend(args, workdir, url), args.verbose)
+                finally:
+                    cleanup()
+        else:
+            print("[query-plans] PostgreSQL : pas de --postgres-url / QUERY_PLAN_PG_URL, contrôle ignoré")
+
+    if failures:
+        print("[query-plans] ÉCHEC")
+        return 1
+    print("[query-plans] OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
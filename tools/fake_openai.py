@@ -0,0 +1,284 @@
+# tools/fake_openai.py
+"""
+Serveur local imitant la partie de l'API OpenAI utilisée par le pipeline
+(/v1/responses, /v1/files, /v1/batches), pour tester le mode batch sans réseau ni coût.
+
+    python tools/fake_openai.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_BATCH_POLL_SECONDS=1 \\
+        python tools/run_pipeline.py --fake-telegram --batch
+
+Les réponses sont déterministes : traduction = texte d'origine, pays / lieux via le gazetteer
+local, titre = premiers mots du message. Les réponses en streaming (stream=true) sont
+envoyées par morceaux ; --break-streams coupe la connexion à mi-réponse pour vérifier
+que le pipeline garde les lignes déjà reçues, --fail-on enrich simule une panne pendant
+l'enrichissement (reprise depuis la table de staging).
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from app.services.gazetteer import get_gazetteer
+
+LINE_RE = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+
+FILES: dict = {}
+BATCHES: dict = {}
+LOCK = threading.Lock()
+
+
+def prompt_kind(prompt: str) -> str:
+    if '"translation"' in prompt:
+        return "translate"
+    if '"country"' in prompt:
+        return "enrich"
+    return "title"
+
+
+def fake_completion(prompt: str) -> str:
+    """
+    Réponse JSONL plausible selon le type de prompt (traduction, enrichissement, titres).
+    """
+    lines = []
+    kind = prompt_kind(prompt)
+    for idx, text in LINE_RE.findall(prompt):
+        idx = int(idx)
+        title = " ".join(text.split()[:12])
+        if kind == "translate":
+            lines.append({"index": idx, "translation": text})
+        elif kind == "enrich":
+            local = get_gazetteer().resolve(text) or {}
+            lines.append({
+                "id": idx,
+                "country": local.get("country") or "",
+                "region": local.get("region") or "",
+                "location": local.get("location") or "",
+                "title": title,
+                "source": "",
+                "timestamp": "",
+            })
+        else:
+            lines.append({"id": idx, "title": title})
+    return "\n".join(json.dumps(line, ensure_ascii=False) for line in lines)
+
+
+def response_body(model: str, prompt: str) -> dict:
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [{
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": fake_completion(prompt), "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+def file_object(file_id: str, filename: str, purpose: str) -> dict:
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(FILES[file_id]),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+
+
+def advance_batch(batch: dict) -> None:
+    """
+    Un job progresse d'un état à chaque consultation : validating → in_progress → completed.
+    """
+    if batch["status"] == "validating":
+        batch["status"] = "in_progress"
+        return
+    if batch["status"] != "in_progress":
+        return
+    output = []
+    for line in FILES[batch["input_file_id"]].decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        body = req["body"]
+        output.append({
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": req["custom_id"],
+            "response": {
+                "status_code": 200,
+                "request_id": uuid.uuid4().hex,
+                "body": response_body(body.get("model", ""), body.get("input", "")),
+            },
+            "error": None,
+        })
+    output_id = f"file-{uuid.uuid4().hex}"
+    FILES[output_id] = "\n".join(json.dumps(o, ensure_ascii=False) for o in output).encode("utf-8")
+    batch.update(
+        status="completed",
+        output_file_id=output_id,
+        completed_at=int(time.time()),
+        request_counts={"total": len(output), "completed": len(output), "failed": 0},
+    )
+
+
+class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 pour le transfert par morceaux des réponses en streaming
+    protocol_version = "HTTP/1.1"
+    break_streams = False
+    fail_on: tuple = ()
+    chunk_chars = 40
+    chunk_delay = 0.01
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_stream(self, body: dict) -> None:
+        """
+        Événements SSE de l'API Responses : created, output_text.delta…, completed.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        text = body["output"][0]["content"][0]["text"]
+        deltas = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        if self.break_streams:
+            deltas = deltas[:len(deltas) // 2]
+        events = [{"type": "response.created", "response": {**body, "status": "in_progress", "output": []}}]
+        events += [
+            {
+                "type": "response.output_text.delta",
+                "item_id": body["output"][0]["id"],
+                "output_index": 0,
+                "content_index": 0,
+                "delta": delta,
+                "logprobs": [],
+            }
+            for delta in deltas
+        ]
+        if not self.break_streams:
+            events.append({"type": "response.completed", "response": body})
+        for seq, event in enumerate(events):
+            event["sequence_number"] = seq
+            data = json.dumps(event, ensure_ascii=False)
+            self._write_chunk(f"event: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+            time.sleep(self.chunk_delay)
+        if self.break_streams:
+            # Pas de morceau final : le client voit une réponse tronquée
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self):
+        body = self._body()
+        if self.path == "/v1/responses":
+            req = json.loads(body)
+            if prompt_kind(req.get("input", "")) in self.fail_on:
+                return self._send_json({"error": {"message": "panne simulée", "type": "server_error"}}, status=500)
+            resp = response_body(req.get("model", ""), req.get("input", ""))
+            if req.get("stream"):
+                return self._send_stream(resp)
+            return self._send_json(resp)
+        with LOCK:
+            if self.path == "/v1/files":
+                header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                form = BytesParser(policy=policy.default).parsebytes(header + body)
+                fields, filename, content = {}, "upload.jsonl", b""
+                for part in form.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    if part.get_filename():
+                        filename, content = part.get_filename(), part.get_payload(decode=True)
+                    else:
+                        fields[name] = part.get_content().strip()
+                file_id = f"file-{uuid.uuid4().hex}"
+                FILES[file_id] = content
+                return self._send_json(file_object(file_id, filename, fields.get("purpose", "batch")))
+            if self.path == "/v1/batches":
+                req = json.loads(body)
+                batch_id = f"batch_{uuid.uuid4().hex}"
+                BATCHES[batch_id] = {
+                    "id": batch_id,
+                    "object": "batch",
+                    "endpoint": req["endpoint"],
+                    "input_file_id": req["input_file_id"],
+                    "completion_window": req["completion_window"],
+                    "status": "validating",
+                    "created_at": int(time.time()),
+                    "output_file_id": None,
+                    "error_file_id": None,
+                    "request_counts": {"total": 0, "completed": 0, "failed": 0},
+                }
+                return self._send_json(BATCHES[batch_id])
+        self._send_json({"error": {"message": f"route inconnue {self.path}"}}, status=404)
+
+    def do_GET(self):
+        with LOCK:
+            match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+            if match and match.group(1) in BATCHES:
+                batch = BATCHES[match.group(1)]
+                advance_batch(batch)
+                return self._send_json(batch)
+            match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+            if match and match.group(1) in FILES:
+                data = FILES[match.group(1)]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+        self._send_json({"error": {"message": f"route inconnue {self.path}"}}, status=404)
+
+    def log_message(self, fmt, *args):
+        print(f"[fake-openai] {self.command} {self.path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Substitut local de l'API OpenAI (responses + batch)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--break-streams", action="store_true",
+                        help="coupe chaque réponse en streaming à mi-parcours")
+    parser.add_argument("--fail-on", action="append", default=[], choices=["translate", "enrich", "title"],
+                        help="renvoie une erreur 500 pour ce type de prompt (reprise après panne)")
+    args = parser.parse_args()
+    Handler.break_streams = args.break_streams
+    Handler.fail_on = tuple(args.fail_on)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"[fake-openai] Écoute sur http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# tools/fake_telegram.py
+"""
+Client Telegram factice pour tester le pipeline en local (sans session ni réseau).
+Même interface que la partie de TelegramClient utilisée par app/services/fetch.py.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+
+# Historique factice (iter_messages) : un message toutes les HISTORY_STEP minutes
+HISTORY_STEP = timedelta(minutes=30)
+HISTORY_PAGE = 100
+
+
+class FakeTelegramClient:
+    def __init__(
+        self,
+        messages_per_channel: int = 5,
+        latency: float = 0.2,
+        history_days: int = 30,
+        flood_every: int = 0,
+    ):
+        self.messages_per_channel = messages_per_channel
+        self.latency = latency
+        self.history_days = history_days
+        # Toutes les N pages d'historique, une FloodWaitError de 1 s (0 = jamais)
+        self.flood_every = flood_every
+        self._pages = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get_entity(self, chan: str):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(title=f"Canal {chan}", username=chan)
+
+    async def get_messages(self, entity, limit: int = 50):
+        await asyncio.sleep(self.latency)
+        # Ids stables sur une heure : deux passages dans la même heure renvoient les mêmes messages
+        now = datetime.now(timezone.utc)
+        base_id = int(now.timestamp()) // 3600 * 1000
+        rng = random.Random(f"{entity.username}-{base_id}")
+        count = min(limit, self.messages_per_channel)
+        return [
+            SimpleNamespace(
+                id=base_id + i,
+                date=now - timedelta(minutes=rng.randint(0, 600)),
+                # Pied de message répété comme sur les vrais canaux (voir app/services/boilerplate.py)
+                message=f"[{entity.username}] message de test n°{i} ({rng.random():.6f})"
+                f"\n\n📢 Abonnez-vous : t.me/{entity.username}",
+            )
+            for i in range(count)
+        ]
+
+    async def iter_messages(self, entity, limit=None, offset_date=None, offset_id: int = 0, wait_time=None):
+        """
+        Historique du plus récent au plus ancien, strictement avant offset_id / offset_date,
+        par pages de HISTORY_PAGE messages. Ids et dates ne dépendent que de l'heure.
+        """
+        step = int(HISTORY_STEP.total_seconds())
+        now = datetime.now(timezone.utc)
+        newest = int(now.timestamp()) // step
+        oldest = newest - self.history_days * 86400 // step
+        start = newest
+        if offset_id:
+            start = min(start, offset_id - 1)
+        if offset_date is not None:
+            start = min(start, int(offset_date.timestamp() - 1) // step)
+        rng = random.Random(entity.username)
+        count = 0
+        for msg_id in range(start, oldest - 1, -1):
+            if limit is not None and count >= limit:
+                return
+            if count % HISTORY_PAGE == 0:
+                self._pages += 1
+                if self.flood_every and self._pages % self.flood_every == 0:
+                    from telethon.errors import FloodWaitError
+                    raise FloodWaitError(request=None, capture=1)
+                await asyncio.sleep(wait_time if wait_time is not None else self.latency)
+            count += 1
+            yield SimpleNamespace(
+                id=msg_id,
+                date=datetime.fromtimestamp(msg_id * step, timezone.utc),
+                message=f"[{entity.username}] archive n°{msg_id} ({rng.random():.6f})"
+                f"\n\n📢 Abonnez-vous : t.me/{entity.username}",
+            )
@@ -0,0 +1,357 @@
+# tools/load_test.py
+"""
+Test de charge de bout en bout de l'API : démarre uvicorn (app.main:app, --workers N) sur une
+base synthétique jetable, rejoue des sessions de dashboard à débit cible depuis un client
+asynchrone et écrit un rapport JSON (débit, p50 / p95 / p99, erreurs) à comparer d'un commit
+à l'autre.
+
+- Session type : /api/dates, /api/countries/active, puis quelques ouvertures de panneau
+  (/countries/{pays}/events?date=… ou /all-events) sur les pays actifs.
+- Charge en boucle ouverte : les requêtes partent à heure fixe (--rate par seconde), que les
+  précédentes aient répondu ou non. La latence est mesurée depuis l'heure prévue : un serveur
+  saturé fait monter le p99 au lieu de ralentir le client.
+
+    python tools/load_test.py [--workers 1] [--rate 50] [--duration 30] [--snapshot]
+    python tools/load_test.py --rate 200 --baseline data/reports/load-<commit>-w1-r200.json
+    python tools/load_test.py --url http://127.0.0.1:8000   # serveur déjà lancé
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+load_dotenv()
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import httpx
+
+REPORTS_DIR = Path("data/reports")
+# Ouvertures de panneau par session : (minimum, maximum)
+PANELS_PER_SESSION = (1, 4)
+# Part des panneaux ouverts sur "toute la période" plutôt que sur un jour
+ALL_EVENTS_RATIO = 0.3
+# Les jours récents sont les plus consultés : poids 1 / (rang + 1)
+RECENT_DAYS = 10
+SERVER_START_TIMEOUT = 60
+# Au-delà (p99 du retard d'envoi), le client ne tient plus le débit demandé
+CLIENT_LAG_WARNING_MS = 50
+
+
+# ---------------------------------------------------------------------------
+# Base synthétique et serveur
+# ---------------------------------------------------------------------------
+
+def _seed(messages: int, snapshot: bool) -> int:
+    """Processus fils : crée et remplit la base (et publie le snapshot si demandé)."""
+    from app.database import init_db
+    from tools.check_query_plans import seed_database
+
+    init_db()
+    seed_database(messages)
+    if snapshot:
+        from app.services.snapshot import publish_snapshot
+        publish_snapshot()
+    return 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _server_env(workdir: str, snapshot: bool) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    # Valeurs explicites : un .env local (chargé par load_dotenv) ne doit pas viser la vraie base
+    data_dir = Path(workdir) / "data"
+    data_dir.mkdir(exist_ok=True)
+    env["DB_URL"] = f"sqlite:///{data_dir / 'osint.db'}"
+    env["SNAPSHOT_PATH"] = str(data_dir / "snapshot.db")
+    env["API_READ_SNAPSHOT"] = "true" if snapshot else "false"
+    env.pop("PROFILE_TOKEN", None)
+    return env
+
+
+def _start_server(args, workdir: str) -> tuple:
+    """Remplit la base puis lance uvicorn ; renvoie (processus, URL de base)."""
+    env = _server_env(workdir, args.snapshot)
+    print(f"[load] Base synthétique : {args.messages} messages")
+    seed_cmd = [sys.executable, str(Path(__file__).resolve()), "--child-seed", "--messages", str(args.messages)]
+    if args.snapshot:
+        seed_cmd.append("--snapshot")
+    subprocess.run(seed_cmd, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn s'est arrêté (code {server.returncode})")
+        try:
+            if httpx.get(f"{base_url}/api/dates", timeout=2).status_code == 200:
+                print(f"[load] uvicorn prêt sur {base_url} ({args.workers} worker(s))")
+                return server, base_url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn n'a pas répondu à temps")
+
+
+def _stop_server(server) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+# ---------------------------------------------------------------------------
+# Sessions de dashboard
+# ---------------------------------------------------------------------------
+
+def _catalogue(base_url: str) -> tuple:
+    """Jours et pays actifs, lus comme le dashboard au chargement de la page."""
+    dates = httpx.get(f"{base_url}/api/dates", timeout=30).json()["dates"]
+    active = httpx.get(f"{base_url}/api/countries/active", timeout=30).json()["countries"]
+    countries = [c["country"] for c in active]
+    if not dates or not countries:
+        raise RuntimeError("base vide : aucun jour ou aucun pays actif")
+    return dates[:RECENT_DAYS], countries
+
+
+def _sessions(dates: list, countries: list, seed: int):
+    """
+    Générateur infini d'URL, session après session : (gabarit de l'endpoint, URL).
+    Les pays les plus actifs sont ouverts plus souvent (poids 1 / rang).
+    """
+    rng = random.Random(seed)
+    day_weights = [1 / (i + 1) for i in range(len(dates))]
+    country_weights = [1 / (i + 1) for i in range(len(countries))]
+    while True:
+        day = rng.choices(dates, day_weights)[0]
+        yield "/api/dates", "/api/dates"
+        yield "/api/countries/active", f"/api/countries/active?date={day}"
+        for _ in range(rng.randint(*PANELS_PER_SESSION)):
+            base = f"/api/countries/{quote(rng.choices(countries, country_weights)[0])}"
+            if rng.random() < ALL_EVENTS_RATIO:
+                yield "/api/countries/{c}/all-events", f"{base}/all-events"
+            else:
+                yield "/api/countries/{c}/events", f"{base}/events?date={day}"
+
+
+# ---------------------------------------------------------------------------
+# Charge en boucle ouverte
+# ---------------------------------------------------------------------------
+
+async def _request(client, endpoint: str, url: str, scheduled: float, samples: list) -> None:
+    # Retard du client sur l'heure prévue (boucle d'événements saturée) : mesuré à part
+    lag = time.perf_counter() - scheduled
+    status = None
+    try:
+        response = await client.get(url)
+        status = response.status_code
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.TransportError as e:
+        status = e.__class__.__name__
+    samples.append((endpoint, status, time.perf_counter() - scheduled, lag))
+
+
+async def _run_load(base_url: str, urls, rate: float, duration: float, args) -> tuple:
+    """Envoie rate × duration requêtes à intervalle fixe ; renvoie (mesures, durée réelle)."""
+    samples: list = []
+    tasks = []
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout,
+                                 headers={"Accept-Encoding": "gzip"}) as client:
+        interval = 1.0 / rate
+        total = int(rate * duration)
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint, url = next(urls)
+            tasks.append(asyncio.create_task(_request(client, endpoint, url, scheduled, samples)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def _percentile(values: list, q: float) -> float:
+    """Rang le plus proche, sur une liste triée."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def _latency_summary(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        "p50": round(_percentile(values, 50) * 1000, 2),
+        "p95": round(_percentile(values, 95) * 1000, 2),
+        "p99": round(_percentile(values, 99) * 1000, 2),
+        "max": round(values[-1] * 1000, 2) if values else 0.0,
+        "mean": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def _summary(samples: list, elapsed: float) -> dict:
+    ok = [s for s in samples if isinstance(s[1], int) and s[1] < 400]
+    errors: dict = {}
+    for _, status, _, _ in samples:
+        if not (isinstance(status, int) and status < 400):
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    endpoints = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        rows = [s for s in samples if s[0] == endpoint]
+        failed = sum(1 for s in rows if not (isinstance(s[1], int) and s[1] < 400))
+        endpoints[endpoint] = {
+            "requests": len(rows),
+            "errors": failed,
+            "latency_ms": _latency_summary([s[2] for s in rows]),
+        }
+    return {
+        "requests": len(samples),
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+        "errors": errors,
+        # Toutes les réponses, erreurs comprises : un timeout compte pour sa durée
+        "latency_ms": _latency_summary([s[2] for s in samples]),
+        "endpoints": endpoints,
+        "client_lag_ms": _latency_summary([s[3] for s in samples]),
+    }
+
+
+def _git_revision() -> str:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+    return f"{revision}-modifié" if dirty else revision
+
+
+def _print_comparison(report: dict, baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    print(f"[load] Comparaison avec {baseline.get('revision')} ({baseline_path.name}) :")
+    rows = [("débit (req/s)", "throughput_rps", None), ("taux d'erreur", "error_rate", None)]
+    rows += [(f"{q} (ms)", "latency_ms", q) for q in ("p50", "p95", "p99")]
+    for label, key, sub in rows:
+        old = baseline["results"].get(key)
+        new = report["results"].get(key)
+        if sub:
+            old, new = (old or {}).get(sub), (new or {}).get(sub)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f} %" if old else "-"
+        print(f"[load]   {label:<15} {old:>10} → {new:<10} {change}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API (sessions de dashboard)")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--rate", type=float, default=50, help="requêtes par seconde visées")
+    parser.add_argument("--duration", type=float, default=30, help="durée de la mesure (s)")
+    parser.add_argument("--warmup", type=float, default=5, help="chauffe non mesurée (s)")
+    parser.add_argument("--messages", type=int, default=20000, help="messages de la base synthétique")
+    parser.add_argument("--snapshot", action="store_true", help="lectures sur le snapshot publié")
+    parser.add_argument("--connections", type=int, default=100, help="connexions HTTP max du client")
+    parser.add_argument("--timeout", type=float, default=10, help="délai max d'une requête (s)")
+    parser.add_argument("--session-seed", type=int, default=0, help="graine du tirage des sessions")
+    parser.add_argument("--url", help="serveur déjà lancé (pas de base synthétique ni d'uvicorn)")
+    parser.add_argument("--out", help="rapport JSON (défaut : data/reports/load-<commit>-w<N>-r<débit>.json)")
+    parser.add_argument("--baseline", help="rapport précédent à comparer")
+    parser.add_argument("--child-seed", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_seed:
+        return _seed(args.messages, args.snapshot)
+
+    revision = _git_revision()
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            server, base_url = _start_server(args, workdir)
+        try:
+            dates, countries = _catalogue(base_url)
+            urls = _sessions(dates, countries, args.session_seed)
+            if args.warmup > 0:
+                print(f"[load] Chauffe : {args.warmup:g} s")
+                asyncio.run(_run_load(base_url, urls, args.rate, args.warmup, args))
+            print(f"[load] Mesure : {args.rate:g} req/s pendant {args.duration:g} s")
+            samples, elapsed = asyncio.run(_run_load(base_url, urls, args.rate, args.duration, args))
+        finally:
+            if server is not None:
+                _stop_server(server)
+
+    results = _summary(samples, elapsed)
+    report = {
+        "revision": revision,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "url": args.url,
+            "workers": None if args.url else args.workers,
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "messages": None if args.url else args.messages,
+            "snapshot": args.snapshot,
+            "connections": args.connections,
+            "session_seed": args.session_seed,
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else REPORTS_DIR / f"load-{revision}-w{args.workers}-r{args.rate:g}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    latency = results["latency_ms"]
+    print(
+        f"[load] {results['requests']} requêtes, {results['throughput_rps']} req/s réussies, "
+        f"erreurs {results['error_rate'] * 100:.2f} % — p50 {latency['p50']} ms, "
+        f"p95 {latency['p95']} ms, p99 {latency['p99']} ms"
+    )
+    for endpoint, stats in results["endpoints"].items():
+        print(f"[load]   {endpoint:<32} {stats['requests']:6d} req  {stats['errors']:4d} err  "
+              f"p50 {stats['latency_ms']['p50']:8.1f}  p99 {stats['latency_ms']['p99']:8.1f} ms")
+    if results["client_lag_ms"]["p99"] > CLIENT_LAG_WARNING_MS:
+        print(f"[load] Attention : le client prend jusqu'à {results['client_lag_ms']['p99']} ms de retard "
+              "sur son planning, les latences mesurées incluent sa propre saturation (baisser --rate)")
+    if args.baseline:
+        _print_comparison(report, Path(args.baseline))
+    print(f"[load] Rapport : {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
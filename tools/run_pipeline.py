@@ -1,6 +1,11 @@
 # tools/run_pipeline.py
 
+import argparse
 import asyncio
+import os
+import queue
+import socket
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 import sys
@@ -13,70 +18,78 @@ if str(ROOT_DIR) not in sys.path:
 
 from app.database import init_db, get_session
 from app.models.message import Message
+from sqlalchemy import insert
 from sqlmodel import select
 
-from app.services.fetch import fetch_raw_messages_24h
+from app.config import get_settings
+from app.services.fetch import fetch_raw_messages_24h, build_telegram_client, _parse_sources_env, channel_priorities
+from app.services.leases import (
+    ensure_channels,
+    acquire_channels,
+    complete_channels,
+    release_leases,
+    count_unfinished,
+    LeaseHeartbeat,
+)
 from app.services.translation import translate_messages
 from app.services.enrichment import enrich_messages
 from app.services.dedupe import dedupe_messages
+from app.services.incidents import cluster_messages
+from app.services.geocoding import geocode_messages
+from app.models.incident import Incident
+from app.services.snapshot import publish_snapshot
+from app.services.staging import (
+    new_run_id, stage_messages, load_pending, advance, purge_staging, drop_staged, record_missed,
+)
+from app.services.records import MessageRecord
+from app.services.profiling import stage as profile_stage
+from app.services.scheduler import TokenBudget, schedule_llm_work, write_schedule_report
+from app.services.boilerplate import strip_messages
+from app.services.relevance import prefilter_messages, prefilter_version, discarded_keys
 
 
-def store_messages(messages: list[dict]) -> None:
+def store_messages(messages: list[MessageRecord]) -> list[MessageRecord]:
     """
-    Enregistre les messages dans SQLite.
+    Regroupe les messages en incidents et les enregistre en base par INSERT groupés
+    (executemany), sans passer par des objets ORM. Chaque lot valide ses incidents et ses
+    messages dans la même transaction : un lot en échec n'est pas compté dans les incidents
+    et sera regroupé à nouveau au run suivant. Renvoie les messages effectivement insérés.
     """
-    from datetime import datetime, timezone
-    from sqlmodel import SQLModel
     import traceback
-    batch_size = 10
+    batch_size = 500
     total = 0
+    stored: list[MessageRecord] = []
+    created_at = datetime.utcnow()
+    stmt = insert(Message.__table__)
     with get_session() as session:
         for i in range(0, len(messages), batch_size):
             batch = messages[i:i+batch_size]
             try:
-                for msg in batch:
-                    event_timestamp = msg.get("date")
-                    if event_timestamp is not None:
-                        if isinstance(event_timestamp, str):
-                            try:
-                                event_timestamp = datetime.fromisoformat(event_timestamp)
-                            except Exception:
-                                event_timestamp = None
-                        if isinstance(event_timestamp, datetime):
-                            if event_timestamp.tzinfo is None:
-                                event_timestamp = event_timestamp.replace(tzinfo=timezone.utc)
-                    m = Message(
-                        source=msg.get("source") or "unknown",
-                        channel=msg.get("channel"),
-                        raw_text=msg.get("text", ""),
-                        translated_text=msg.get("translated_text"),
-                        country=msg.get("country"),
-                        region=msg.get("region"),
-                        location=msg.get("location"),
-                        title=msg.get("title"),
-                        event_timestamp=event_timestamp,
-                        telegram_message_id=msg.get("telegram_message_id"),
-                        orientation=msg.get("orientation"),
-                    )
-                    session.add(m)
-                session.flush()  # force l'envoi à la base, mais pas de commit global
+                cluster_messages(batch, session=session)
+                session.connection().execute(stmt, [msg.to_row(created_at) for msg in batch])
                 session.commit()
                 total += len(batch)
+                stored.extend(batch)
             except Exception as e:
                 print(f"[ERREUR] lors de l'insertion batch {i//batch_size+1}: {e}")
                 traceback.print_exc()
                 session.rollback()
     print(f"[INFO] {total} messages insérés en base.")
     # Log supprimé : nombre de messages stockés
+    return stored
 
 
-def filter_existing_messages(messages: list[dict]) -> list[dict]:
+def filter_existing_messages(
+    messages: list[MessageRecord], discard_version: str | None = None
+) -> list[MessageRecord]:
     """
-    Filtre les messages déjà présents en base (par channel + telegram_message_id).
+    Filtre les messages déjà présents en base (par channel + telegram_message_id), ou déjà
+    écartés par le préfiltre de pertinence lors d'un run précédent avec les mêmes règles
+    (discard_version, par défaut prefilter_version()).
     """
     if not messages:
         return []
-    keys = [(m.get("channel"), m.get("telegram_message_id")) for m in messages]
+    keys = [(m.channel, m.telegram_message_id) for m in messages]
     channels = set(k[0] for k in keys if k[0] is not None)
     ids = set(k[1] for k in keys if k[1] is not None)
     if not channels or not ids:
@@ -87,7 +100,8 @@ def filter_existing_messages(messages: list[dict]) -> list[dict]:
             Message.telegram_message_id.in_(ids)
         )
         existing = set((row[0], row[1]) for row in session.exec(stmt).all())
-    filtered = [m for m in messages if (m.get("channel"), m.get("telegram_message_id")) not in existing]
+    existing |= discarded_keys(keys, discard_version or prefilter_version())
+    filtered = [m for m in messages if (m.channel, m.telegram_message_id) not in existing]
     # Log supprimé : nombre de messages déjà en base ignorés
     return filtered
 
@@ -103,30 +117,413 @@ def delete_old_messages(days: int = 7) -> None:
         # On supprime directement en SQL, pas besoin de charger les objets en mémoire
         stmt = delete(Message).where(Message.event_timestamp < cutoff)
         result = session.exec(stmt)
+        session.exec(delete(Incident).where(Incident.last_seen < cutoff))
         session.commit()
+    purge_staging(days=days)
 
     deleted = getattr(result, "rowcount", None)
     # Log supprimé : nombre de messages supprimés
 
 
-async def run_pipeline_once():
-    init_db()
+def _store_stage(messages: list[MessageRecord], seen: set, run_id: str) -> None:
+    """
+    Dédup, regroupement en incidents et stockage d'un lot, puis passage à l'étape "stored".
+    """
+    with profile_stage("store"):
+        batch = dedupe_messages(messages, seen=seen)
+        geocode_messages(batch)
+        stored = store_messages(batch)
+        kept = {id(m) for m in batch}
+        # Les doublons écartés sont terminés eux aussi
+        advance(stored + [m for m in messages if id(m) not in kept], "stored", run_id)
+
+
+def _give_up_missing(sent: list[MessageRecord], received: list[MessageRecord], stage: str, run_id: str) -> list[MessageRecord]:
+    """
+    Messages envoyés au LLM sans réponse : une tentative de plus en staging. Après
+    LLM_MAX_ATTEMPTS envois, le message passe quand même à l'étape avec la valeur de repli
+    (texte d'origine pour la traduction, champs vides pour l'enrichissement) au lieu d'être
+    renvoyé à chaque run. Renvoie les messages ainsi avancés.
+    """
+    got = {id(m) for m in received}
+    missing = [m for m in sent if id(m) not in got]
+    exhausted = record_missed(missing, get_settings().llm_max_attempts)
+    if not exhausted:
+        return []
+    if stage == "translated":
+        for msg in exhausted:
+            msg.translated_text = msg.source_text
+    advance(exhausted, stage, run_id)
+    print(f"[pipeline] {len(exhausted)} messages sans réponse après {get_settings().llm_max_attempts} "
+          f"envois : étape {stage} avec valeur de repli")
+    return exhausted
+
+
+def _process_streaming(pending: dict[str, list[MessageRecord]], run_id: str) -> None:
+    """
+    Traduction, enrichissement et stockage se chevauchent : chaque message traduit part vers
+    l'enrichissement dès que sa ligne JSONL est reçue, et chaque message enrichi vers le
+    stockage. Les lots sont formés au fil de l'eau (taille BATCH_SIZE pour l'enrichissement,
+    tout ce qui est disponible pour le stockage). Les messages repris d'un run interrompu
+    entrent directement à l'étape suivant la dernière terminée.
+    """
+    batch_size = get_settings().batch_size
+    to_enrich: queue.Queue = queue.Queue()
+    to_store: queue.Queue = queue.Queue()
+    done = object()
+    errors: list[BaseException] = []
+    for msg in pending["translated"]:
+        to_enrich.put(msg)
+    for msg in pending["enriched"]:
+        to_store.put(msg)
+
+    def enrich_worker() -> None:
+        group: list[MessageRecord] = []
+        try:
+            while True:
+                item = to_enrich.get()
+                if item is not done:
+                    group.append(item)
+                if group and (item is done or len(group) >= batch_size):
+                    with profile_stage("enrich"):
+                        enriched = enrich_messages(group, use_batch=False, on_message=to_store.put)
+                        advance(enriched, "enriched", run_id)
+                        for msg in _give_up_missing(group, enriched, "enriched", run_id):
+                            to_store.put(msg)
+                    group = []
+                if item is done:
+                    break
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            to_store.put(done)
+
+    def store_worker() -> None:
+        seen: set = set()
+        pending_store: list[MessageRecord] = []
+        try:
+            while True:
+                item = to_store.get()
+                if item is not done:
+                    pending_store.append(item)
+                # On stocke dès que la file est vide : premier message en base au plus tôt
+                if pending_store and (item is done or to_store.empty()):
+                    _store_stage(pending_store, seen, run_id)
+                    pending_store = []
+                if item is done:
+                    break
+        except BaseException as e:
+            errors.append(e)
+
+    translated: list[MessageRecord] = []
+
+    def on_translated(msg: MessageRecord) -> None:
+        to_enrich.put(msg)
+        translated.append(msg)
+        # Traductions enregistrées par lots : un crash ne fait perdre que le lot en cours
+        if len(translated) >= batch_size:
+            advance(translated, "translated", run_id)
+            translated.clear()
+
+    workers = [threading.Thread(target=enrich_worker), threading.Thread(target=store_worker)]
+    for worker in workers:
+        worker.start()
+    try:
+        with profile_stage("translate"):
+            received = translate_messages(pending["fetched"], use_batch=False, on_message=on_translated)
+            advance(translated, "translated", run_id)
+            for msg in _give_up_missing(pending["fetched"], received, "translated", run_id):
+                to_enrich.put(msg)
+    finally:
+        to_enrich.put(done)
+        for worker in workers:
+            worker.join()
+    if errors:
+        raise errors[0]
+
+
+def process_messages(
+    raw_messages: list[MessageRecord],
+    use_llm: bool = True,
+    use_batch: bool | None = None,
+    channels: list[str] | None = None,
+    budget: TokenBudget | None = None,
+) -> None:
+    """
+    Étapes communes après la collecte : filtrage, préfiltre de pertinence, traduction,
+    enrichissement, dédup, regroupement en incidents, stockage. Chaque message passe par la table de staging :
+    les messages d'un run interrompu (des canaux donnés, ou de tous) sont repris à leur
+    dernière étape terminée.
+    Les étapes LLM traitent les messages par priorité de canal puis récence, dans la limite
+    du budget de tokens du run (partagé entre les appels si `budget` est fourni, sinon
+    propre à cet appel, avec son rapport) ; le reste attend le run suivant en staging.
+    """
+    run_id = new_run_id()
+    with profile_stage("staging"):
+        # Filtrage des messages déjà présents en base
+        raw_messages = filter_existing_messages(raw_messages)
+        added = stage_messages(raw_messages, run_id)
+        pending = load_pending(channels)
+    resumed = sum(len(v) for v in pending.values()) - added
+    if not any(pending.values()):
+        return
+    print(
+        f"[pipeline] Run {run_id} : {added} nouveaux messages, {max(resumed, 0)} repris "
+        f"(à traduire {len(pending['fetched'])}, à enrichir {len(pending['translated'])}, "
+        f"à stocker {len(pending['enriched'])})"
+    )
+
+    if use_batch is None:
+        use_batch = get_settings().openai_batch
+    # Les lignes répétées du canal (abonnement, signature) ne partent pas au LLM
+    with profile_stage("boilerplate"):
+        strip_messages(pending["fetched"])
+    # Pubs, appels aux dons, promos, réactions d'une ligne : écartés avant le LLM
+    with profile_stage("prefilter"):
+        kept = prefilter_messages(pending["fetched"], run_id)
+        kept_ids = {id(m) for m in kept}
+        drop_staged([m for m in pending["fetched"] if id(m) not in kept_ids])
+        pending["fetched"] = kept
+
+    if use_llm:
+        own_budget = budget is None
+        if own_budget:
+            budget = TokenBudget(limit=get_settings().llm_token_budget)
+        pending = schedule_llm_work(pending, budget, channel_priorities())
+        if own_budget:
+            write_schedule_report(budget, run_id)
+    if use_llm and not use_batch:
+        _process_streaming(pending, run_id)
+        return
+
+    if use_llm:
+        # Seuls les messages dont la réponse est arrivée avancent ; les autres restent en staging
+        with profile_stage("translate"):
+            translated = translate_messages(pending["fetched"], use_batch=use_batch)
+            advance(translated, "translated", run_id)
+            translated += _give_up_missing(pending["fetched"], translated, "translated", run_id)
+        with profile_stage("enrich"):
+            to_enrich = translated + pending["translated"]
+            enriched = enrich_messages(to_enrich, use_batch=use_batch)
+            advance(enriched, "enriched", run_id)
+            enriched += _give_up_missing(to_enrich, enriched, "enriched", run_id)
+        _store_stage(enriched + pending["enriched"], set(), run_id)
+        return
+    _store_stage(pending["fetched"] + pending["translated"] + pending["enriched"], set(), run_id)
+
+
+# Champs réécrits par chaque étape rejouable
+RERUN_FIELDS = {
+    "translate": ("translated_text",),
+    "enrich": ("country", "region", "location", "region_key", "location_key", "title", "lat", "lon", "grid_cell"),
+    # Après une mise à jour du gazetteer (static/data/gazetteer.json)
+    "geocode": ("lat", "lon", "grid_cell"),
+}
 
-    raw_messages = await fetch_raw_messages_24h()
-    if not raw_messages:
+
+def rerun_stage(stage: str, hours: int = 24, use_batch: bool | None = None) -> None:
+    """
+    Rejoue une seule étape (ex. réenrichir avec un nouveau prompt) sur les messages déjà
+    stockés depuis `hours` heures, et met à jour leurs champs en base.
+    """
+    from sqlalchemy import bindparam, update
+
+    init_db()
+    run_id = new_run_id()
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    with get_session() as session:
+        rows = session.exec(select(Message).where(Message.created_at >= cutoff).order_by(Message.id)).all()
+        messages = [
+            MessageRecord(
+                message_id=m.id,
+                source=m.source,
+                channel=m.channel,
+                text=m.raw_text,
+                translated_text=m.translated_text,
+                country=m.country,
+                region=m.region,
+                location=m.location,
+                title=m.title,
+            )
+            for m in rows
+        ]
+    if not messages:
+        print(f"[rerun] Aucun message stocké depuis {hours} h")
         return
+    print(f"[rerun] Run {run_id} : étape {stage} rejouée sur {len(messages)} messages")
+
+    with profile_stage(stage):
+        if stage == "translate":
+            strip_messages(messages, learn=False)
+            messages = translate_messages(messages, use_batch=use_batch)
+        elif stage == "enrich":
+            messages = enrich_messages(messages, use_batch=use_batch)
+            geocode_messages(messages)
+        else:
+            geocode_messages(messages)
+
+    fields = RERUN_FIELDS[stage]
+    table = Message.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(**{field: bindparam(f"b_{field}") for field in fields})
+    )
+    with get_session() as session:
+        session.connection().execute(
+            stmt,
+            [{"b_id": m.message_id, **{f"b_{field}": getattr(m, field) for field in fields}} for m in messages],
+        )
+        session.commit()
+    print(f"[rerun] {len(messages)} messages mis à jour ({', '.join(fields)})")
+
+
+async def run_pipeline_once(
+    client=None,
+    use_llm: bool = True,
+    use_batch: bool | None = None,
+    publish: bool | None = None,
+):
+    init_db()
 
-    # Filtrage des messages déjà présents en base
-    raw_messages = filter_existing_messages(raw_messages)
-    if not raw_messages:
+    with profile_stage("fetch"):
+        raw_messages = await fetch_raw_messages_24h(client=client)
+    # Même sans nouveau message, un run interrompu peut avoir laissé du travail en staging
+    process_messages(raw_messages, use_llm=use_llm, use_batch=use_batch)
+    with profile_stage("cleanup"):
+        delete_old_messages(days=7)
+    if publish is None:
+        publish = get_settings().publish_snapshot
+    if publish:
+        with profile_stage("snapshot"):
+            publish_snapshot()
+
+
+async def run_sharded_worker(
+    worker_id: str,
+    client=None,
+    use_llm: bool = True,
+    use_batch: bool | None = None,
+    publish: bool | None = None,
+):
+    """
+    Mode shardé : les canaux sont répartis entre plusieurs workers via la table de baux.
+    Le worker prend des lots de canaux tant qu'il en reste à traiter dans le cycle ;
+    les baux d'un worker planté expirent et sont repris par les autres.
+    """
+    init_db()
+    settings = get_settings()
+
+    sources_map = _parse_sources_env()
+    if not sources_map:
+        print("[shard] Aucun canal dans SOURCES_TELEGRAM.")
         return
+    channels = list(sources_map)
+    ensure_channels(channels)
 
-    translate_messages(raw_messages)
-    enrich_messages(raw_messages)
-    deduped = dedupe_messages(raw_messages)
-    store_messages(deduped)
-    delete_old_messages(days=7)
+    ttl = settings.shard_lease_ttl_seconds
+    cycle_start = datetime.utcnow() - timedelta(minutes=settings.shard_cycle_minutes)
+    if client is None:
+        client = build_telegram_client()
+
+    print(f"[shard] Worker {worker_id} démarré ({len(channels)} canaux au total)")
+    processed = 0
+    # Un budget de tokens pour tout le run du worker, sur l'ensemble de ses lots
+    budget = TokenBudget(limit=settings.llm_token_budget)
+    worker_run_id = f"{new_run_id()}-{worker_id}"
+    try:
+        async with client:
+            while True:
+                batch = acquire_channels(
+                    worker_id, channels, settings.shard_channels_per_lease, ttl, cycle_start
+                )
+                if not batch:
+                    remaining = count_unfinished(channels, cycle_start)
+                    if remaining == 0:
+                        break
+                    # D'autres workers détiennent les canaux restants : on attend qu'ils
+                    # terminent ou que leurs baux expirent
+                    print(f"[shard] {worker_id} : {remaining} canaux détenus ailleurs, attente…")
+                    await asyncio.sleep(max(1, ttl // 2))
+                    continue
+
+                print(f"[shard] {worker_id} prend : {', '.join(batch)}")
+                with LeaseHeartbeat(worker_id, batch, ttl) as heartbeat:
+                    with profile_stage("fetch"):
+                        raw_messages = await fetch_raw_messages_24h(
+                            {chan: sources_map[chan] for chan in batch}, client=client
+                        )
+                    process_messages(
+                        raw_messages, use_llm=use_llm, use_batch=use_batch, channels=batch, budget=budget
+                    )
+                complete_channels(worker_id, heartbeat.owned())
+                processed += len(batch)
+    finally:
+        release_leases(worker_id)
+
+    print(f"[shard] Worker {worker_id} terminé ({processed} canaux traités)")
+    write_schedule_report(budget, worker_run_id)
+    with profile_stage("cleanup"):
+        delete_old_messages(days=7)
+    # Chaque worker publie depuis un fichier temporaire distinct : le dernier os.replace l'emporte
+    if publish is None:
+        publish = settings.publish_snapshot
+    if publish:
+        with profile_stage("snapshot"):
+            publish_snapshot()
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Pipeline Telegram → DB")
+    parser.add_argument("--sharded", action="store_true",
+                        help="répartit les canaux entre plusieurs workers via la table de baux")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="identifiant du worker en mode shardé")
+    parser.add_argument("--fake-telegram", action="store_true",
+                        help="utilise le client Telegram factice (tests locaux)")
+    parser.add_argument("--no-llm", action="store_true",
+                        help="saute traduction et enrichissement (tests locaux)")
+    parser.add_argument("--batch", action="store_true", default=None,
+                        help="passe traduction et enrichissement par la Batch API (run de nuit)")
+    parser.add_argument("--rerun-stage", choices=sorted(RERUN_FIELDS),
+                        help="rejoue une étape sur les messages déjà stockés (sans collecte)")
+    parser.add_argument("--since-hours", type=int, default=24,
+                        help="fenêtre des messages concernés par --rerun-stage")
+    parser.add_argument("--publish", action="store_true", default=None,
+                        help="publie en fin de run le snapshot SQLite en lecture seule lu par l'API")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile le run (échantillonnage + SQL) et écrit le rapport dans data/profiles/")
+    parser.add_argument("--profile-interval-ms", type=float, default=5.0,
+                        help="intervalle d'échantillonnage de --profile")
+    return parser.parse_args()
+
+
+def _run(args, client) -> None:
+    if args.rerun_stage:
+        rerun_stage(args.rerun_stage, hours=args.since_hours, use_batch=args.batch)
+    elif args.sharded:
+        asyncio.run(run_sharded_worker(
+            args.worker_id, client=client, use_llm=not args.no_llm, use_batch=args.batch, publish=args.publish
+        ))
+    else:
+        asyncio.run(run_pipeline_once(
+            client=client, use_llm=not args.no_llm, use_batch=args.batch, publish=args.publish
+        ))
 
 
 if __name__ == "__main__":
-    asyncio.run(run_pipeline_once())
+    args = _parse_args()
+    client = None
+    if args.fake_telegram:
+        from tools.fake_telegram import FakeTelegramClient
+        client = FakeTelegramClient()
+    if args.profile:
+        from app.services.profiling import SamplingProfiler, SQLCapture, write_pipeline_profile
+        with SQLCapture(all_threads=True) as sql, SamplingProfiler(args.profile_interval_ms / 1000) as profiler:
+            try:
+                _run(args, client)
+            finally:
+                profiler.stop()
+                write_pipeline_profile(profiler, sql, Path("data/profiles"))
+    else:
+        _run(args, client)
@@ -0,0 +1,166 @@
+# tools/train_relevance.py
+"""
+Entraîne le modèle du préfiltre de pertinence (app/services/relevance.py) : régression
+logistique sur n-grammes de mots hachés, à partir de nos exports étiquetés.
+
+Exports CSV : une colonne "label" (1 / pertinent / keep, 0 / bruit / drop) et une colonne de
+texte ("text", "raw_text" ou "translated_text", ex. la sortie de tools/export_messages.py
+complétée à la main).
+--from-db ajoute des étiquettes faibles : messages stockés avec un pays = pertinents,
+messages écartés par une règle = bruit.
+
+    python tools/train_relevance.py --csv labels.csv [--from-db] [--out data/relevance_model.npz]
+"""
+
+import argparse
+import csv
+import random
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+load_dotenv()
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.relevance import N_FEATURES, RelevanceModel, hashed_features
+
+POSITIVE_LABELS = {"1", "pertinent", "keep", "relevant", "oui"}
+NEGATIVE_LABELS = {"0", "bruit", "drop", "noise", "non"}
+TEXT_COLUMNS = ("text", "raw_text", "translated_text")
+
+
+def _read_csv(path: Path) -> list:
+    examples = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            label = (row.get("label") or "").strip().lower()
+            text = next((row[c] for c in TEXT_COLUMNS if row.get(c)), "")
+            if not text:
+                continue
+            if label in POSITIVE_LABELS:
+                examples.append((text, 1))
+            elif label in NEGATIVE_LABELS:
+                examples.append((text, 0))
+    return examples
+
+
+def _read_db(limit: int) -> list:
+    from sqlmodel import select
+    from app.database import init_db, get_session
+    from app.models.discarded_message import DiscardedMessage
+    from app.models.message import Message
+
+    init_db()
+    with get_session() as session:
+        positives = session.exec(
+            select(Message.raw_text).where(Message.country.is_not(None)).order_by(Message.id.desc()).limit(limit)
+        ).all()
+        negatives = session.exec(
+            select(DiscardedMessage.text).where(DiscardedMessage.reason != "modèle")
+            .order_by(DiscardedMessage.id.desc()).limit(limit)
+        ).all()
+    return [(t, 1) for t in positives if t] + [(t, 0) for t in negatives if t]
+
+
+def train(examples: list, epochs: int, lr: float, l2: float, seed: int) -> RelevanceModel:
+    """
+    Descente de gradient stochastique sur les exemples creux, classes pondérées à l'inverse
+    de leur fréquence (les exports sont souvent déséquilibrés).
+    """
+    rng = random.Random(seed)
+    features = [hashed_features(text) for text, _ in examples]
+    labels = [label for _, label in examples]
+    n_pos = sum(labels)
+    n_neg = len(labels) - n_pos
+    class_weight = {1: len(labels) / (2 * max(n_pos, 1)), 0: len(labels) / (2 * max(n_neg, 1))}
+
+    weights = np.zeros(N_FEATURES, dtype=np.float32)
+    bias = 0.0
+    order = list(range(len(examples)))
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        step = lr / (1 + epoch)
+        for i in order:
+            indices, values = features[i]
+            z = bias + float(values @ weights[indices]) if len(indices) else bias
+            p = 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+            g = (p - labels[i]) * class_weight[labels[i]]
+            if len(indices):
+                weights[indices] -= step * (g * values + l2 * weights[indices])
+            bias -= step * g
+    return RelevanceModel(weights=weights, bias=float(bias))
+
+
+def evaluate(model: RelevanceModel, examples: list, threshold: float) -> dict:
+    tp = fp = fn = tn = 0
+    for text, label in examples:
+        dropped = model.score(text) < threshold
+        if dropped and label == 0:
+            tp += 1
+        elif dropped:
+            fp += 1
+        elif label == 0:
+            fn += 1
+        else:
+            tn += 1
+    total = max(len(examples), 1)
+    return {
+        "exactitude": (tp + tn) / total,
+        # "Positif" = message écarté : la précision dit combien de messages utiles on perdrait
+        "précision_écartés": tp / max(tp + fp, 1),
+        "rappel_bruit": tp / max(tp + fn, 1),
+        "pertinents_perdus": fp,
+    }
+
+
+def main() -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Entraînement du préfiltre de pertinence")
+    parser.add_argument("--csv", action="append", default=[], help="export étiqueté (répétable)")
+    parser.add_argument("--from-db", action="store_true", help="ajoute les étiquettes faibles de la base")
+    parser.add_argument("--db-limit", type=int, default=5000, help="exemples max par classe depuis la base")
+    parser.add_argument("--out", default=settings.relevance_model_path, help="fichier du modèle")
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--lr", type=float, default=0.5)
+    parser.add_argument("--l2", type=float, default=1e-5)
+    parser.add_argument("--holdout", type=float, default=0.2, help="part gardée pour l'évaluation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = []
+    for path in args.csv:
+        examples += _read_csv(Path(path))
+    if args.from_db:
+        examples += _read_db(args.db_limit)
+    n_pos = sum(label for _, label in examples)
+    print(f"[relevance] {len(examples)} exemples ({n_pos} pertinents, {len(examples) - n_pos} bruit)")
+    if n_pos == 0 or n_pos == len(examples):
+        print("[relevance] Il faut des exemples des deux classes.")
+        return 1
+
+    random.Random(args.seed).shuffle(examples)
+    cut = int(len(examples) * (1 - args.holdout))
+    train_set, test_set = examples[:cut], examples[cut:]
+    model = train(train_set, args.epochs, args.lr, args.l2, args.seed)
+    if test_set:
+        metrics = evaluate(model, test_set, settings.relevance_threshold)
+        print(
+            f"[relevance] Évaluation sur {len(test_set)} exemples (seuil {settings.relevance_threshold}) : "
+            + ", ".join(f"{k} {v:.3f}" if isinstance(v, float) else f"{k} {v}" for k, v in metrics.items())
+        )
+        # Modèle final sur tous les exemples
+        model = train(examples, args.epochs, args.lr, args.l2, args.seed)
+
+    model.save(Path(args.out))
+    print(f"[relevance] Modèle écrit : {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())